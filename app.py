@@ -1,8 +1,142 @@
-from flask import Flask, request, render_template
-from pipeline.prediction_pipeline import hybrid_recommendation
+import json
+import time
+import numpy as np
+import pandas as pd
+from flask import Flask, Response, g, request, render_template, jsonify
+from pipeline.prediction_pipeline import hybrid_recommendation_batch
+from src.recommender_index import RecommenderIndex
+from src.recommendation_cache import RecommendationCache
+from src.user_fold_in import UserFoldIn
+from src.metrics import registry, start_trace, end_trace
+from src.artifact_release import ActiveIndex, ReleaseWatcher, current_release, verify_release
+from src.logger import logging
+from config.paths_config import *
+from utils.common_functions import read_yaml_file
 
 app = Flask(__name__)
 
+config = read_yaml_file(CONFIG_FILE_PATH)
+serving_config = config.get("serving", {})
+# Imported once in the gunicorn master (preload_app), so workers forked from it all write to the same directory.
+registry.share(serving_config.get("metrics_dir", METRICS_DIR))
+cache_config = config.get("cache", {})
+
+releases_config = config.get("releases", {})
+release_version = current_release() if releases_config.get("enabled", False) else None
+
+def load_index(version=None):
+    if version is None:
+        return RecommenderIndex().load()
+    verify_release(version)
+    return RecommenderIndex.from_release(version).load()
+
+active_index = ActiveIndex(load_index(release_version), release_version)
+rerank_pool = serving_config.get("rerank_pool") if serving_config.get("rerank_by_predicted_rating", False) else None
+# Known users are served from the batch-materialised table when the request weights match it.
+use_materialised = serving_config.get("use_materialised", True)
+user_fold_in = UserFoldIn(active_index)
+# Users folded in by earlier runs or other workers; forked workers start from what the master applied.
+user_fold_in.sync()
+
+recommendation_cache = None
+if cache_config.get("enabled", False):
+    # Versioned by the index this process serves, so a retrain writing new files does not touch entries of the loaded model.
+    recommendation_cache = RecommendationCache.from_config(cache_config, model_version=release_version or active_index.get().artifact_version)
+
+ready = False
+release_watcher = None
+
+def warm_index(index, n_users):
+    index.warmup()
+
+    # A few real requests build every lazy structure on the serving path and prove the release answers queries.
+    warmup_users = np.asarray(index.user2user_decoded.ids[:n_users]).tolist()
+    if warmup_users:
+        failed = [result for result in hybrid_recommendation_batch(warmup_users, index=index, rerank_pool=rerank_pool) if "error" in result]
+        if failed:
+            raise ValueError(f"{len(failed)} of {len(warmup_users)} warmup queries failed, e.g. {failed[0]}")
+    return len(warmup_users)
+
+def warmup():
+    global ready
+
+    n_users = warm_index(active_index.get(), serving_config.get("warmup_users", 100))
+
+    ready = True
+    logging.info(f"Serving warmup finished with {n_users} users")
+
+def validate_release(index):
+    index.validate()
+    warm_index(index, releases_config.get("validation_users", 20))
+
+def swap_release(index, version):
+    # Held across replay and swap so no fold-in is published onto the old index in between and lost.
+    with active_index.lock:
+        active_index.swap(user_fold_in.replay(index), version)
+    if recommendation_cache is not None:
+        recommendation_cache.set_model_version(version)
+
+def start_release_watcher():
+    global release_watcher
+
+    # Threads do not survive a fork, so each serving process starts its own watcher.
+    if release_watcher is not None or not releases_config.get("enabled", False):
+        return
+
+    release_watcher = ReleaseWatcher(
+        load_release=lambda version: load_index(version),
+        validate=validate_release,
+        on_swap=swap_release,
+        current_version=active_index.version,
+        poll_seconds=releases_config.get("watch_seconds", 30),
+    )
+    release_watcher.start()
+
+@app.before_request
+def sync_fold_ins():
+    # Users folded in through another worker; the request below then reads an index that has them.
+    user_fold_in.sync()
+
+@app.before_request
+def start_request_trace():
+    g.request_start = time.perf_counter()
+    g.trace = None
+    # Opt-in per request: the spans of this request are returned in the X-Debug-Trace response header.
+    if serving_config.get("debug_trace", False) and request.headers.get("X-Debug-Trace") == "1":
+        g.trace, g.trace_token = start_trace()
+
+@app.after_request
+def finish_request_trace(response):
+    if request.endpoint is not None and request.endpoint not in ("metrics", "live", "ready_check"):
+        registry.observe(f"request.{request.endpoint}", time.perf_counter() - g.request_start)
+
+    if g.get("trace") is not None:
+        end_trace(g.trace_token)
+        response.headers["X-Debug-Trace"] = json.dumps([{"stage": stage, "ms": round(ms, 3)} for stage, ms in g.trace])
+    return response
+
+def cached_recommendations(user_ids, user_weight, content_weight):
+    # Read once so the whole request is served by one version even if a swap happens meanwhile.
+    index = active_index.get()
+
+    if recommendation_cache is None:
+        return hybrid_recommendation_batch(user_ids, user_weight, content_weight, index=index, rerank_pool=rerank_pool, materialised=use_materialised)
+
+    results = {}
+    for user_id in user_ids:
+        cached = recommendation_cache.get(user_id, user_weight, content_weight, index.user_revisions.get(user_id, 0))
+        if cached is not None:
+            results[user_id] = {"user_id": user_id, "recommendations": cached}
+
+    missing = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in results]
+    if missing:
+        for result in hybrid_recommendation_batch(missing, user_weight, content_weight, index=index, rerank_pool=rerank_pool, materialised=use_materialised):
+            results[result["user_id"]] = result
+            if "recommendations" in result:
+                recommendation_cache.set(result["user_id"], user_weight, content_weight, result["recommendations"], index.user_revisions.get(result["user_id"], 0))
+
+    return [results[user_id] for user_id in user_ids]
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     recommendations = None
@@ -10,12 +144,119 @@ def index():
     if request.method == 'POST':
         try:
             user_id = int(request.form['user_id'])
-            recommendations = hybrid_recommendation(user_id)
+            result = cached_recommendations([user_id], serving_config.get("default_user_weight", 0.5), serving_config.get("default_content_weight", 0.5))[0]
+            recommendations = result.get("recommendations")
 
         except Exception as e:
-            print(f"Error processing request: {e}")
+            logging.error(f"Error processing request: {e}")
             recommendations = None
     return render_template('index.html', recommendations=recommendations)
 
+@app.route('/api/recommend', methods=['POST'])
+def api_recommend():
+    payload = request.get_json(silent=True) or {}
+
+    user_ids = payload.get("user_ids")
+    if not isinstance(user_ids, list) or not user_ids:
+        return jsonify({"error": "user_ids must be a non-empty list"}), 400
+
+    max_batch_size = serving_config.get("max_batch_size", 10000)
+    if len(user_ids) > max_batch_size:
+        return jsonify({"error": f"At most {max_batch_size} user_ids per request"}), 400
+
+    try:
+        user_ids = [int(user_id) for user_id in user_ids]
+        user_weight = float(payload.get("user_weight", serving_config.get("default_user_weight", 0.5)))
+        content_weight = float(payload.get("content_weight", serving_config.get("default_content_weight", 0.5)))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+
+    try:
+        results = cached_recommendations(user_ids, user_weight, content_weight)
+    except Exception as e:
+        logging.error(f"Error processing batch request: {e}")
+        return jsonify({"error": "Internal error while computing recommendations"}), 500
+
+    return jsonify({"results": results})
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    query = request.args.get("q", "")
+    max_limit = serving_config.get("search_max_limit", 50)
+
+    try:
+        limit = min(int(request.args.get("limit", serving_config.get("search_limit", 10))), max_limit)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+
+    index = active_index.get()
+    anime_df = index.anime_df
+    results = []
+    for row in index.anime_lookup.search(query, limit=limit):
+        anime_row = anime_df.iloc[row]
+        results.append({
+            "anime_id": int(anime_row.anime_id),
+            "anime_name": anime_row.eng_version,
+            "mal_rating": None if pd.isna(anime_row.Score) else float(anime_row.Score)
+        })
+
+    return jsonify({"query": query, "results": results})
+
+@app.route('/api/users/fold_in', methods=['POST'])
+def api_fold_in():
+    payload = request.get_json(silent=True) or {}
+
+    ratings = payload.get("ratings")
+    if not isinstance(ratings, list) or not ratings:
+        return jsonify({"error": "ratings must be a non-empty list of {anime_id, rating}"}), 400
+
+    try:
+        user_id = int(payload["user_id"])
+        anime_ids = [int(rating["anime_id"]) for rating in ratings]
+        scores = [float(rating["rating"]) for rating in ratings]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+
+    try:
+        result = user_fold_in.fold_in(user_id, anime_ids, scores)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error folding in user {user_id}: {e}")
+        return jsonify({"error": "Internal error while folding in user"}), 500
+
+    return jsonify(result)
+
+@app.route('/healthz/live', methods=['GET'])
+def live():
+    return jsonify({"status": "alive"})
+
+@app.route('/healthz/ready', methods=['GET'])
+def ready_check():
+    if not ready:
+        return jsonify({"status": "warming up"}), 503
+    return jsonify({"status": "ready"})
+
+@app.route('/api/release', methods=['GET'])
+def release_info():
+    return jsonify({"version": active_index.version, "swaps": active_index.swaps})
+
+@app.route('/api/memory', methods=['GET'])
+def memory():
+    # What the served index holds in this worker, e.g. to check a quantized index keeps the float32 matrix paged out.
+    return jsonify({"resident_mb": active_index.get().resident_memory()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    if recommendation_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **recommendation_cache.stats()})
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    warmup()
+    start_release_watcher()
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,258 @@
+"""
+Benchmarks the ingestion, preprocessing and recommendation paths on synthetic data and compares against a stored baseline.
+
+    python -m benchmarks.run_benchmarks --users 100000 --anime 20000
+
+The first run at a given scale writes the baseline; later runs fail if p50/p95 latency or peak RSS grows past --tolerance.
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import contextlib
+import multiprocessing
+import numpy as np
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+COMPARED_METRICS = ["p50_ms", "p95_ms", "peak_rss_mb"]
+
+INGESTION_RUNS = ["download", "unchanged"]
+PREPROCESSING_STAGES = ["load_data", "filter_users", "scale_ratings", "encode_data", "split_data", "save_preprocessed_data", "process_anime_data", "build_user_favourites"]
+SERVING_CASES = ["find_similar_users", "find_similar_animes", "getUserRecommendation", "hybrid_recommendation"]
+
+################## MEASUREMENT #################
+
+def _peak_rss_mb():
+    # VmHWM is reset by exec, unlike ru_maxrss, which a spawned worker inherits from its parent.
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def summarize(samples_ms):
+    samples_ms = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "n": int(len(samples_ms)),
+        "mean_ms": float(samples_ms.mean()),
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p90_ms": float(np.percentile(samples_ms, 90)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "max_ms": float(samples_ms.max()),
+    }
+
+def _timed(function, *args, **kwargs):
+    # The helpers print progress; keep it out of the timings and the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    return elapsed_ms, result
+
+################## CASES #################
+
+def run_ingestion(workdir):
+    """Ingests the synthetic raw files from the local bucket twice: a full download, then a rerun that only compares checksums."""
+    os.chdir(workdir)
+    from src.data_ingestion import DataIngestion
+    from config.paths_config import CONFIG_FILE_PATH
+
+    report = {}
+    for run in INGESTION_RUNS:
+        elapsed_ms, _ = _timed(DataIngestion(config=CONFIG_FILE_PATH).initiate_data_ingestion)
+        report[f"DataIngestion.{run}"] = {**summarize([elapsed_ms]), "peak_rss_mb": _peak_rss_mb()}
+    return report
+
+def run_preprocessing(workdir):
+    """Runs every DataProcessor stage once in this (fresh) process and times each."""
+    os.chdir(workdir)
+    from src.data_processing import DataProcessor, RATING_COLUMNS
+    from config.paths_config import ANIMELIST_DATA_PATH, PREPROCESSED_DATA_DIR, CONFIG_FILE_PATH
+
+    processor = DataProcessor(input_file=ANIMELIST_DATA_PATH, output_dir=PREPROCESSED_DATA_DIR, config_path=CONFIG_FILE_PATH)
+    config = processor.processing_config
+
+    stage_args = {
+        "load_data": (RATING_COLUMNS,),
+        "filter_users": (config.get("min_ratings", 400),),
+        "split_data": (config.get("test_size", 0.2), config.get("random_state", 42)),
+    }
+
+    report = {}
+    for stage in PREPROCESSING_STAGES:
+        elapsed_ms, _ = _timed(getattr(processor, stage), *stage_args.get(stage, ()))
+        report[f"DataProcessor.{stage}"] = {**summarize([elapsed_ms]), "peak_rss_mb": _peak_rss_mb()}
+    return report
+
+def run_serving_case(workdir, case, n_queries, seed):
+    """Times one recommendation function over n_queries sampled users or titles in this (fresh) process."""
+    os.chdir(workdir)
+    from src.recommender_index import RecommenderIndex
+    from src.artifact_store import load_columns
+    from config.paths_config import RATING_DF
+    from pipeline.prediction_pipeline import hybrid_recommendation
+    from utils.helper import find_similar_users, find_similar_animes, getUserPreferences, getUserRecommendation
+
+    index = RecommenderIndex().load()
+    rng = np.random.default_rng(seed)
+    user_ids = rng.choice(np.asarray(index.user2user_decoded.ids), size=n_queries).tolist()
+    anime_names = rng.choice(index.anime_df["eng_version"].values, size=n_queries).tolist()
+
+    if case == "getUserRecommendation":
+        rating_df = load_columns(RATING_DF)
+
+    samples = []
+    for user_id, anime_name in zip(user_ids, anime_names):
+        if case == "find_similar_users":
+            elapsed_ms, _ = _timed(find_similar_users, user_id, index.user_weights, index.user2user_encoded, index.user2user_decoded, top_n=10)
+        elif case == "find_similar_animes":
+            elapsed_ms, _ = _timed(find_similar_animes, anime_name, index.anime_weights, index.anime2anime_encoded, index.anime2anime_decoded, index.anime_df, index.synopses, top_n=10)
+        elif case == "getUserRecommendation":
+            _, similar_users = _timed(find_similar_users, user_id, index.user_weights, index.user2user_encoded, index.user2user_decoded, top_n=10)
+            _, user_pref = _timed(getUserPreferences, user_id, rating_df, index.anime_df)
+            elapsed_ms, _ = _timed(getUserRecommendation, similar_users, user_pref, index.anime_df, rating_df, index.synopses)
+        elif case == "hybrid_recommendation":
+            elapsed_ms, _ = _timed(hybrid_recommendation, user_id, index=index)
+        else:
+            raise ValueError(f"Unknown benchmark case: {case}")
+        samples.append(elapsed_ms)
+
+    return {case: {**summarize(samples), "peak_rss_mb": _peak_rss_mb()}}
+
+################## SETUP #################
+
+def prepare_workdir(workdir, args):
+    from benchmarks.synthetic_data import generate
+
+    os.makedirs(os.path.join(workdir, "config"), exist_ok=True)
+    with open(os.path.join(REPO_ROOT, "config", "config.yaml")) as file:
+        config = yaml.safe_load(file)
+
+    # Synthetic users rate far fewer anime than the 400 the production filter expects.
+    config["data_processing"]["mode"] = "in_memory"
+    config["data_processing"]["min_ratings"] = args.min_ratings
+    config["cache"]["enabled"] = False
+    # Ingestion copies the generated files back from a local bucket, whole, instead of fetching from GCS.
+    bucket_dir = os.path.join(workdir, "bucket")
+    config["data_ingestion"]["local_bucket_dir"] = bucket_dir
+    config["data_ingestion"]["num_rows"] = None
+
+    with open(os.path.join(workdir, "config", "config.yaml"), "w") as file:
+        yaml.safe_dump(config, file)
+
+    # Previous runs' outputs would be picked up as ANN indexes or artifacts.
+    for directory in ["preprocessed_data", "weights"]:
+        shutil.rmtree(os.path.join(workdir, "artifacts", directory), ignore_errors=True)
+
+    params = generate(workdir, n_users=args.users, n_anime=args.anime, ratings_per_user=args.ratings_per_user, embedding_dim=args.embedding_dim, seed=args.seed)
+
+    raw_dir = os.path.join(workdir, "artifacts", "raw_data")
+    os.makedirs(bucket_dir, exist_ok=True)
+    for file_name in config["data_ingestion"]["bucket_file_names"]:
+        shutil.copyfile(os.path.join(raw_dir, file_name), os.path.join(bucket_dir, file_name))
+        # Without the previous run's manifest the first ingestion downloads every file.
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(raw_dir, f".{file_name}.source.json"))
+
+    return params
+
+def run_isolated(function, *args):
+    # Each case gets a fresh process so peak RSS is not inherited from the previous one.
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(function, args)
+
+################## BASELINE #################
+
+def scale_key(params):
+    return f"users={params['n_users']},anime={params['n_anime']},ratings_per_user={params['ratings_per_user']}"
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    rows = []
+    for case, metrics in report["cases"].items():
+        previous = baseline.get("cases", {}).get(case)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = previous[metric], metrics[metric]
+            change = (new - old) / old if old else 0.0
+            rows.append((case, metric, old, new, change))
+            if change > tolerance:
+                regressions.append(f"{case} {metric}: {old:.2f} -> {new:.2f} (+{change:.0%})")
+
+    print(f"{'case':45} {'metric':12} {'baseline':>12} {'current':>12} {'change':>8}")
+    for case, metric, old, new, change in rows:
+        print(f"{case:45} {metric:12} {old:12.2f} {new:12.2f} {change:+8.0%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, preprocessing and recommendation paths on synthetic data.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--anime", type=int, default=20000)
+    parser.add_argument("--ratings-per-user", type=int, default=50)
+    parser.add_argument("--embedding-dim", type=int, default=128)
+    parser.add_argument("--min-ratings", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=os.path.join(REPO_ROOT, "artifacts", "benchmark"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the stored baseline for this scale.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative increase before a metric counts as a regression.")
+    parser.add_argument("--output", help="Also write this run's report to the given JSON file.")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir)
+    params = prepare_workdir(workdir, args)
+
+    cases = run_isolated(run_ingestion, workdir)
+    cases.update(run_isolated(run_preprocessing, workdir))
+
+    # Embeddings come from the generator's latent factors, so no model training is needed.
+    from benchmarks.synthetic_data import write_embeddings
+    write_embeddings(workdir)
+
+    for case in SERVING_CASES:
+        cases.update(run_isolated(run_serving_case, workdir, case, args.queries, args.seed))
+
+    report = {
+        "scale": params,
+        "queries": args.queries,
+        "environment": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(), "cpu_count": os.cpu_count()},
+        "cases": cases,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+
+    key = scale_key(params)
+    if key in baselines and not args.update_baseline:
+        regressions = compare(report, baselines[key], args.tolerance)
+        if regressions:
+            print("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against baseline")
+    else:
+        baselines[key] = report
+        with open(args.baseline, "w") as file:
+            json.dump(baselines, file, indent=4)
+        print(f"Baseline for {key} written to {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Horror", "Mystery", "Romance", "Sci-Fi", "Slice of Life", "Sports", "Supernatural"]
+TYPES = ["TV", "Movie", "OVA", "ONA", "Special"]
+
+def generate_catalog(root, n_anime, rng):
+    raw_dir = os.path.join(root, "artifacts", "raw_data")
+    os.makedirs(raw_dir, exist_ok=True)
+
+    # Sparse MAL-style ids, like the real catalog.
+    anime_ids = np.sort(rng.choice(np.arange(1, 3 * n_anime + 1), size=n_anime, replace=False))
+    names = [f"Anime {anime_id}" for anime_id in anime_ids]
+
+    scores = np.round(rng.uniform(4.0, 9.5, size=n_anime), 2).astype(str)
+    scores[rng.random(n_anime) < 0.1] = "Unknown"
+    english_names = np.array([f"Title {anime_id}" for anime_id in anime_ids], dtype=object)
+    english_names[rng.random(n_anime) < 0.3] = "Unknown"
+    genres = [", ".join(rng.choice(GENRES, size=rng.integers(1, 4), replace=False)) for _ in range(n_anime)]
+
+    pd.DataFrame({
+        "MAL_ID": anime_ids,
+        "Name": names,
+        "Score": scores,
+        "Genres": genres,
+        "English name": english_names,
+        "Japanese name": names,
+        "Type": rng.choice(TYPES, size=n_anime),
+        "Episodes": rng.integers(1, 100, size=n_anime).astype(str),
+        "Aired": "Apr 3, 2010 to Jun 26, 2010",
+        "Premiered": "Spring 2010",
+        "Members": rng.integers(100, 3_000_000, size=n_anime),
+    }).to_csv(os.path.join(raw_dir, "anime.csv"), index=False)
+
+    pd.DataFrame({
+        "MAL_ID": anime_ids,
+        "Name": names,
+        "Score": scores,
+        "Genres": genres,
+        "sypnopsis": [f"Synthetic synopsis for {name}. " * 8 for name in names],
+    }).to_csv(os.path.join(raw_dir, "anime_with_synopsis.csv"), index=False)
+
+    return anime_ids
+
+def generate_ratings(root, n_users, anime_ids, anime_factors, user_factors, ratings_per_user, rng, users_per_chunk=2000):
+    raw_dir = os.path.join(root, "artifacts", "raw_data")
+    n_anime, dim = anime_factors.shape
+
+    # Zipf-like popularity, so a few anime collect most of the ratings as in the real data.
+    popularity = 1.0 / (np.arange(n_anime) + 10.0) ** 0.8
+    popularity = popularity[rng.permutation(n_anime)]
+    popularity /= popularity.sum()
+
+    n_rows = 0
+    with open(os.path.join(raw_dir, "animelist.csv"), "w") as file:
+        file.write("user_id,anime_id,rating,watching_status,watched_episodes\n")
+
+        for start in range(0, n_users, users_per_chunk):
+            users = np.arange(start, min(start + users_per_chunk, n_users))
+            counts = np.maximum(rng.poisson(ratings_per_user, size=len(users)), 1)
+
+            user_rows = np.repeat(users, counts)
+            anime_rows = rng.choice(n_anime, size=len(user_rows), p=popularity)
+
+            pairs = np.unique(user_rows.astype(np.int64) * n_anime + anime_rows)
+            user_rows, anime_rows = pairs // n_anime, pairs % n_anime
+
+            affinity = np.einsum("ij,ij->i", user_factors[user_rows], anime_factors[anime_rows]) * np.sqrt(dim)
+            ratings = np.clip(np.rint(6 + 2 * affinity + rng.normal(0, 1, size=len(affinity))), 0, 10).astype(np.int64)
+
+            pd.DataFrame({
+                "user_id": user_rows + 1,
+                "anime_id": anime_ids[anime_rows],
+                "rating": ratings,
+                "watching_status": 2,
+                "watched_episodes": 12,
+            }).to_csv(file, header=False, index=False)
+            n_rows += len(pairs)
+
+    return n_rows
+
+def generate(root, n_users=10000, n_anime=20000, ratings_per_user=50, embedding_dim=128, seed=42):
+    """Writes raw rating/anime/synopsis CSVs under root/artifacts/raw_data plus the latent factors behind them."""
+    params = {"n_users": n_users, "n_anime": n_anime, "ratings_per_user": ratings_per_user, "embedding_dim": embedding_dim, "seed": seed}
+    synthetic_dir = os.path.join(root, "synthetic")
+    params_path = os.path.join(synthetic_dir, "params.json")
+
+    if os.path.exists(params_path):
+        with open(params_path) as file:
+            if json.load(file) == params:
+                return params
+
+    os.makedirs(synthetic_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    anime_factors = rng.normal(size=(n_anime, embedding_dim)).astype(np.float32)
+    anime_factors /= np.linalg.norm(anime_factors, axis=1, keepdims=True)
+    user_factors = rng.normal(size=(n_users, embedding_dim)).astype(np.float32)
+    user_factors /= np.linalg.norm(user_factors, axis=1, keepdims=True)
+
+    anime_ids = generate_catalog(root, n_anime, rng)
+    n_rows = generate_ratings(root, n_users, anime_ids, anime_factors, user_factors, ratings_per_user, rng)
+
+    np.save(os.path.join(synthetic_dir, "anime_ids.npy"), anime_ids)
+    np.save(os.path.join(synthetic_dir, "anime_factors.npy"), anime_factors)
+    np.save(os.path.join(synthetic_dir, "user_factors.npy"), user_factors)
+
+    with open(params_path, "w") as file:
+        json.dump(params, file)
+
+    print(f"Generated {n_users} users, {n_anime} anime and {n_rows} ratings under {root}")
+    return params
+
+def write_embeddings(root):
+    """Saves user/anime weights in encoded order from the latent factors, standing in for a trained model."""
+    from src.artifact_store import save_array
+    from config.paths_config import USER_IDS, ANIME_IDS, USER_WEIGHTS_PATH, ANIME_WEIGHTS_PATH, WEIGHTS_DIR
+
+    synthetic_dir = os.path.join(root, "synthetic")
+    anime_ids = np.load(os.path.join(synthetic_dir, "anime_ids.npy"))
+    anime_factors = np.load(os.path.join(synthetic_dir, "anime_factors.npy"))
+    user_factors = np.load(os.path.join(synthetic_dir, "user_factors.npy"))
+
+    os.makedirs(os.path.join(root, WEIGHTS_DIR), exist_ok=True)
+
+    # Raw user ids are row + 1; raw anime ids are looked up in the sorted catalog.
+    encoded_users = np.load(os.path.join(root, USER_IDS)) - 1
+    encoded_anime = np.searchsorted(anime_ids, np.load(os.path.join(root, ANIME_IDS)))
+
+    save_array(os.path.join(root, USER_WEIGHTS_PATH), user_factors[encoded_users], np.float32)
+    save_array(os.path.join(root, ANIME_WEIGHTS_PATH), anime_factors[encoded_anime], np.float32)
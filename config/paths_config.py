@@ -12,25 +12,65 @@ ANIMELIST_DATA_PATH = os.path.join(RAW_DATA_DIR, "animelist.csv")
 ANIME_DATA_PATH = os.path.join(RAW_DATA_DIR, "anime.csv")
 SYNOPSIS_DATA_PATH = os.path.join(RAW_DATA_DIR, "anime_with_synopsis.csv")
 
-X_TRAIN_ARRAY = os.path.join(PREPROCESSED_DATA_DIR, "X_train_array.pkl")
-X_TEST_ARRAY = os.path.join(PREPROCESSED_DATA_DIR, "X_test_array.pkl")
-Y_TRAIN = os.path.join(PREPROCESSED_DATA_DIR, "y_train.pkl")
-Y_TEST = os.path.join(PREPROCESSED_DATA_DIR, "y_test.pkl")
+X_TRAIN_ARRAY = os.path.join(PREPROCESSED_DATA_DIR, "X_train_array.npy")
+X_TEST_ARRAY = os.path.join(PREPROCESSED_DATA_DIR, "X_test_array.npy")
+Y_TRAIN = os.path.join(PREPROCESSED_DATA_DIR, "y_train.npy")
+Y_TEST = os.path.join(PREPROCESSED_DATA_DIR, "y_test.npy")
 
-RATING_DF = os.path.join(PREPROCESSED_DATA_DIR, "rating_df.csv")
+# Directory of one .npy file per column.
+RATING_DF = os.path.join(PREPROCESSED_DATA_DIR, "rating_df")
 ANIME_DF = os.path.join(PREPROCESSED_DATA_DIR, "anime_df.csv")
 SYNOPSIS_DF = os.path.join(PREPROCESSED_DATA_DIR, "synopsis_df.csv")
+# Titles and synopses as one UTF-8 blob plus MAL_ID -> (offset, length) columns, memory-mapped at serving time.
+SYNOPSIS_BLOB = os.path.join(PREPROCESSED_DATA_DIR, "synopsis_blob.bin")
+SYNOPSIS_INDEX = os.path.join(PREPROCESSED_DATA_DIR, "synopsis_index")
 
-USER2USER_ENCODED = os.path.join(PREPROCESSED_DATA_DIR, "user2user_encoded.pkl")
-USER2USER_DECODED = os.path.join(PREPROCESSED_DATA_DIR, "user2user_decoded.pkl")
+# Encoded id -> original id; the reverse mapping is rebuilt on load.
+USER_IDS = os.path.join(PREPROCESSED_DATA_DIR, "user_ids.npy")
+ANIME_IDS = os.path.join(PREPROCESSED_DATA_DIR, "anime_ids.npy")
 
-ANIME2ANIME_ENCODED = os.path.join(PREPROCESSED_DATA_DIR, "anime2anime_encoded.pkl")
-ANIME2ANIME_DECODED = os.path.join(PREPROCESSED_DATA_DIR, "anime2anime_decoded.pkl")
+USER_FAVOURITES_OFFSETS = os.path.join(PREPROCESSED_DATA_DIR, "user_favourites_offsets.npy")
+USER_FAVOURITES_ANIME = os.path.join(PREPROCESSED_DATA_DIR, "user_favourites_anime.npy")
 
 #################################### MODEL TRAINING ######################################
 MODEL_DIR = "artifacts/model"
 CHECKPOINT_DIR = os.path.join("artifacts","model_checkpoints", "weights.weights.h5")
 WEIGHTS_DIR = os.path.join("artifacts", "weights")
 MODEL_PATH = os.path.join(MODEL_DIR, "recommender_model.keras")
-ANIME_WEIGHTS_PATH = os.path.join(WEIGHTS_DIR, "anime_weights.h5")
-USER_WEIGHTS_PATH = os.path.join(WEIGHTS_DIR, "user_weights.h5")
+ANIME_WEIGHTS_PATH = os.path.join(WEIGHTS_DIR, "anime_weights.npy")
+USER_WEIGHTS_PATH = os.path.join(WEIGHTS_DIR, "user_weights.npy")
+# Dense + BatchNormalization parameters for TensorFlow-free rating prediction.
+SCORER_HEAD_PATH = os.path.join(WEIGHTS_DIR, "scorer_head.npz")
+# Wall-clock and test error of each training backend, for comparing Keras with ALS/SGD.
+TRAINING_REPORT_PATH = os.path.join(MODEL_DIR, "training_report.json")
+# Recall@k, NDCG@k and catalog coverage over the test split.
+EVALUATION_REPORT_PATH = os.path.join(MODEL_DIR, "evaluation_report.json")
+
+#################################### ANN INDEX ######################################
+USER_ANN_INDEX_PATH = os.path.join(WEIGHTS_DIR, "user_ann_index.pkl")
+ANIME_ANN_INDEX_PATH = os.path.join(WEIGHTS_DIR, "anime_ann_index.pkl")
+ANN_REPORT_PATH = os.path.join(WEIGHTS_DIR, "ann_report.json")
+
+#################################### QUANTIZATION ######################################
+USER_QUANT_INDEX_PATH = os.path.join(WEIGHTS_DIR, "user_quant_index.pkl")
+ANIME_QUANT_INDEX_PATH = os.path.join(WEIGHTS_DIR, "anime_quant_index.pkl")
+QUANT_REPORT_PATH = os.path.join(WEIGHTS_DIR, "quant_report.json")
+
+#################################### BATCH RECOMMENDATIONS ######################################
+# Hybrid top-N per encoded user (int32, -1 padded) and the weights it was computed with.
+USER_RECOMMENDATIONS_PATH = os.path.join(WEIGHTS_DIR, "user_recommendations.npy")
+USER_RECOMMENDATIONS_META_PATH = os.path.join(WEIGHTS_DIR, "user_recommendations.json")
+
+#################################### SERVING ######################################
+CACHE_DIR = os.path.join("artifacts", "cache")
+# Ratings of every user folded in while serving, one JSON line each; every serving process replays it.
+FOLD_IN_LOG_PATH = os.path.join("artifacts", "fold_in", "fold_in_log.jsonl")
+# One histogram snapshot per serving process; /metrics sums them so a scrape covers every worker.
+METRICS_DIR = os.path.join("artifacts", "metrics")
+
+# One directory per published version of the serving artifacts; CURRENT names the active one.
+RELEASES_DIR = os.path.join("artifacts", "releases")
+CURRENT_RELEASE_PATH = os.path.join(RELEASES_DIR, "CURRENT")
+
+#################################### PIPELINE ######################################
+STAGE_FINGERPRINTS_PATH = os.path.join("artifacts", "stage_fingerprints.json")
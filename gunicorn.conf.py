@@ -0,0 +1,45 @@
+import os
+import math
+from config.paths_config import CONFIG_FILE_PATH
+from utils.common_functions import read_yaml_file
+
+# Production entry point: gunicorn -c gunicorn.conf.py app:app
+#
+# The app (and with it the RecommenderIndex) is loaded once in the master and then forked, so every
+# worker maps the same .npy pages and shares the frames copy-on-write instead of loading its own copy.
+# Per-process state stays per worker: the in-memory recommendation cache (use the file backend to
+# share it) and the release watcher, so after a swap each worker holds its own copy of the new frames
+# until they are shared again on restart. /metrics sums the histograms every worker writes to METRICS_DIR,
+# so a scrape covers all workers. Users folded in through /api/users/fold_in are appended to
+# FOLD_IN_LOG_PATH, which every worker replays before serving a request.
+
+def available_cpus():
+    # cpu_count() reports the host's CPUs; a container only gets its affinity mask and CFS quota.
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as file:
+            quota, period = file.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+serving_config = read_yaml_file(CONFIG_FILE_PATH).get("serving", {})
+
+bind = os.environ.get("BIND", serving_config.get("bind", "0.0.0.0:5000"))
+workers = int(os.environ.get("WEB_CONCURRENCY", serving_config.get("workers") or available_cpus()))
+threads = serving_config.get("threads", 2)
+timeout = serving_config.get("timeout", 120)
+preload_app = True
+
+def on_starting(server):
+    # Runs in the master after the preloaded app is imported, so workers are forked already warm.
+    import app
+    app.warmup()
+
+def post_worker_init(worker):
+    import app
+    if not app.ready:
+        app.warmup()
+    app.start_release_watcher()
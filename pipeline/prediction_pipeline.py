@@ -1,81 +1,228 @@
+import numpy as np
 import pandas as pd
 from config.paths_config import *
 from utils.helper import *
+from src.recommender_index import RecommenderIndex
+from src.metrics import span
+from src.logger import logging
 
-def hybrid_recommendation(user_id, user_weight=0.5, content_weight=0.5):
+def hybrid_recommendation(user_id, user_weight=0.5, content_weight=0.5, index=None):
+
+    if index is None:
+        index = RecommenderIndex().load()
+
+    if index.has_user_favourites:
+        result = hybrid_recommendation_batch([user_id], user_weight, content_weight, index=index)[0]
+        if "error" in result:
+            raise ValueError(result["error"])
+        return result["recommendations"]
 
     # ---------- USER BASED ----------
-    similar_users = find_similar_users(
-        user_id, USER_WEIGHTS_PATH, USER2USER_ENCODED, USER2USER_DECODED, top_n=10
-    )
+    with span("user_similarity"):
+        similar_users = find_similar_users(
+            user_id, index.user_weights, index.user2user_encoded, index.user2user_decoded, top_n=10,
+            ann_index=index.user_search_index
+        )
 
-    user_pref = getUserPreferences(user_id, RATING_DF, ANIME_DF)
+    with span("neighbour_preferences"):
+        user_pref = getUserPreferences(user_id, index.rating_df, index.anime_df)
 
-    user_recommended_anime = getUserRecommendation(
-        similar_users, user_pref, ANIME_DF, RATING_DF, SYNOPSIS_DF
-    )
+        user_recommended_anime = getUserRecommendation(
+            similar_users, user_pref, index.anime_df, index.rating_df, index.synopses, lookup=index.anime_lookup
+        )
 
     user_recommended_anime_lst = user_recommended_anime.anime_name.to_list()
 
     # ---------- CONTENT BASED ----------
     content_recommended_anime_lst = []
 
-    for anime in user_recommended_anime_lst:
-
-        similar_anime = find_similar_animes(
-            anime,
-            ANIME_WEIGHTS_PATH,
-            ANIME2ANIME_ENCODED,
-            ANIME2ANIME_DECODED,
-            ANIME_DF,
-            SYNOPSIS_DF,
-            top_n=10
+    with span("content_expansion"):
+        similar_animes = find_similar_animes_batch(
+            user_recommended_anime_lst,
+            index.anime_weights,
+            index.anime2anime_encoded,
+            index.anime2anime_decoded,
+            index.anime_df,
+            top_n=10,
+            lookup=index.anime_lookup
         )
 
-        if similar_anime is not None and not similar_anime.empty:
-            content_recommended_anime_lst.extend(
-                similar_anime.anime_name.to_list()
-            )
+        for anime in user_recommended_anime_lst:
+
+            similar_anime = similar_animes.get(anime)
 
-    # ---------- COMBINE SCORES ----------
-    combined_scores = {}
+            if similar_anime is not None and not similar_anime.empty:
+                content_recommended_anime_lst.extend(
+                    similar_anime.anime_name.to_list()
+                )
 
-    for anime in user_recommended_anime_lst:
-        combined_scores[anime] = combined_scores.get(anime, 0) + user_weight
+        # ---------- COMBINE SCORES ----------
+        combined_scores = {}
 
-    for anime in content_recommended_anime_lst:
-        combined_scores[anime] = combined_scores.get(anime, 0) + content_weight
+        for anime in user_recommended_anime_lst:
+            combined_scores[anime] = combined_scores.get(anime, 0) + user_weight
 
-    # ---------- SORT ----------
-    sorted_animes = sorted(
-        combined_scores.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )
+        for anime in content_recommended_anime_lst:
+            combined_scores[anime] = combined_scores.get(anime, 0) + content_weight
 
-    anime_lst = [anime for anime, score in sorted_animes[:10]]
+        # ---------- SORT ----------
+        sorted_animes = sorted(
+            combined_scores.items(),
+            key=lambda x: x[1],
+            reverse=True
+        )
+
+        anime_lst = [anime for anime, score in sorted_animes[:10]]
 
     # ---------- BUILD DETAILED RESPONSE ----------
     recommendations = []
-    anime_df = pd.read_csv(ANIME_DF)
-    synopsis_df = pd.read_csv(SYNOPSIS_DF)
-
-    for anime_name in anime_lst:
-        anime_frame = getAnimeFrame(anime_name, anime_df)
-        if anime_frame is not None and not anime_frame.empty:
-            anime_id = anime_frame.anime_id.values[0]
-            genre = anime_frame.Genres.values[0] if pd.notna(anime_frame.Genres.values[0]) else "Various Genres"
-            synopsis = getSynopsis(anime_name, synopsis_df)
-            mal_rating = anime_frame.Score.values[0]
-            if pd.isna(mal_rating):
-                mal_rating = None
-
-            recommendations.append({
-                "anime_id": anime_id,
-                "anime_name": anime_name,
-                "genre": genre,
-                "synopsis": synopsis if synopsis else "No synopsis available",
-                "mal_rating": mal_rating
-            })
+    anime_df = index.anime_df
+    synopsis_df = index.synopses
+
+    with span("metadata_lookup"):
+        for anime_name in anime_lst:
+            anime_frame = getAnimeFrame(anime_name, anime_df, index.anime_lookup)
+            if anime_frame is not None and not anime_frame.empty:
+                # Plain Python types, as in _recommendation_details, so the response serialises to JSON.
+                anime_id = int(anime_frame.anime_id.values[0])
+                genre = anime_frame.Genres.values[0] if pd.notna(anime_frame.Genres.values[0]) else "Various Genres"
+                synopsis = getSynopsis(anime_name, synopsis_df, index.anime_lookup)
+                mal_rating = anime_frame.Score.values[0]
+                mal_rating = None if pd.isna(mal_rating) else float(mal_rating)
+
+                recommendations.append({
+                    "anime_id": anime_id,
+                    "anime_name": anime_name,
+                    "genre": genre,
+                    "synopsis": synopsis if synopsis else "No synopsis available",
+                    "mal_rating": mal_rating
+                })
 
     return recommendations
+
+def _recommendation_details(index, encoded_anime_id):
+    anime_row = index.anime_df.iloc[index.anime_rows[encoded_anime_id]]
+    anime_name = anime_row.eng_version
+    genre = anime_row.Genres if pd.notna(anime_row.Genres) else "Various Genres"
+    synopsis = getSynopsis(anime_name, index.synopses, index.anime_lookup)
+    mal_rating = None if pd.isna(anime_row.Score) else float(anime_row.Score)
+
+    return {
+        "anime_id": int(anime_row.anime_id),
+        "anime_name": anime_name,
+        "genre": genre,
+        "synopsis": synopsis if synopsis else "No synopsis available",
+        "mal_rating": mal_rating
+    }
+
+def hybrid_top_animes(index, encoded_user_ids, user_weight=0.5, content_weight=0.5, rerank_pool=None, top_n=10):
+    """Encoded anime ids of the hybrid top-n for each encoded user, or the exception that user raised."""
+
+    # ---------- USER BASED ----------
+    with span("user_similarity"):
+        if index.user_search_index is not None:
+            closest_users, _ = index.user_search_index.search(index.user_weights, encoded_user_ids, top_n=10)
+        else:
+            closest_users, _ = find_top_k(index.user_weights, encoded_user_ids, top_n=10)
+
+    with span("neighbour_preferences"):
+        user_recommended = []
+        for encoded_user_id, neighbours in zip(encoded_user_ids, closest_users):
+            candidates, _ = rank_user_favourites(
+                neighbours[neighbours >= 0], encoded_user_id, index.user_favourites_offsets, index.user_favourites_anime, top_n=10,
+                overrides=index.user_favourites_overrides
+            )
+            user_recommended.append(candidates[index.anime_rows[candidates] >= 0])
+
+    # ---------- CONTENT BASED ----------
+    with span("content_expansion"):
+        # Every seed of every user is scored against the anime embeddings in one blocked matmul.
+        seeds = np.unique(np.concatenate(user_recommended))
+        closest_animes = np.empty((0, 10), dtype=np.int64)
+        if len(seeds) and index.anime_search_index is not None:
+            closest_animes, _ = index.anime_search_index.search(index.anime_weights, seeds, top_n=10)
+        elif len(seeds):
+            closest_animes, _ = find_top_k(index.anime_weights, seeds, top_n=10)
+
+        # ---------- COMBINE SCORES ----------
+        top_animes = []
+        for encoded_user_id, candidates in zip(encoded_user_ids, user_recommended):
+            try:
+                similar = closest_animes[np.searchsorted(seeds, candidates)].ravel()
+                similar = similar[similar >= 0]
+                similar = similar[index.anime_rows[similar] >= 0]
+
+                if rerank_pool and index.rating_scorer is not None:
+                    # Widen the pool by vote score, then order it by the model's predicted rating.
+                    pool, _ = expand_content(candidates, similar, user_weight, content_weight, top_n=rerank_pool)
+                    predicted = index.rating_scorer.predict_for_user(encoded_user_id, pool)
+                    top_animes.append(pool[np.argsort(-predicted, kind="stable")[:top_n]])
+                else:
+                    top_animes.append(expand_content(candidates, similar, user_weight, content_weight, top_n=top_n)[0])
+            except Exception as e:
+                top_animes.append(e)
+
+    return top_animes
+
+def hybrid_recommendation_batch(user_ids, user_weight=0.5, content_weight=0.5, index=None, rerank_pool=None, materialised=True):
+
+    if index is None:
+        index = RecommenderIndex().load()
+
+    results = {}
+    known_user_ids = []
+    encoded_user_ids = []
+
+    for user_id in user_ids:
+        encoded_user_id = index.user2user_encoded.get(user_id)
+        if encoded_user_id is None:
+            results[user_id] = {"user_id": user_id, "error": f"Unknown user_id: {user_id}"}
+            continue
+        known_user_ids.append(user_id)
+        encoded_user_ids.append(encoded_user_id)
+
+    if known_user_ids and not index.has_user_favourites:
+        for user_id in known_user_ids:
+            try:
+                results[user_id] = {"user_id": user_id, "recommendations": hybrid_recommendation(user_id, user_weight, content_weight, index=index)}
+            except Exception as e:
+                logging.error(f"Error recommending for user {user_id}: {e}")
+                results[user_id] = {"user_id": user_id, "error": str(e)}
+        return [results[user_id] for user_id in user_ids]
+
+    top_animes_by_user = {}
+
+    # ---------- MATERIALISED ----------
+    if materialised and known_user_ids:
+        with span("materialised_lookup"):
+            online_user_ids, online_encoded_user_ids = [], []
+            for user_id, encoded_user_id in zip(known_user_ids, encoded_user_ids):
+                top_animes = index.materialised_recommendations(encoded_user_id, user_weight, content_weight, rerank_pool)
+                if top_animes is None:
+                    online_user_ids.append(user_id)
+                    online_encoded_user_ids.append(encoded_user_id)
+                else:
+                    top_animes_by_user[user_id] = top_animes
+            known_user_ids, encoded_user_ids = online_user_ids, online_encoded_user_ids
+
+    if known_user_ids:
+        for user_id, top_animes in zip(known_user_ids, hybrid_top_animes(index, encoded_user_ids, user_weight, content_weight, rerank_pool=rerank_pool)):
+            if isinstance(top_animes, Exception):
+                logging.error(f"Error recommending for user {user_id}: {top_animes}")
+                results[user_id] = {"user_id": user_id, "error": str(top_animes)}
+            else:
+                top_animes_by_user[user_id] = top_animes
+
+    # ---------- BUILD DETAILED RESPONSE ----------
+    with span("metadata_lookup"):
+        for user_id, top_animes in top_animes_by_user.items():
+            try:
+                results[user_id] = {
+                    "user_id": user_id,
+                    "recommendations": [_recommendation_details(index, anime) for anime in top_animes]
+                }
+            except Exception as e:
+                logging.error(f"Error recommending for user {user_id}: {e}")
+                results[user_id] = {"user_id": user_id, "error": str(e)}
+
+    return [results[user_id] for user_id in user_ids]
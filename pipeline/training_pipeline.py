@@ -1,27 +1,140 @@
 import sys
+import argparse
 from src.data_ingestion import DataIngestion
 from src.data_processing import DataProcessor
-from src.model_training import ModelTrainer
+from src.evaluation import RankingEvaluator
+from src.ann_index import ANNIndexBuilder
+from src.quantization import QuantizedIndexBuilder
+from src.batch_recommendations import BatchRecommender
+from src.stage_cache import StageCache
+from src.artifact_release import RELEASE_ARTIFACTS, publish_release
 from config.paths_config import *
 from src.logger import logging
 from src.exception import CustomException
+from utils.common_functions import read_yaml_file
+
+def run_data_processing(config_path):
+    data_processor = DataProcessor(input_file=ANIMELIST_DATA_PATH, output_dir=PREPROCESSED_DATA_DIR, config_path=config_path)
+    data_processor.run()
+
+def run_model_training(config_path):
+    # Imported per backend so the ALS/SGD path runs without TensorFlow installed.
+    if read_yaml_file(config_path)["model_training"].get("backend", "keras") == "keras":
+        from src.model_training import ModelTrainer
+        model_trainer = ModelTrainer(config_path=config_path)
+    else:
+        from src.mf_training import MatrixFactorizationTrainer
+        model_trainer = MatrixFactorizationTrainer(config_path=config_path)
+    model_trainer.train()
+
+def run_evaluation(config_path):
+    ranking_evaluator = RankingEvaluator(config_path=config_path)
+    ranking_evaluator.run()
+
+def run_ann_index(config_path):
+    ann_index_builder = ANNIndexBuilder(config_path=config_path)
+    ann_index_builder.run()
+
+def run_quantization(config_path):
+    quantized_index_builder = QuantizedIndexBuilder(config_path=config_path)
+    quantized_index_builder.run()
+
+def run_materialisation(config_path):
+    batch_recommender = BatchRecommender(config_path=config_path)
+    batch_recommender.run()
+
+def run_release(config_path):
+    releases_config = read_yaml_file(config_path).get("releases", {})
+    if releases_config.get("enabled", True):
+        publish_release(keep=releases_config.get("keep", 3))
+
+# name, run, inputs, config section, outputs; a stage's inputs are earlier stages' outputs.
+STAGES = [
+    (
+        "data_processing", run_data_processing,
+        [ANIMELIST_DATA_PATH, ANIME_DATA_PATH, SYNOPSIS_DATA_PATH],
+        "data_processing",
+        [X_TRAIN_ARRAY, X_TEST_ARRAY, Y_TRAIN, Y_TEST, RATING_DF, ANIME_DF, SYNOPSIS_DF, SYNOPSIS_BLOB, SYNOPSIS_INDEX, USER_IDS, ANIME_IDS, USER_FAVOURITES_OFFSETS, USER_FAVOURITES_ANIME],
+    ),
+    (
+        "model_training", run_model_training,
+        [X_TRAIN_ARRAY, X_TEST_ARRAY, Y_TRAIN, Y_TEST],
+        "model_training",
+        [MODEL_PATH, USER_WEIGHTS_PATH, ANIME_WEIGHTS_PATH, SCORER_HEAD_PATH, TRAINING_REPORT_PATH],
+    ),
+    (
+        "evaluation", run_evaluation,
+        [X_TRAIN_ARRAY, X_TEST_ARRAY, Y_TEST, USER_WEIGHTS_PATH, ANIME_WEIGHTS_PATH],
+        "evaluation",
+        [EVALUATION_REPORT_PATH],
+    ),
+    (
+        "ann_index", run_ann_index,
+        [USER_WEIGHTS_PATH, ANIME_WEIGHTS_PATH],
+        "ann_index",
+        [USER_ANN_INDEX_PATH, ANIME_ANN_INDEX_PATH, ANN_REPORT_PATH],
+    ),
+    (
+        "quantization", run_quantization,
+        [USER_WEIGHTS_PATH, ANIME_WEIGHTS_PATH],
+        "quantization",
+        [USER_QUANT_INDEX_PATH, ANIME_QUANT_INDEX_PATH, QUANT_REPORT_PATH],
+    ),
+    (
+        "materialisation", run_materialisation,
+        [USER_WEIGHTS_PATH, ANIME_WEIGHTS_PATH, USER_IDS, ANIME_IDS, ANIME_DF, USER_FAVOURITES_OFFSETS, USER_FAVOURITES_ANIME,
+         USER_ANN_INDEX_PATH, ANIME_ANN_INDEX_PATH, USER_QUANT_INDEX_PATH, ANIME_QUANT_INDEX_PATH, SCORER_HEAD_PATH],
+        "materialisation",
+        [USER_RECOMMENDATIONS_PATH, USER_RECOMMENDATIONS_META_PATH],
+    ),
+    (
+        "release", run_release,
+        list(RELEASE_ARTIFACTS.values()),
+        "releases",
+        [CURRENT_RELEASE_PATH],
+    ),
+]
+
+STAGE_NAMES = [stage[0] for stage in STAGES]
 
 class TrainingPipeline:
     def __init__(self, config_path):
         self.config_path = config_path
+        self.config = read_yaml_file(config_path)
+
+    def run_pipeline(self, force=False, from_stage=None):
+        try:
+            if from_stage is not None and from_stage not in STAGE_NAMES:
+                raise ValueError(f"Unknown stage: {from_stage}. Expected one of {STAGE_NAMES}")
 
-    def run_pipeline(self):
+            stage_cache = StageCache()
+            forced = STAGE_NAMES if force else STAGE_NAMES[STAGE_NAMES.index(from_stage):] if from_stage else []
 
-        data_processor = DataProcessor(input_file=ANIMELIST_DATA_PATH, output_dir=PREPROCESSED_DATA_DIR)
-        data_processor.run()
+            for name, run, inputs, config_section, outputs in STAGES:
+                section = self.config.get(config_section, {})
 
-        model_trainer = ModelTrainer(config_path=self.config_path)
-        model_trainer.train()
+                if name not in forced and stage_cache.is_fresh(name, inputs, section, outputs):
+                    logging.info(f"Skipping stage {name}: inputs, config and outputs unchanged")
+                    continue
+
+                logging.info(f"Running stage {name}")
+                stage_cache.invalidate(name)
+                run(self.config_path)
+                stage_cache.record(name, inputs, section, outputs)
+
+        except Exception as e:
+            logging.error(f"Error in training pipeline: {e}")
+            raise CustomException(e, sys)
 
 if __name__ == "__main__":
     try:
+        parser = argparse.ArgumentParser(description="Run the training pipeline, skipping stages whose inputs are unchanged.")
+        parser.add_argument("--force", action="store_true", help="Rerun every stage.")
+        parser.add_argument("--from-stage", choices=STAGE_NAMES, help="Rerun this stage and every stage after it.")
+        args = parser.parse_args()
+
         training_pipeline = TrainingPipeline(config_path=CONFIG_FILE_PATH)
-        training_pipeline.run_pipeline()
+        training_pipeline.run_pipeline(force=args.force, from_stage=args.from_stage)
 
         logging.info("Training pipeline executed successfully")
     except Exception as e:
@@ -0,0 +1,92 @@
+import sys
+import bisect
+import unicodedata
+import numpy as np
+import pandas as pd
+from src.logger import logging
+from src.exception import CustomException
+
+def normalise_title(title):
+    # Case, width and spacing differences should not matter when a user types a title.
+    return " ".join(unicodedata.normalize("NFKC", str(title)).casefold().split())
+
+def _first_rows(keys):
+    # Same answer as df[df.key == value].values[0]: the first row holding each key.
+    keys = pd.Series(np.arange(len(keys)), index=keys)
+    keys = keys[~keys.index.duplicated(keep="first") & keys.index.notna()]
+    return dict(zip(keys.index.tolist(), keys.values.tolist()))
+
+class AnimeLookup:
+    """Hash indexes from anime id and title to frame rows, plus a sorted prefix index over eng_version and Name for typeahead."""
+
+    def __init__(self, anime_df, synopses=None, max_prefix_matches=5000):
+        try:
+            self.anime_df = anime_df
+            self.max_prefix_matches = max_prefix_matches
+
+            self.id_rows = _first_rows(anime_df["anime_id"].values)
+            self.title_rows = _first_rows(anime_df["eng_version"].values)
+            self.normalised_rows = _first_rows([normalise_title(title) if pd.notna(title) else None for title in anime_df["eng_version"].values])
+
+            self.synopsis_id_rows, self.synopsis_title_rows = {}, {}
+            titles = list(zip(anime_df["eng_version"].values, range(len(anime_df))))
+            if isinstance(synopses, pd.DataFrame):
+                synopsis_ids, synopsis_names = synopses["MAL_ID"].values, synopses["Name"].values
+                self.synopsis_id_rows = _first_rows(synopsis_ids)
+                self.synopsis_title_rows = _first_rows(synopsis_names)
+            elif synopses is not None:
+                # A SynopsisStore already holds these indexes.
+                synopsis_ids, synopsis_names = synopses.ids, synopses.names
+                self.synopsis_id_rows, self.synopsis_title_rows = synopses.id_rows, synopses.name_rows
+            if synopses is not None:
+                # Original titles are searchable too, pointing at the anime frame row of the same id.
+                titles += [(name, self.id_rows[mal_id]) for mal_id, name in zip(synopsis_ids.tolist(), synopsis_names) if mal_id in self.id_rows]
+
+            # Every word start is a key, so "titan" finds "Attack on Titan".
+            entries = set()
+            for title, row in titles:
+                if pd.isna(title):
+                    continue
+                words = normalise_title(title).split(" ")
+                for start in range(len(words)):
+                    entries.add((" ".join(words[start:]), row))
+
+            entries = sorted(entries)
+            self.prefix_keys = [key for key, _ in entries]
+            self.prefix_rows = np.asarray([row for _, row in entries], dtype=np.int64)
+
+            logging.info(f"Anime lookup built. Ids: {len(self.id_rows)}, Titles: {len(self.title_rows)}, Prefix keys: {len(self.prefix_keys)}")
+
+        except Exception as e:
+            logging.error(f"Error building anime lookup: {e}")
+            raise CustomException(e, sys)
+
+    def anime_row(self, anime):
+        if isinstance(anime, int):
+            return self.id_rows.get(anime)
+        if isinstance(anime, str):
+            return self.title_rows.get(anime)
+        return None
+
+    def synopsis_row(self, anime):
+        if isinstance(anime, int):
+            return self.synopsis_id_rows.get(anime)
+        if isinstance(anime, str):
+            return self.synopsis_title_rows.get(anime)
+        return None
+
+    def search(self, query, limit=10):
+        """Anime frame rows whose title, or a word of it, starts with query; best scored first."""
+        query = normalise_title(query)
+        if not query:
+            return np.empty(0, dtype=np.int64)
+
+        start = bisect.bisect_left(self.prefix_keys, query)
+        stop = bisect.bisect_left(self.prefix_keys, query + "\U0010ffff", lo=start)
+
+        # The frame is sorted by score, so the lowest rows are the best matches; an exact title goes first.
+        rows = np.unique(self.prefix_rows[start:min(stop, start + self.max_prefix_matches)])
+        exact = self.normalised_rows.get(query)
+        if exact is not None:
+            rows = np.concatenate([[exact], rows[rows != exact]])
+        return rows[:limit]
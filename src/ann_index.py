@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+from utils.common_functions import read_yaml_file
+from utils.helper import find_top_k
+from src.artifact_store import load_artifact
+
+class IVFIndex:
+    """Inverted-file index over L2-normalised embeddings with a spherical k-means coarse quantizer."""
+
+    def __init__(self, n_lists=256, n_probe=8, n_iter=10, random_state=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.random_state = random_state
+
+        self.centroids = None
+        self.list_offsets = None
+        self.list_ids = None
+        self.n_items = 0
+        # Items added or moved after build; searched exhaustively on every query.
+        self.extra_ids = np.empty(0, dtype=np.int32)
+
+    def _assign(self, weights, block_size=65536):
+        assign = np.empty(weights.shape[0], dtype=np.int32)
+        for start in range(0, weights.shape[0], block_size):
+            assign[start:start + block_size] = np.argmax(weights[start:start + block_size] @ self.centroids.T, axis=1)
+        return assign
+
+    def build(self, weights):
+        try:
+            weights = np.asarray(weights, dtype=np.float32)
+            rng = np.random.default_rng(self.random_state)
+
+            self.n_items = weights.shape[0]
+            # Keep enough points per list for the centroids to be meaningful.
+            self.n_lists = max(1, min(self.n_lists, self.n_items // 32))
+            self.centroids = weights[rng.choice(self.n_items, size=self.n_lists, replace=False)].copy()
+
+            for _ in range(self.n_iter):
+                assign = self._assign(weights)
+
+                # One-hot (lists x items) matmul sums each list's members in one pass; np.add.at is unbuffered and slow.
+                membership = sp.csr_matrix((np.ones(self.n_items, dtype=np.float32), (assign, np.arange(self.n_items))), shape=(self.n_lists, self.n_items))
+                sums = np.asarray(membership @ weights, dtype=np.float32)
+                counts = np.bincount(assign, minlength=self.n_lists)
+
+                empty = counts == 0
+                if empty.any():
+                    sums[empty] = weights[rng.choice(self.n_items, size=int(empty.sum()), replace=False)]
+
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                self.centroids = sums / np.maximum(norms, 1e-12)
+
+            assign = self._assign(weights)
+            self.list_ids = np.argsort(assign, kind="stable").astype(np.int32)
+            self.list_offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assign, minlength=self.n_lists), out=self.list_offsets[1:])
+
+            logging.info(f"IVF index built over {self.n_items} items with {self.n_lists} lists")
+            return self
+
+        except Exception as e:
+            logging.error(f"Error building IVF index: {e}")
+            raise CustomException(e, sys)
+
+    def add(self, ids):
+        self.extra_ids = np.union1d(self.extra_ids, np.asarray(ids, dtype=np.int32)).astype(np.int32)
+        return self
+
+    def search(self, weights, query_ids, top_n=10, n_probe=None, exclude_self=True):
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        query_ids = np.atleast_1d(np.asarray(query_ids, dtype=np.int64))
+        queries = weights[query_ids]
+
+        probe_scores = queries @ self.centroids.T
+        if n_probe < self.n_lists:
+            probes = np.argpartition(-probe_scores, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.tile(np.arange(self.n_lists), (len(query_ids), 1))
+
+        closest = np.full((len(query_ids), top_n), -1, dtype=np.int64)
+        dists = np.full((len(query_ids), top_n), -np.inf, dtype=np.float32)
+
+        for row, (query_id, query, lists) in enumerate(zip(query_ids, queries, probes)):
+            candidates = np.concatenate([self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists])
+            if len(self.extra_ids):
+                candidates = np.union1d(candidates, self.extra_ids)
+            if exclude_self:
+                candidates = candidates[candidates != query_id]
+            if len(candidates) == 0:
+                continue
+
+            scores = weights[candidates] @ query
+            k = min(top_n, len(candidates))
+            part = np.argpartition(-scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+            part = part[np.argsort(-scores[part], kind="stable")]
+
+            closest[row, :k] = candidates[part]
+            dists[row, :k] = scores[part]
+
+        return closest, dists
+
+    def save(self, path):
+        joblib.dump({
+            "n_lists": self.n_lists,
+            "n_probe": self.n_probe,
+            "n_iter": self.n_iter,
+            "random_state": self.random_state,
+            "n_items": self.n_items,
+            "centroids": self.centroids,
+            "list_offsets": self.list_offsets,
+            "list_ids": self.list_ids,
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        state = joblib.load(path)
+        index = cls(n_lists=state["n_lists"], n_probe=state["n_probe"], n_iter=state["n_iter"], random_state=state["random_state"])
+        index.n_items = state["n_items"]
+        index.centroids = state["centroids"]
+        index.list_offsets = state["list_offsets"]
+        index.list_ids = state["list_ids"]
+        return index
+
+def evaluate_recall(index, weights, n_queries=1000, top_n=10, probe_grid=(1, 2, 4, 8, 16, 32), random_state=42):
+    rng = np.random.default_rng(random_state)
+    query_ids = rng.choice(weights.shape[0], size=min(n_queries, weights.shape[0]), replace=False)
+
+    start = time.perf_counter()
+    exact, _ = find_top_k(weights, query_ids, top_n=top_n)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(query_ids)
+
+    report = {"n_items": int(weights.shape[0]), "n_queries": int(len(query_ids)), "top_n": top_n, "exact_ms_per_query": exact_ms, "probes": []}
+
+    for n_probe in probe_grid:
+        if n_probe > index.n_lists:
+            break
+
+        start = time.perf_counter()
+        approx, _ = index.search(weights, query_ids, top_n=top_n, n_probe=n_probe)
+        approx_ms = (time.perf_counter() - start) * 1000 / len(query_ids)
+
+        hits = sum(len(np.intersect1d(a, e)) for a, e in zip(approx, exact))
+        report["probes"].append({
+            "n_probe": n_probe,
+            "recall_at_k": hits / exact.size,
+            "ms_per_query": approx_ms,
+        })
+
+    return report
+
+class ANNIndexBuilder:
+    def __init__(self, config_path):
+        self.config = read_yaml_file(config_path)
+        self.ann_config = self.config.get("ann_index", {})
+
+        os.makedirs(WEIGHTS_DIR, exist_ok=True)
+
+    def build_index(self, weights_path, index_path, n_lists, min_items):
+        try:
+            weights = load_artifact(weights_path)
+
+            # Exact search is already cheap on small matrices; serving falls back to it when no index exists.
+            if weights.shape[0] < min_items:
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+                logging.info(f"Skipping ANN index for {weights_path}: {weights.shape[0]} items is below min_items")
+                return None
+
+            index = IVFIndex(
+                n_lists=n_lists,
+                n_probe=self.ann_config.get("n_probe", 8),
+                n_iter=self.ann_config.get("n_iter", 10),
+                random_state=self.ann_config.get("random_state", 42),
+            ).build(weights)
+            index.save(index_path)
+
+            report = evaluate_recall(
+                index,
+                weights,
+                n_queries=self.ann_config.get("eval_queries", 1000),
+                top_n=self.ann_config.get("eval_top_n", 10),
+                probe_grid=self.ann_config.get("probe_grid", [1, 2, 4, 8, 16, 32]),
+            )
+
+            logging.info(f"ANN index saved to {index_path}. Recall vs latency: {report}")
+            return report
+
+        except Exception as e:
+            logging.error(f"Error building ANN index from {weights_path}: {e}")
+            raise CustomException(e, sys)
+
+    def run(self):
+        try:
+            reports = {
+                "user": self.build_index(USER_WEIGHTS_PATH, USER_ANN_INDEX_PATH, self.ann_config.get("user_n_lists", 1024), self.ann_config.get("min_items", 50000)),
+                "anime": self.build_index(ANIME_WEIGHTS_PATH, ANIME_ANN_INDEX_PATH, self.ann_config.get("anime_n_lists", 128), self.ann_config.get("anime_min_items", self.ann_config.get("min_items", 50000))),
+            }
+
+            with open(ANN_REPORT_PATH, "w") as file:
+                json.dump(reports, file, indent=4)
+
+            logging.info(f"ANN indexes built successfully. Report: {ANN_REPORT_PATH}")
+            return reports
+
+        except Exception as e:
+            logging.error(f"Error in the ANN index build: {e}")
+            raise CustomException(e, sys)
+
+if __name__ == "__main__":
+    try:
+        ann_index_builder = ANNIndexBuilder(config_path=CONFIG_FILE_PATH)
+        ann_index_builder.run()
+    except Exception as e:
+        logging.error(f"Error in ANN index build execution: {e}")
+        raise CustomException(e, sys)
@@ -0,0 +1,193 @@
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+from src.logger import logging
+from src.exception import CustomException
+from src.stage_cache import StageCache
+from config.paths_config import *
+
+# RecommenderIndex argument -> artifact it reads; a release directory holds one copy of each under its base name.
+RELEASE_ARTIFACTS = {
+    "user_weights_path": USER_WEIGHTS_PATH,
+    "anime_weights_path": ANIME_WEIGHTS_PATH,
+    "user_ids_path": USER_IDS,
+    "anime_ids_path": ANIME_IDS,
+    "rating_df_path": RATING_DF,
+    "anime_df_path": ANIME_DF,
+    "synopsis_df_path": SYNOPSIS_DF,
+    "synopsis_blob_path": SYNOPSIS_BLOB,
+    "synopsis_index_path": SYNOPSIS_INDEX,
+    "user_ann_index_path": USER_ANN_INDEX_PATH,
+    "anime_ann_index_path": ANIME_ANN_INDEX_PATH,
+    "user_quant_index_path": USER_QUANT_INDEX_PATH,
+    "anime_quant_index_path": ANIME_QUANT_INDEX_PATH,
+    "user_favourites_offsets_path": USER_FAVOURITES_OFFSETS,
+    "user_favourites_anime_path": USER_FAVOURITES_ANIME,
+    "scorer_head_path": SCORER_HEAD_PATH,
+    "user_recommendations_path": USER_RECOMMENDATIONS_PATH,
+    "user_recommendations_meta_path": USER_RECOMMENDATIONS_META_PATH,
+}
+REQUIRED_ARTIFACTS = ["user_weights_path", "anime_weights_path", "user_ids_path", "anime_ids_path", "anime_df_path", "synopsis_df_path"]
+
+################## PUBLISHING #################
+
+def _copy_artifact(source, destination):
+    # Copies rather than hard links: the pipeline rewrites its outputs in place, which would alter a linked release.
+    if os.path.isdir(source):
+        shutil.copytree(source, destination)
+    else:
+        shutil.copy2(source, destination)
+
+def _artifact_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+def current_release(releases_dir=RELEASES_DIR):
+    pointer = os.path.join(releases_dir, "CURRENT")
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as file:
+        return file.read().strip() or None
+
+def release_paths(version, releases_dir=RELEASES_DIR):
+    release_dir = os.path.join(releases_dir, version)
+    return {argument: os.path.join(release_dir, os.path.basename(path)) for argument, path in RELEASE_ARTIFACTS.items()}
+
+def verify_release(version, releases_dir=RELEASES_DIR):
+    release_dir = os.path.join(releases_dir, version)
+    with open(os.path.join(release_dir, "manifest.json")) as file:
+        manifest = json.load(file)
+
+    # Sizes catch truncated copies without rehashing gigabytes on every swap.
+    for name, entry in manifest["files"].items():
+        path = os.path.join(release_dir, name)
+        if not os.path.exists(path) or _artifact_size(path) != entry["size"]:
+            raise ValueError(f"Release {version}: {name} is missing or does not match its manifest")
+    return manifest
+
+def publish_release(version=None, releases_dir=RELEASES_DIR, keep=3):
+    """Snapshots the current pipeline outputs as a new release and points CURRENT at it."""
+    try:
+        missing = [RELEASE_ARTIFACTS[argument] for argument in REQUIRED_ARTIFACTS if not os.path.exists(RELEASE_ARTIFACTS[argument])]
+        if missing:
+            raise FileNotFoundError(f"Cannot publish a release without {missing}")
+
+        version = version or time.strftime("%Y%m%d-%H%M%S")
+        release_dir = os.path.join(releases_dir, version)
+        os.makedirs(releases_dir, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(dir=releases_dir, prefix=f".{version}.")
+
+        stage_cache = StageCache()
+        files = {}
+        for argument, path in RELEASE_ARTIFACTS.items():
+            if not os.path.exists(path):
+                continue
+            _copy_artifact(path, os.path.join(staging_dir, os.path.basename(path)))
+            files[os.path.basename(path)] = {"sha256": stage_cache.file_hash(path), "size": _artifact_size(path)}
+
+        with open(os.path.join(staging_dir, "manifest.json"), "w") as file:
+            json.dump({"version": version, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": files}, file, indent=4)
+
+        # The directory only appears under its version name once complete, and CURRENT flips in one rename.
+        os.replace(staging_dir, release_dir)
+        fd, tmp_pointer = tempfile.mkstemp(dir=releases_dir, prefix=".CURRENT.")
+        with os.fdopen(fd, "w") as file:
+            file.write(version)
+        os.replace(tmp_pointer, os.path.join(releases_dir, "CURRENT"))
+
+        prune_releases(releases_dir, keep=keep)
+
+        logging.info(f"Published release {version} with {len(files)} artifacts to {release_dir}")
+        return version
+
+    except Exception as e:
+        logging.error(f"Error publishing release: {e}")
+        raise CustomException(e, sys)
+
+def prune_releases(releases_dir=RELEASES_DIR, keep=3):
+    active = current_release(releases_dir)
+    versions = sorted(name for name in os.listdir(releases_dir) if not name.startswith(".") and os.path.isdir(os.path.join(releases_dir, name)))
+
+    # Servers keep the files they have open, so removing an old directory does not break them.
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version != active:
+            shutil.rmtree(os.path.join(releases_dir, version), ignore_errors=True)
+            logging.info(f"Pruned release {version}")
+
+################## SERVING #################
+
+class ActiveIndex:
+    """Holds the RecommenderIndex requests should use; a request reads it once and keeps that version to the end."""
+
+    def __init__(self, index, version=None):
+        self.index = index
+        self.version = version
+        self.swaps = 0
+        # Serialises writers (release swaps and fold-ins), so neither replaces an index the other is still deriving from.
+        self.lock = threading.RLock()
+
+    def get(self):
+        return self.index
+
+    def publish(self, index):
+        # Replaces the index within the current version, e.g. with a copy that has a folded-in user.
+        with self.lock:
+            self.index = index
+
+    def swap(self, index, version):
+        with self.lock:
+            previous_version = self.version
+            # A single reference assignment, so every request sees either the old or the new index in full.
+            self.index, self.version = index, version
+            self.swaps += 1
+
+        # The old index is freed once the last in-flight request drops its reference.
+        gc.collect()
+        logging.info(f"Swapped recommender index {previous_version} -> {version}")
+
+class ReleaseWatcher(threading.Thread):
+    """Polls CURRENT, loads and validates new releases in the background, then hands them to on_swap."""
+
+    def __init__(self, load_release, validate, on_swap, current_version=None, releases_dir=RELEASES_DIR, poll_seconds=30):
+        super().__init__(name="release-watcher", daemon=True)
+        self.load_release = load_release
+        self.validate = validate
+        self.on_swap = on_swap
+        self.current_version = current_version
+        self.releases_dir = releases_dir
+        self.poll_seconds = poll_seconds
+
+        self.failed_versions = set()
+        self.stopped = threading.Event()
+
+    def check(self):
+        version = current_release(self.releases_dir)
+        if version is None or version == self.current_version or version in self.failed_versions:
+            return False
+
+        try:
+            logging.info(f"Loading release {version}")
+            index = self.load_release(version)
+            self.validate(index)
+        except Exception as e:
+            # A bad release is never retried; the server keeps serving the version it has.
+            logging.error(f"Release {version} failed validation, keeping {self.current_version}: {e}")
+            self.failed_versions.add(version)
+            return False
+
+        self.on_swap(index, version)
+        self.current_version = version
+        return True
+
+    def run(self):
+        while not self.stopped.wait(self.poll_seconds):
+            self.check()
+
+    def stop(self):
+        self.stopped.set()
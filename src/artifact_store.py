@@ -0,0 +1,375 @@
+import os
+import sys
+import copy
+import json
+import time
+import joblib
+import hashlib
+import multiprocessing
+import numpy as np
+import pandas as pd
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+
+LEGACY_ARTIFACTS = {
+    "X_train_array": os.path.join(PREPROCESSED_DATA_DIR, "X_train_array.pkl"),
+    "X_test_array": os.path.join(PREPROCESSED_DATA_DIR, "X_test_array.pkl"),
+    "y_train": os.path.join(PREPROCESSED_DATA_DIR, "y_train.pkl"),
+    "y_test": os.path.join(PREPROCESSED_DATA_DIR, "y_test.pkl"),
+    "rating_df": os.path.join(PREPROCESSED_DATA_DIR, "rating_df.csv"),
+    "user2user_decoded": os.path.join(PREPROCESSED_DATA_DIR, "user2user_decoded.pkl"),
+    "anime2anime_decoded": os.path.join(PREPROCESSED_DATA_DIR, "anime2anime_decoded.pkl"),
+    "user_weights": os.path.join(WEIGHTS_DIR, "user_weights.h5"),
+    "anime_weights": os.path.join(WEIGHTS_DIR, "anime_weights.h5"),
+}
+
+RATING_DTYPES = {
+    "user_id": np.int32,
+    "anime_id": np.int32,
+    "rating": np.float32,
+    "user_encoded": np.int32,
+    "anime_encoded": np.int32,
+}
+
+################## ARRAYS #################
+
+def save_array(path, array, dtype=None):
+    array = np.ascontiguousarray(array if dtype is None else np.asarray(array).astype(dtype, copy=False))
+
+    # Written beside the target and renamed over it: a process that memory-maps the old file keeps its inode
+    # intact, instead of faulting (SIGBUS) or reading a half-written array when it is truncated underneath it.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            np.save(file, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def load_array(path, mmap_mode="r"):
+    return np.load(path, mmap_mode=mmap_mode)
+
+def artifact_version(paths):
+    """Short fingerprint of the files' inodes, sizes and mtimes; missing files are skipped."""
+    fingerprint = hashlib.sha1()
+    for path in paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint.update(f"{path}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return fingerprint.hexdigest()[:12]
+
+def load_artifact(path, mmap_mode="r"):
+    if os.path.isdir(path):
+        return load_columns(path, mmap_mode=mmap_mode)
+    if path.endswith(".npy"):
+        return load_array(path, mmap_mode=mmap_mode)
+    if path.endswith(".csv"):
+        return pd.read_csv(path)
+    return joblib.load(path)
+
+################## COLUMNS #################
+
+def save_columns(df, directory, dtypes=None):
+    os.makedirs(directory, exist_ok=True)
+    dtypes = dtypes or {}
+
+    for column in df.columns:
+        save_array(os.path.join(directory, f"{column}.npy"), df[column].values, dtypes.get(column))
+
+    with open(os.path.join(directory, "columns.json"), "w") as file:
+        json.dump(list(df.columns), file)
+
+def load_columns(directory, columns=None, mmap_mode="r"):
+    if columns is None:
+        with open(os.path.join(directory, "columns.json")) as file:
+            columns = json.load(file)
+
+    return pd.DataFrame({column: load_array(os.path.join(directory, f"{column}.npy"), mmap_mode=mmap_mode) for column in columns}, copy=False)
+
+################## ID ENCODERS #################
+
+class IdDecoder:
+    """Code -> id mapping over the array of ids in code order, plus ids appended at serving time."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.extra_ids = []
+
+    def append(self, id_):
+        self.extra_ids.append(int(id_))
+        return len(self) - 1
+
+    def copy(self):
+        # Shares the id array; only the appended ids are copied.
+        decoder = IdDecoder(self.ids)
+        decoder.extra_ids = list(self.extra_ids)
+        return decoder
+
+    def get(self, code, default=None):
+        if code is None or not 0 <= code < len(self):
+            return default
+        if code >= len(self.ids):
+            return self.extra_ids[code - len(self.ids)]
+        return int(self.ids[code])
+
+    def __getitem__(self, code):
+        value = self.get(code)
+        if value is None:
+            raise KeyError(code)
+        return value
+
+    def __contains__(self, code):
+        return self.get(code) is not None
+
+    def __len__(self):
+        return len(self.ids) + len(self.extra_ids)
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def items(self):
+        return zip(range(len(self)), self.ids.tolist() + self.extra_ids)
+
+class IdEncoder:
+    """Id -> code mapping over the array of ids in code order, plus ids appended at serving time."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.order = np.argsort(ids, kind="stable")
+        self.sorted_ids = np.asarray(ids)[self.order]
+        self.extra_codes = {}
+
+    def append(self, id_, code):
+        self.extra_codes[int(id_)] = code
+
+    def copy(self):
+        # Shares the id array and its sort order; only the appended codes are copied.
+        encoder = copy.copy(self)
+        encoder.extra_codes = dict(self.extra_codes)
+        return encoder
+
+    def get(self, key, default=None):
+        if key is None:
+            return default
+        if key in self.extra_codes:
+            return self.extra_codes[key]
+        pos = np.searchsorted(self.sorted_ids, key)
+        if pos < len(self.sorted_ids) and self.sorted_ids[pos] == key:
+            return int(self.order[pos])
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.ids) + len(self.extra_codes)
+
+    def __iter__(self):
+        return iter(self.ids.tolist() + list(self.extra_codes))
+
+    def items(self):
+        return zip(self.ids.tolist() + list(self.extra_codes), list(range(len(self.ids))) + list(self.extra_codes.values()))
+
+def load_encoders(ids_path, mmap_mode="r"):
+    ids = load_array(ids_path, mmap_mode=mmap_mode)
+    return IdEncoder(ids), IdDecoder(ids)
+
+################## ROW OVERLAY #################
+
+class RowOverlay:
+    """Rows of a (memory-mapped) matrix with a few rows replaced or appended at serving time; the matrix itself is never copied."""
+
+    # Makes ndarray @ overlay.T defer to _TransposedOverlay.__rmatmul__ instead of converting the overlay to an array.
+    __array_ufunc__ = None
+
+    def __init__(self, base, codes=None, rows=None):
+        self.base = base
+        # Sorted codes of the overlaid rows and their values, in the same order.
+        self.codes = np.empty(0, dtype=np.int64) if codes is None else codes
+        self.rows = np.empty((0, base.shape[1]), dtype=base.dtype) if rows is None else rows
+
+        self.shape = (max(base.shape[0], int(self.codes[-1]) + 1 if len(self.codes) else 0), base.shape[1])
+        self.dtype = base.dtype
+        self.itemsize = base.itemsize
+        self.ndim = 2
+
+    def with_row(self, code, row):
+        # A new overlay, so readers holding this one keep seeing it unchanged.
+        row = np.asarray(row, dtype=self.dtype)
+        pos = int(np.searchsorted(self.codes, code))
+        if pos < len(self.codes) and self.codes[pos] == code:
+            rows = self.rows.copy()
+            rows[pos] = row
+            return RowOverlay(self.base, self.codes, rows)
+        return RowOverlay(self.base, np.insert(self.codes, pos, code), np.insert(self.rows, pos, row, axis=0))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self[np.asarray([key])][0]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if stop <= self.base.shape[0] and not np.any((self.codes >= start) & (self.codes < stop)):
+                return self.base[key]
+            key = np.arange(start, stop, step)
+
+        ids = np.asarray(key, dtype=np.int64)
+        if not len(self.codes):
+            return self.base[ids]
+
+        pos = np.minimum(np.searchsorted(self.codes, ids), len(self.codes) - 1)
+        overlaid = self.codes[pos] == ids
+        # Overlaid ids read row 0 of the matrix as a placeholder; appended ids are past its end.
+        rows = self.base[np.where(overlaid, 0, ids)]
+        rows[overlaid] = self.rows[pos[overlaid]]
+        return rows
+
+    def _scores(self, base_scores, overlay_scores):
+        # Scores against the matrix rows (last axis), with the overlaid rows' scores written over or after them.
+        if len(self) > base_scores.shape[-1]:
+            padding = np.zeros(base_scores.shape[:-1] + (len(self) - base_scores.shape[-1],), dtype=base_scores.dtype)
+            base_scores = np.concatenate([base_scores, padding], axis=-1)
+        base_scores[..., self.codes] = overlay_scores
+        return base_scores
+
+    @property
+    def T(self):
+        return _TransposedOverlay(self)
+
+    def __matmul__(self, other):
+        return (np.asarray(other).T @ self.T).T
+
+class _TransposedOverlay:
+    __array_ufunc__ = None
+
+    def __init__(self, overlay):
+        self.overlay = overlay
+
+    def __rmatmul__(self, other):
+        return self.overlay._scores(other @ self.overlay.base.T, other @ self.overlay.rows.T)
+
+################## CONVERTER #################
+
+def convert_artifacts(legacy_artifacts=LEGACY_ARTIFACTS):
+    try:
+        converted = []
+
+        for name, target in [("X_train_array", X_TRAIN_ARRAY), ("X_test_array", X_TEST_ARRAY)]:
+            if os.path.exists(legacy_artifacts[name]):
+                users, anime = joblib.load(legacy_artifacts[name])
+                save_array(target, np.column_stack([users, anime]), np.int32)
+                converted.append(target)
+
+        for name, target in [("y_train", Y_TRAIN), ("y_test", Y_TEST)]:
+            if os.path.exists(legacy_artifacts[name]):
+                save_array(target, joblib.load(legacy_artifacts[name]), np.float32)
+                converted.append(target)
+
+        for name, target in [("user2user_decoded", USER_IDS), ("anime2anime_decoded", ANIME_IDS)]:
+            if os.path.exists(legacy_artifacts[name]):
+                decoded = joblib.load(legacy_artifacts[name])
+                save_array(target, [decoded[i] for i in range(len(decoded))], np.int64)
+                converted.append(target)
+
+        if os.path.exists(legacy_artifacts["rating_df"]):
+            save_columns(pd.read_csv(legacy_artifacts["rating_df"]), RATING_DF, RATING_DTYPES)
+            converted.append(RATING_DF)
+
+        for name, target in [("user_weights", USER_WEIGHTS_PATH), ("anime_weights", ANIME_WEIGHTS_PATH)]:
+            if os.path.exists(legacy_artifacts[name]):
+                save_array(target, joblib.load(legacy_artifacts[name]), np.float32)
+                converted.append(target)
+
+        # Legacy runs never wrote the favourites table or the synopsis store, and serving expects both.
+        if os.path.isdir(RATING_DF) and os.path.exists(USER_IDS) and os.path.exists(ANIME_IDS) and os.path.exists(ANIME_DF):
+            from src.data_processing import DataProcessor
+
+            processor = DataProcessor(input_file=None, output_dir=PREPROCESSED_DATA_DIR)
+            processor.rating_df = load_columns(RATING_DF)
+            processor.anime_df = pd.read_csv(ANIME_DF)
+            processor.user2user_encoded = {user_id: code for code, user_id in enumerate(load_array(USER_IDS).tolist())}
+            processor.anime2anime_encoded = {anime_id: code for code, anime_id in enumerate(load_array(ANIME_IDS).tolist())}
+            processor.build_user_favourites()
+            converted += [USER_FAVOURITES_OFFSETS, USER_FAVOURITES_ANIME]
+
+        if os.path.exists(SYNOPSIS_DF):
+            from src.synopsis_store import write_synopsis_store
+
+            write_synopsis_store(pd.read_csv(SYNOPSIS_DF), SYNOPSIS_BLOB, SYNOPSIS_INDEX)
+            converted += [SYNOPSIS_BLOB, SYNOPSIS_INDEX]
+
+        logging.info(f"Converted legacy artifacts: {converted}")
+        return converted
+
+    except Exception as e:
+        logging.error(f"Error converting legacy artifacts: {e}")
+        raise CustomException(e, sys)
+
+################## LOAD COMPARISON #################
+
+def _current_rss_mb():
+    with open("/proc/self/statm") as file:
+        resident_pages = int(file.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+def resident_mb(paths):
+    """MB of each file's memory-mapped pages resident in this process, from /proc/self/smaps; 0 for unmapped files."""
+    names = {os.path.realpath(path): name for name, path in paths.items() if path}
+    resident = dict.fromkeys(paths, 0.0)
+
+    try:
+        with open("/proc/self/smaps") as file:
+            current = None
+            for line in file:
+                fields = line.split()
+                if not fields[0].endswith(":"):
+                    # Mapping header: address range, permissions, offset, device, inode, then the path if any.
+                    current = names.get(" ".join(fields[5:])) if len(fields) > 5 else None
+                elif fields[0] == "Rss:" and current is not None:
+                    resident[current] += int(fields[1]) / 1024
+    except OSError:
+        pass
+
+    return resident
+
+def _measure_load(paths, mmap_mode):
+    rss_before = _current_rss_mb()
+    start = time.perf_counter()
+
+    artifacts = [load_artifact(path, mmap_mode=mmap_mode) for path in paths]
+
+    return {"load_seconds": time.perf_counter() - start, "rss_mb": _current_rss_mb() - rss_before, "loaded": len(artifacts)}
+
+def compare_load(legacy_artifacts=LEGACY_ARTIFACTS):
+    legacy_paths = [path for path in legacy_artifacts.values() if os.path.exists(path)]
+    new_paths = [path for path in [X_TRAIN_ARRAY, X_TEST_ARRAY, Y_TRAIN, Y_TEST, USER_IDS, ANIME_IDS, RATING_DF, USER_WEIGHTS_PATH, ANIME_WEIGHTS_PATH] if os.path.exists(path)]
+
+    # Each measurement runs in a fresh process so memory held by one format is not counted against the next.
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        report = {
+            "legacy": pool.apply(_measure_load, (legacy_paths, None)),
+            "npy": pool.apply(_measure_load, (new_paths, None)),
+            "npy_mmap": pool.apply(_measure_load, (new_paths, "r")),
+        }
+
+    logging.info(f"Artifact load comparison: {report}")
+    return report
+
+if __name__ == "__main__":
+    try:
+        convert_artifacts()
+        print(json.dumps(compare_load(), indent=4))
+    except Exception as e:
+        logging.error(f"Error in artifact conversion: {e}")
+        raise CustomException(e, sys)
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from src.recommender_index import RecommenderIndex
+from src.artifact_store import load_encoders, save_array
+from pipeline.prediction_pipeline import hybrid_top_animes
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+from utils.common_functions import read_yaml_file
+
+# Per-process RecommenderIndex of the materialisation workers, loaded once by _init_worker.
+_worker = {}
+
+def _init_worker():
+    # Load without a previous table, so nothing is copied forward from an older run.
+    _worker["index"] = RecommenderIndex(user_recommendations_path=None).load()
+
+def materialise_users(encoded_user_ids, user_weight, content_weight, rerank_pool, top_n, block_size):
+    index = _worker["index"]
+    rows = np.full((len(encoded_user_ids), top_n), -1, dtype=np.int32)
+    for start in range(0, len(encoded_user_ids), block_size):
+        block = encoded_user_ids[start:start + block_size]
+        for position, top_animes in enumerate(hybrid_top_animes(index, block, user_weight, content_weight, rerank_pool=rerank_pool, top_n=top_n), start=start):
+            # Users that fail keep an all -1 row and are computed online at serving time.
+            if not isinstance(top_animes, Exception):
+                rows[position, :len(top_animes)] = top_animes
+    return rows
+
+class BatchRecommender:
+    """Precomputes the hybrid top-N of every encoded user into a fixed-width table the server reads by offset."""
+
+    def __init__(self, config_path):
+        self.config = read_yaml_file(config_path).get("materialisation", {})
+        self.user_weight = self.config.get("user_weight", 0.5)
+        self.content_weight = self.config.get("content_weight", 0.5)
+        self.rerank_pool = self.config.get("rerank_pool")
+        self.top_n = self.config.get("top_n", 10)
+        self.block_size = self.config.get("block_size", 1024)
+        self.n_workers = self.config.get("n_workers") or os.cpu_count()
+
+    def materialise(self, n_users):
+        try:
+            chunks = [chunk for chunk in np.array_split(np.arange(n_users, dtype=np.int64), self.n_workers) if len(chunk)]
+            table = np.full((n_users, self.top_n), -1, dtype=np.int32)
+
+            with ProcessPoolExecutor(max_workers=len(chunks) or 1, initializer=_init_worker) as executor:
+                futures = [
+                    (chunk[0], executor.submit(materialise_users, chunk, self.user_weight, self.content_weight, self.rerank_pool, self.top_n, self.block_size))
+                    for chunk in chunks
+                ]
+                for offset, future in futures:
+                    rows = future.result()
+                    table[offset:offset + len(rows)] = rows
+
+            return table
+
+        except Exception as e:
+            logging.error(f"Error materialising recommendations: {e}")
+            raise CustomException(e, sys)
+
+    def run(self):
+        try:
+            if not self.config.get("enabled", True):
+                # A stale table would otherwise keep being served.
+                for path in [USER_RECOMMENDATIONS_PATH, USER_RECOMMENDATIONS_META_PATH]:
+                    if os.path.exists(path):
+                        os.remove(path)
+                logging.info("Recommendation materialisation disabled, skipping")
+                return
+
+            start = time.perf_counter()
+            n_users = len(load_encoders(USER_IDS)[0])
+            table = self.materialise(n_users)
+
+            save_array(USER_RECOMMENDATIONS_PATH, table, np.int32)
+            with open(USER_RECOMMENDATIONS_META_PATH, "w") as file:
+                json.dump({
+                    "user_weight": self.user_weight,
+                    "content_weight": self.content_weight,
+                    "rerank_pool": self.rerank_pool,
+                    "top_n": self.top_n,
+                    "n_users": n_users,
+                    "n_missing": int(np.sum(table[:, 0] < 0)),
+                    "elapsed_seconds": time.perf_counter() - start,
+                }, file, indent=4)
+
+            logging.info(f"Materialised recommendations for {n_users} users in {time.perf_counter() - start:.1f}s to {USER_RECOMMENDATIONS_PATH}")
+
+        except Exception as e:
+            logging.error(f"Error in recommendation materialisation: {e}")
+            raise CustomException(e, sys)
+
+if __name__ == "__main__":
+    try:
+        batch_recommender = BatchRecommender(config_path=CONFIG_FILE_PATH)
+        batch_recommender.run()
+    except Exception as e:
+        logging.error(f"Error in recommendation materialisation execution: {e}")
+        raise CustomException(e, sys)
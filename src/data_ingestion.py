@@ -1,44 +1,108 @@
 import os
 import sys
-import pandas as pd
-from google.cloud import storage
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from src.local_bucket import LocalBucket
 from src.logger import logging
 from src.exception import CustomException
 from config.paths_config import *
 from utils.common_functions import read_yaml_file
 
+CHUNK_SIZE = 8 * 1024 * 1024
+
 class DataIngestion:
-    def __init__(self, config):
+    def __init__(self, config, bucket=None):
         self.config = read_yaml_file(config)
         self.data_ingestion_config = self.config.get("data_ingestion", {})
         self.bucket_name = self.data_ingestion_config.get("bucket_name", "")
         self.bucket_file_names = self.data_ingestion_config.get("bucket_file_names", [])
+        self.num_rows = self.data_ingestion_config.get("num_rows")
+        self.truncate_file_names = self.data_ingestion_config.get("truncate_file_names", ["animelist.csv"])
+        self.max_workers = self.data_ingestion_config.get("max_workers", 4)
+        self.local_bucket_dir = self.data_ingestion_config.get("local_bucket_dir")
+        self.bucket = bucket
 
         os.makedirs(RAW_DATA_DIR, exist_ok=True)
 
         logging.info(f"Data Ingestion Started with bucket: {self.bucket_name} and files: {self.bucket_file_names}")
 
-    def download_data_from_gcs(self):
+    def get_bucket(self):
+        if self.bucket is not None:
+            return self.bucket
+
+        if self.local_bucket_dir:
+            self.bucket = LocalBucket(self.local_bucket_dir, name=self.bucket_name)
+        else:
+            from google.cloud import storage
+            self.bucket = storage.Client().bucket(self.bucket_name)
+        return self.bucket
+
+    def manifest_path(self, file_name):
+        return os.path.join(RAW_DATA_DIR, f".{file_name}.source.json")
+
+    def is_up_to_date(self, file_name, source):
+        destination_path = os.path.join(RAW_DATA_DIR, file_name)
+        if not os.path.exists(destination_path) or not os.path.exists(self.manifest_path(file_name)):
+            return False
+
+        with open(self.manifest_path(file_name)) as file:
+            return json.load(file) == source
+
+    def download_file(self, bucket, file_name):
         try:
-            client = storage.Client()
-            bucket = client.bucket(self.bucket_name)
+            destination_path = os.path.join(RAW_DATA_DIR, file_name)
+
+            blob = bucket.blob(file_name)
+            blob.reload()
 
-            for file_name in self.bucket_file_names:
-                destination_path = os.path.join(RAW_DATA_DIR, file_name)
+            num_rows = self.num_rows if file_name in self.truncate_file_names else None
+            source = {"bucket": self.bucket_name, "md5_hash": blob.md5_hash, "crc32c": getattr(blob, "crc32c", None), "num_rows": num_rows}
 
-                if file_name == "animelist.csv":
-                    blob = bucket.blob(file_name)
-                    blob.download_to_filename(destination_path)
-                    data = pd.read_csv(destination_path)
-                    data.to_csv(destination_path, index=False)
+            if self.is_up_to_date(file_name, source):
+                logging.info(f"Skipping {file_name}: unchanged since last download")
+                return False
 
-                    logging.info(f"Downloaded and truncated {file_name} to {destination_path}")
+            fd, tmp_path = tempfile.mkstemp(dir=RAW_DATA_DIR, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as destination, blob.open("rb") as stream:
+                    if num_rows is None:
+                        for block in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                            destination.write(block)
+                    else:
+                        # Header plus the first num_rows records, read line by line so the rest is never fetched.
+                        for line_number, line in enumerate(stream):
+                            if line_number > num_rows:
+                                break
+                            destination.write(line)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, destination_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            with open(self.manifest_path(file_name), "w") as file:
+                json.dump(source, file)
+
+            if num_rows is None:
+                logging.info(f"Downloaded {file_name} to {destination_path}")
+            else:
+                logging.info(f"Downloaded and truncated {file_name} to {num_rows} rows at {destination_path}")
+            return True
+
+        except Exception as e:
+            logging.error(f"Error downloading {file_name}: {e}")
+            raise CustomException(e, sys)
+
+    def download_data_from_gcs(self):
+        try:
+            bucket = self.get_bucket()
 
-                else:
-                    blob = bucket.blob(file_name)
-                    blob.download_to_filename(destination_path)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                downloaded = list(executor.map(lambda file_name: self.download_file(bucket, file_name), self.bucket_file_names))
 
-                    logging.info(f"Downloaded {file_name} to {destination_path}")
+            logging.info(f"Downloaded {sum(downloaded)} of {len(self.bucket_file_names)} files; the rest were unchanged")
 
         except Exception as e:
             logging.error(f"Error during data ingestion: {e}")
@@ -1,16 +1,23 @@
 import os
 import sys
 import pandas as pd
-import joblib
 import numpy as np
 from src.logger import logging
 from src.exception import CustomException
+from src.artifact_store import save_array, save_columns, RATING_DTYPES
+from src.synopsis_store import write_synopsis_store
+from src.metrics import span, registry
 from config.paths_config import *
+from utils.common_functions import read_yaml_file
+
+RATING_COLUMNS = ["user_id", "anime_id", "rating"]
+STREAMING_BYTES_PER_ROW = 64
 
 class DataProcessor:
-    def __init__(self, input_file, output_dir):
+    def __init__(self, input_file, output_dir, config_path=None):
         self.input_file = input_file
         self.output_dir = output_dir
+        self.processing_config = read_yaml_file(config_path).get("data_processing", {}) if config_path else {}
 
         self.rating_df = None
         self.anime_df = None
@@ -19,6 +26,8 @@ class DataProcessor:
         self.X_test_array = None
         self.y_train = None
         self.y_test = None
+        self.user_favourites_offsets = None
+        self.user_favourites_anime = None
 
         self.user2user_encoded = {}
         self.anime2anime_encoded =  {}
@@ -54,7 +63,7 @@ class DataProcessor:
             min_rating = self.rating_df["rating"].min()
             max_rating = self.rating_df["rating"].max()
 
-            self.rating_df["rating"] = self.rating_df["rating"].apply(lambda x: (x - min_rating) / (max_rating - min_rating))
+            self.rating_df["rating"] = (self.rating_df["rating"] - min_rating) / (max_rating - min_rating)
 
             logging.info(f"Ratings scaled to range [0, 1]. Original min: {min_rating}, Original max: {max_rating}")
 
@@ -109,26 +118,174 @@ class DataProcessor:
             logging.error(f"Error splitting data: {e}")
             raise CustomException(e, sys)
 
-    def save_preprocessed_data(self):
+    def streaming_chunksize(self):
+        memory_budget_mb = self.processing_config.get("memory_budget_mb", 6144)
+        chunksize = self.processing_config.get("chunksize", 5_000_000)
+
+        # Keep a parsed chunk to a small slice of the budget; the rest holds the preallocated columns.
+        budget_rows = int(memory_budget_mb * 1024 * 1024 * 0.1 / STREAMING_BYTES_PER_ROW)
+        return max(10_000, min(chunksize, budget_rows))
+
+    def count_ratings_streaming(self, chunksize):
         try:
-            artifacts = {
-                "user2user_encoded": self.user2user_encoded,
-                "anime2anime_encoded": self.anime2anime_encoded,
-                "user2user_decoded": self.user2user_decoded,
-                "anime2anime_decoded": self.anime2anime_decoded,
+            n_ratings = np.zeros(0, dtype=np.int64)
+            min_rating = np.zeros(0, dtype=np.int16)
+            max_rating = np.zeros(0, dtype=np.int16)
+            first_row = np.zeros(0, dtype=np.int64)
+            n_rows = 0
+
+            for chunk in pd.read_csv(self.input_file, usecols=RATING_COLUMNS, chunksize=chunksize,
+                                     dtype={"user_id": np.int32, "anime_id": np.int32, "rating": np.uint8}):
+                user_ids = chunk["user_id"].values
+                ratings = chunk["rating"].values.astype(np.int16)
+
+                size = int(user_ids.max()) + 1
+                if size > len(n_ratings):
+                    grow = size - len(n_ratings)
+                    n_ratings = np.concatenate([n_ratings, np.zeros(grow, dtype=np.int64)])
+                    min_rating = np.concatenate([min_rating, np.full(grow, np.iinfo(np.int16).max, dtype=np.int16)])
+                    max_rating = np.concatenate([max_rating, np.full(grow, np.iinfo(np.int16).min, dtype=np.int16)])
+                    first_row = np.concatenate([first_row, np.full(grow, np.iinfo(np.int64).max, dtype=np.int64)])
+
+                # Per-user reductions of the chunk over contiguous runs; animelist.csv is grouped by user, so the sort is usually skipped.
+                order = None
+                if np.any(user_ids[1:] < user_ids[:-1]):
+                    order = np.argsort(user_ids, kind="stable")
+                    user_ids, ratings = user_ids[order], ratings[order]
+
+                starts = np.flatnonzero(np.concatenate([[True], user_ids[1:] != user_ids[:-1]]))
+                users = user_ids[starts]
+                # A stable sort keeps each user's rows in file order, so a run's first row is that user's first row in the chunk.
+                chunk_first_row = n_rows + (starts if order is None else order[starts])
+
+                # users is unique within the chunk, so plain fancy indexing merges the runs into the running arrays.
+                n_ratings[users] += np.diff(np.append(starts, len(user_ids)))
+                min_rating[users] = np.minimum(min_rating[users], np.minimum.reduceat(ratings, starts))
+                max_rating[users] = np.maximum(max_rating[users], np.maximum.reduceat(ratings, starts))
+                first_row[users] = np.minimum(first_row[users], chunk_first_row)
+                n_rows += len(user_ids)
+
+            logging.info(f"Counted {n_rows} ratings from {self.input_file} in chunks of {chunksize}")
+            return n_ratings, min_rating, max_rating, first_row
+
+        except Exception as e:
+            logging.error(f"Error counting ratings: {e}")
+            raise CustomException(e, sys)
+
+    def load_data_streaming(self, min_ratings=400):
+        try:
+            chunksize = self.streaming_chunksize()
+            n_ratings, min_rating, max_rating, first_row = self.count_ratings_streaming(chunksize)
+
+            kept = n_ratings >= min_ratings
+            n_kept_rows = int(n_ratings[kept].sum())
+
+            estimated_mb = n_kept_rows * STREAMING_BYTES_PER_ROW / (1024 * 1024)
+            memory_budget_mb = self.processing_config.get("memory_budget_mb", 6144)
+            if estimated_mb > memory_budget_mb:
+                logging.warning(f"Streaming preprocessing needs about {estimated_mb:.0f} MB, above the {memory_budget_mb} MB budget")
+
+            # Users are encoded in order of first appearance, exactly like encode_data.
+            user_ids = np.flatnonzero(kept)
+            user_ids = user_ids[np.argsort(first_row[user_ids], kind="stable")]
+            user_codes = np.full(len(kept), -1, dtype=np.int32)
+            user_codes[user_ids] = np.arange(len(user_ids), dtype=np.int32)
+
+            global_min = int(min_rating[kept].min())
+            global_max = int(max_rating[kept].max())
+
+            columns = {
+                "user_id": np.empty(n_kept_rows, dtype=np.int32),
+                "anime_id": np.empty(n_kept_rows, dtype=np.int32),
+                "rating": np.empty(n_kept_rows, dtype=np.float32),
+                "user_encoded": np.empty(n_kept_rows, dtype=np.int32),
+                "anime_encoded": np.empty(n_kept_rows, dtype=np.int32),
             }
 
-            for name, data in artifacts.items():
-                joblib.dump(data, os.path.join(self.output_dir, f"{name}.pkl"))
+            anime_codes = np.full(0, -1, dtype=np.int32)
+            anime_ids = []
+            n_anime = 0
+            position = 0
+
+            for chunk in pd.read_csv(self.input_file, usecols=RATING_COLUMNS, chunksize=chunksize,
+                                     dtype={"user_id": np.int32, "anime_id": np.int32, "rating": np.uint8}):
+                chunk = chunk[kept[chunk["user_id"].values]]
+                if chunk.empty:
+                    continue
+
+                chunk_users = chunk["user_id"].values
+                chunk_anime = chunk["anime_id"].values
+
+                if int(chunk_anime.max()) + 1 > len(anime_codes):
+                    anime_codes = np.concatenate([anime_codes, np.full(int(chunk_anime.max()) + 1 - len(anime_codes), -1, dtype=np.int32)])
+
+                new_anime = pd.unique(chunk_anime)
+                new_anime = new_anime[anime_codes[new_anime] < 0]
+                anime_codes[new_anime] = n_anime + np.arange(len(new_anime), dtype=np.int32)
+                anime_ids.append(new_anime)
+                n_anime += len(new_anime)
+
+                end = position + len(chunk)
+                columns["user_id"][position:end] = chunk_users
+                columns["anime_id"][position:end] = chunk_anime
+                columns["rating"][position:end] = (chunk["rating"].values.astype(np.int64) - global_min) / (global_max - global_min)
+                columns["user_encoded"][position:end] = user_codes[chunk_users]
+                columns["anime_encoded"][position:end] = anime_codes[chunk_anime]
+                position = end
+
+            anime_ids = np.concatenate(anime_ids) if anime_ids else np.empty(0, dtype=np.int32)
+
+            self.user2user_encoded = {int(x): i for i, x in enumerate(user_ids)}
+            self.user2user_decoded = {i: int(x) for i, x in enumerate(user_ids)}
+            self.anime2anime_encoded = {int(x): i for i, x in enumerate(anime_ids)}
+            self.anime2anime_decoded = {i: int(x) for i, x in enumerate(anime_ids)}
+
+            self.rating_df = pd.DataFrame(columns, copy=False)
+
+            logging.info(f"Streamed {n_kept_rows} ratings. Users: {len(user_ids)}, Anime: {len(anime_ids)}, Original min: {global_min}, Original max: {global_max}")
+
+        except Exception as e:
+            logging.error(f"Error loading data in streaming mode: {e}")
+            raise CustomException(e, sys)
+
+    def split_data_streaming(self, test_size=0.2, random_state=42):
+        try:
+            n_rows = len(self.rating_df)
+
+            # Same permutation DataFrame.sample(frac=1, random_state=...) draws in split_data.
+            permutation = np.random.RandomState(random_state).choice(n_rows, size=n_rows, replace=False)
+            self.rating_df = pd.DataFrame({column: self.rating_df[column].values[permutation] for column in self.rating_df.columns}, copy=False)
+            del permutation
+
+            train_indices = int(n_rows * (1 - test_size))
+            user_encoded = self.rating_df["user_encoded"].values
+            anime_encoded = self.rating_df["anime_encoded"].values
+            rating = self.rating_df["rating"].values
+
+            self.X_train_array = [user_encoded[:train_indices], anime_encoded[:train_indices]]
+            self.X_test_array = [user_encoded[train_indices:], anime_encoded[train_indices:]]
+            self.y_train = rating[:train_indices]
+            self.y_test = rating[train_indices:]
+
+            logging.info(f"Data split into train and test sets. Train size: {train_indices}, Test size: {n_rows - train_indices}")
+
+        except Exception as e:
+            logging.error(f"Error splitting data in streaming mode: {e}")
+            raise CustomException(e, sys)
+
+    def save_preprocessed_data(self):
+        try:
+            save_array(USER_IDS, [self.user2user_decoded[i] for i in range(len(self.user2user_decoded))], np.int64)
+            save_array(ANIME_IDS, [self.anime2anime_decoded[i] for i in range(len(self.anime2anime_decoded))], np.int64)
 
             logging.info(f"Preprocessed data saved successfully in {self.output_dir}")
 
-            joblib.dump(self.X_train_array, X_TRAIN_ARRAY)
-            joblib.dump(self.X_test_array, X_TEST_ARRAY)
-            joblib.dump(self.y_train, Y_TRAIN)
-            joblib.dump(self.y_test, Y_TEST)
+            save_array(X_TRAIN_ARRAY, np.column_stack(self.X_train_array), np.int32)
+            save_array(X_TEST_ARRAY, np.column_stack(self.X_test_array), np.int32)
+            save_array(Y_TRAIN, self.y_train, np.float32)
+            save_array(Y_TEST, self.y_test, np.float32)
 
-            self.rating_df.to_csv(RATING_DF, index=False)
+            save_columns(self.rating_df, RATING_DF, RATING_DTYPES)
 
             logging.info(f"Train and test arrays saved successfully. X_train: {X_TRAIN_ARRAY}, X_test: {X_TEST_ARRAY}, y_train: {Y_TRAIN}, y_test: {Y_TEST}")
         except Exception as e:
@@ -142,21 +299,11 @@ class DataProcessor:
 
             cols = ["anime_id", "eng_version", "Score", "Genres", "Episodes", "Type", "Members", "Premiered"]
 
-            self.anime_df = df = self.anime_df.replace("Unknown", np.nan)
-
-            def getAnimeName(anime_id):
-                try:
-                    name = self.anime_df[self.anime_df.MAL_ID == anime_id].eng_version.values[0]
-                    if pd.isna(name):
-                        name = self.anime_df[self.anime_df.MAL_ID == anime_id].Name.values[0]
-                    return name
-                except Exception as e:
-                    logging.error(f"Error fetching anime name for ID {anime_id}: {e}")
-                    return CustomException(e, sys)
+            self.anime_df = self.anime_df.replace("Unknown", np.nan)
 
+            # English title where known, original title otherwise.
             self.anime_df["anime_id"] = self.anime_df["MAL_ID"]
-            self.anime_df["eng_version"] = self.anime_df["English name"]
-            self.anime_df['eng_version'] = self.anime_df['anime_id'].apply(lambda x: getAnimeName(x))
+            self.anime_df["eng_version"] = self.anime_df["English name"].fillna(self.anime_df["Name"])
 
             self.anime_df.sort_values(by="Score", ascending=False, na_position="last",inplace=True)
 
@@ -164,6 +311,7 @@ class DataProcessor:
 
             self.anime_df.to_csv(ANIME_DF, index=False)
             self.synopsis_df.to_csv(SYNOPSIS_DF, index=False)
+            write_synopsis_store(self.synopsis_df, SYNOPSIS_BLOB, SYNOPSIS_INDEX)
 
             logging.info(f"Anime data processed and saved successfully. Anime data path: {ANIME_DF}, Synopsis data path: {SYNOPSIS_DF}")
 
@@ -171,16 +319,123 @@ class DataProcessor:
             logging.error(f"Error processing anime data: {e}")
             raise CustomException(e, sys)
 
-    def run(self):
+    def build_user_favourites(self, percentile=75, block_rows=None):
         try:
-            self.load_data(["user_id", "anime_id", "rating"])
-            self.filter_users()
-            self.scale_ratings()
-            self.encode_data()
-            self.split_data()
-            self.save_preprocessed_data()
-            self.process_anime_data()
+            n_users = len(self.user2user_encoded)
+            block_rows = block_rows or self.streaming_chunksize()
+
+            user_encoded = self.rating_df["user_encoded"].values
+            anime_encoded = self.rating_df["anime_encoded"].values
+            rating = self.rating_df["rating"].values
+
+            counts = np.bincount(user_encoded, minlength=n_users)
+            offsets = np.zeros(n_users + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+
+            # Counting sort by user, one chunk at a time: each row goes to its user's offset plus the rows of that user already placed.
+            grouped_anime = np.empty(len(user_encoded), dtype=np.int32)
+            grouped_rating = np.empty(len(user_encoded), dtype=rating.dtype)
+            cursor = offsets[:-1].copy()
+            for start in range(0, len(user_encoded), block_rows):
+                chunk_users = user_encoded[start:start + block_rows]
+                order = np.argsort(chunk_users, kind="stable")
+                sorted_users = chunk_users[order]
+                chunk_counts = np.bincount(sorted_users, minlength=n_users)
+                positions = cursor[sorted_users] + np.arange(len(order)) - (np.cumsum(chunk_counts) - chunk_counts)[sorted_users]
+                grouped_anime[positions] = anime_encoded[start:start + block_rows][order]
+                grouped_rating[positions] = rating[start:start + block_rows][order]
+                cursor += chunk_counts
+
+            # Rank of each encoded anime in the anime frame; favourites are ordered by it so neighbour votes tie-break as before.
+            anime_rank = np.full(len(self.anime2anime_encoded), -1, dtype=np.int64)
+            anime_codes = self.anime_df["anime_id"].map(self.anime2anime_encoded)
+            known = anime_codes.notna().values
+            anime_rank[anime_codes.values[known].astype(np.int64)] = np.flatnonzero(known)
+
+            favourite_users, favourite_anime = [], []
+            first_user = 0
+            while first_user < n_users:
+                # Whole users only, at most block_rows ratings unless a single user has more.
+                last_user = max(first_user + 1, int(np.searchsorted(offsets, offsets[first_user] + block_rows, side="right")) - 1)
+                rows = slice(offsets[first_user], offsets[last_user])
+                users = np.repeat(np.arange(first_user, last_user), counts[first_user:last_user])
+                block_anime, block_rating = grouped_anime[rows], grouped_rating[rows]
+
+                # First rating of each (user, anime) pair, in row order, as drop_duplicates keeps it.
+                _, first = np.unique((users - first_user) * len(anime_rank) + block_anime, return_index=True)
+                first = np.sort(first)
+                users, block_anime, block_rating = users[first], block_anime[first], block_rating[first]
+
+                order = np.lexsort((block_rating, users))
+                users, block_anime, sorted_ratings = users[order], block_anime[order], block_rating[order]
+
+                user_counts = np.bincount(users - first_user, minlength=last_user - first_user)
+                starts = np.concatenate([[0], np.cumsum(user_counts)[:-1]])
+
+                # Same linear interpolation as np.percentile, evaluated for every user at once.
+                virtual_index = (percentile / 100) * np.maximum(user_counts - 1, 0)
+                lower = np.floor(virtual_index).astype(np.int64)
+                t = virtual_index - lower
+                below = sorted_ratings[np.minimum(starts + lower, len(sorted_ratings) - 1)]
+                above = sorted_ratings[np.minimum(starts + np.minimum(lower + 1, np.maximum(user_counts - 1, 0)), len(sorted_ratings) - 1)]
+                diff = above - below
+                thresholds = np.where(t >= 0.5, above - diff * (1 - t), below + diff * t)
+
+                keep = sorted_ratings >= thresholds[users - first_user]
+                keep &= anime_rank[block_anime] >= 0
+                users, block_anime = users[keep], block_anime[keep]
+
+                order = np.lexsort((anime_rank[block_anime], users))
+                favourite_users.append(users[order])
+                favourite_anime.append(block_anime[order])
+                first_user = last_user
+
+            favourite_users = np.concatenate(favourite_users) if favourite_users else np.empty(0, dtype=np.int64)
+
+            self.user_favourites_offsets = np.zeros(n_users + 1, dtype=np.int64)
+            np.cumsum(np.bincount(favourite_users, minlength=n_users), out=self.user_favourites_offsets[1:])
+            self.user_favourites_anime = np.concatenate(favourite_anime).astype(np.int32) if favourite_anime else np.empty(0, dtype=np.int32)
+
+            save_array(USER_FAVOURITES_OFFSETS, self.user_favourites_offsets)
+            save_array(USER_FAVOURITES_ANIME, self.user_favourites_anime)
+
+            logging.info(f"User favourites saved. Users: {n_users}, Favourites: {len(self.user_favourites_anime)}")
+
+        except Exception as e:
+            logging.error(f"Error building user favourites: {e}")
+            raise CustomException(e, sys)
 
+    def run(self):
+        try:
+            min_ratings = self.processing_config.get("min_ratings", 400)
+            test_size = self.processing_config.get("test_size", 0.2)
+            random_state = self.processing_config.get("random_state", 42)
+
+            if self.processing_config.get("mode", "in_memory") == "streaming":
+                with span("data_processing.load_data_streaming"):
+                    self.load_data_streaming(min_ratings=min_ratings)
+                with span("data_processing.split_data_streaming"):
+                    self.split_data_streaming(test_size=test_size, random_state=random_state)
+            else:
+                with span("data_processing.load_data"):
+                    self.load_data(RATING_COLUMNS)
+                with span("data_processing.filter_users"):
+                    self.filter_users(min_ratings=min_ratings)
+                with span("data_processing.scale_ratings"):
+                    self.scale_ratings()
+                with span("data_processing.encode_data"):
+                    self.encode_data()
+                with span("data_processing.split_data"):
+                    self.split_data(test_size=test_size, random_state=random_state)
+
+            with span("data_processing.save_preprocessed_data"):
+                self.save_preprocessed_data()
+            with span("data_processing.process_anime_data"):
+                self.process_anime_data()
+            with span("data_processing.build_user_favourites"):
+                self.build_user_favourites()
+
+            logging.info(f"Data processing stage timings: {registry.summary()}")
             logging.info("Data processing completed successfully.")
         except Exception as e:
             logging.error(f"Error in the data processing run method: {e}")
@@ -188,12 +443,8 @@ class DataProcessor:
 
 if __name__ == "__main__":
     try:
-        data_processor = DataProcessor(input_file=ANIMELIST_DATA_PATH, output_dir=PREPROCESSED_DATA_DIR)
+        data_processor = DataProcessor(input_file=ANIMELIST_DATA_PATH, output_dir=PREPROCESSED_DATA_DIR, config_path=CONFIG_FILE_PATH)
         data_processor.run()
     except Exception as e:
         logging.error(f"Error in data processing: {e}")
         raise CustomException(e, sys)
-
-
-
-
@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+from src.artifact_store import load_array
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+from utils.common_functions import read_yaml_file
+
+# Per-process state of the evaluation workers, filled once by _init_worker instead of pickled per chunk.
+_worker = {}
+
+def _init_worker(user_weights_path, anime_weights_path, seen, relevant):
+    # The weights are memory-mapped, so every worker reads the same pages.
+    _worker["user_weights"] = load_array(user_weights_path)
+    _worker["anime_weights"] = load_array(anime_weights_path)
+    _worker["seen"] = seen
+    _worker["relevant"] = relevant
+
+def score_users(encoded_user_ids, k=10, block_size=1024):
+    """Recall@k and NDCG@k sums and the recommended anime for a chunk of users, in blocked matrix products."""
+    user_weights, anime_weights = _worker["user_weights"], _worker["anime_weights"]
+    seen, relevant = _worker["seen"], _worker["relevant"]
+
+    k = min(k, anime_weights.shape[0])
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    recall_sum, ndcg_sum = 0.0, 0.0
+    recommended = []
+
+    for start in range(0, len(encoded_user_ids), block_size):
+        block = encoded_user_ids[start:start + block_size]
+        scores = user_weights[block] @ anime_weights.T
+
+        # Anime the user rated in the training split are not recommendations.
+        block_seen = seen[block].tocoo()
+        scores[block_seen.row, block_seen.col] = -np.inf
+
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+        top_k = np.take_along_axis(part, order, axis=1)
+
+        block_relevant = relevant[block]
+        hits = np.asarray(block_relevant[np.repeat(np.arange(len(block)), k), top_k.ravel()]).reshape(len(block), k) > 0
+        n_relevant = np.diff(block_relevant.indptr)
+
+        recall_sum += float(np.sum(hits.sum(axis=1) / n_relevant))
+        ideal = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+        ndcg_sum += float(np.sum((hits @ discounts) / ideal))
+        recommended.append(np.unique(top_k))
+
+    return recall_sum, ndcg_sum, np.unique(np.concatenate(recommended)) if recommended else np.empty(0, dtype=np.int64)
+
+class RankingEvaluator:
+    """Scores every held-out user's top-k against their test-split favourites: recall@k, NDCG@k and catalog coverage."""
+
+    def __init__(self, config_path):
+        config = read_yaml_file(config_path)
+        self.config = config.get("evaluation", {})
+        # The evaluated weights come from this backend's run, so its training experiment gets the metrics.
+        self.backend = config.get("model_training", {}).get("backend", "keras")
+        self.k = self.config.get("k", 10)
+        self.relevance_threshold = self.config.get("relevance_threshold", 0.7)
+        self.block_size = self.config.get("block_size", 1024)
+        self.n_workers = self.config.get("n_workers") or os.cpu_count()
+        self.max_users = self.config.get("max_users")
+        self.random_state = self.config.get("random_state", 42)
+
+    def load_interactions(self, n_users, n_anime):
+        try:
+            X_train = load_array(X_TRAIN_ARRAY)
+            X_test = load_array(X_TEST_ARRAY)
+            y_test = load_array(Y_TEST)
+
+            seen = sp.csr_matrix((np.ones(len(X_train), dtype=np.int8), (np.asarray(X_train[:, 0]), np.asarray(X_train[:, 1]))), shape=(n_users, n_anime))
+
+            # Held-out ratings above the threshold are the anime a good ranking should surface.
+            liked = np.asarray(y_test) >= self.relevance_threshold
+            relevant = sp.csr_matrix((np.ones(int(liked.sum()), dtype=np.int8), (np.asarray(X_test[liked, 0]), np.asarray(X_test[liked, 1]))), shape=(n_users, n_anime))
+            seen.sum_duplicates()
+            relevant.sum_duplicates()
+
+            # An anime both seen in training and liked in test cannot be recommended, so it is not counted as relevant.
+            relevant = (relevant - relevant.multiply(seen)).tocsr()
+            relevant.eliminate_zeros()
+
+            logging.info(f"Loaded {seen.nnz} training and {relevant.nnz} relevant test interactions for evaluation")
+            return seen, relevant
+
+        except Exception as e:
+            logging.error(f"Error loading interactions for evaluation: {e}")
+            raise CustomException(e, sys)
+
+    def evaluate(self, user_weights_path=USER_WEIGHTS_PATH, anime_weights_path=ANIME_WEIGHTS_PATH):
+        try:
+            user_weights = load_array(user_weights_path)
+            anime_weights = load_array(anime_weights_path)
+            seen, relevant = self.load_interactions(user_weights.shape[0], anime_weights.shape[0])
+
+            users = np.flatnonzero(np.diff(relevant.indptr)).astype(np.int64)
+            if self.max_users and len(users) > self.max_users:
+                users = np.sort(np.random.default_rng(self.random_state).choice(users, size=self.max_users, replace=False))
+
+            chunks = [chunk for chunk in np.array_split(users, self.n_workers) if len(chunk)]
+            recall_sum, ndcg_sum, recommended = 0.0, 0.0, []
+            with ProcessPoolExecutor(max_workers=len(chunks) or 1, initializer=_init_worker, initargs=(user_weights_path, anime_weights_path, seen, relevant)) as executor:
+                for chunk_recall, chunk_ndcg, chunk_recommended in executor.map(score_users, chunks, [self.k] * len(chunks), [self.block_size] * len(chunks)):
+                    recall_sum += chunk_recall
+                    ndcg_sum += chunk_ndcg
+                    recommended.append(chunk_recommended)
+
+            n_recommended = len(np.unique(np.concatenate(recommended))) if recommended else 0
+            report = {
+                "k": self.k,
+                "n_users": len(users),
+                f"recall@{self.k}": recall_sum / max(len(users), 1),
+                f"ndcg@{self.k}": ndcg_sum / max(len(users), 1),
+                "catalog_coverage": n_recommended / anime_weights.shape[0],
+            }
+
+            logging.info(f"Ranking evaluation: {report}")
+            return report
+
+        except Exception as e:
+            logging.error(f"Error evaluating rankings: {e}")
+            raise CustomException(e, sys)
+
+    def experiment_key(self, training_report_path=TRAINING_REPORT_PATH):
+        if not os.path.exists(training_report_path):
+            return None
+        with open(training_report_path) as file:
+            return json.load(file).get(self.backend, {}).get("comet_experiment_key")
+
+    def log_to_experiment(self, report):
+        experiment_key = self.experiment_key()
+        if experiment_key is None:
+            logging.warning(f"No Comet experiment recorded for the {self.backend} training run; ranking metrics are not logged to Comet")
+            return
+
+        # Imported here so evaluating ALS/SGD runs does not need comet_ml; the API key comes from COMET_API_KEY.
+        import comet_ml
+        experiment = comet_ml.ExistingExperiment(previous_experiment=experiment_key)
+        experiment.log_metrics({name: value for name, value in report.items() if name != "k"})
+        experiment.log_asset(EVALUATION_REPORT_PATH)
+        experiment.end()
+
+    def run(self):
+        try:
+            report = self.evaluate()
+
+            os.makedirs(os.path.dirname(EVALUATION_REPORT_PATH), exist_ok=True)
+            with open(EVALUATION_REPORT_PATH, "w") as file:
+                json.dump(report, file, indent=4)
+
+            self.log_to_experiment(report)
+
+            logging.info(f"Ranking evaluation report saved to {EVALUATION_REPORT_PATH}")
+            return report
+
+        except Exception as e:
+            logging.error(f"Error in ranking evaluation: {e}")
+            raise CustomException(e, sys)
+
+if __name__ == "__main__":
+    try:
+        evaluator = RankingEvaluator(config_path=CONFIG_FILE_PATH)
+        evaluator.run()
+    except Exception as e:
+        logging.error(f"Error in ranking evaluation execution: {e}")
+        raise CustomException(e, sys)
@@ -0,0 +1,84 @@
+import sys
+import time
+import itertools
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+from src.artifact_store import load_array
+from src.logger import logging
+from src.exception import CustomException
+
+def make_dataset(X_path, y_path, batch_size, shard_size=1_000_000, shuffle_buffer=1_000_000, cycle_length=4, shuffle=True, seed=42):
+    try:
+        X = load_array(X_path)
+        y = load_array(y_path)
+        n_rows = len(y)
+
+        # Shards are contiguous row ranges of the memory-mapped arrays; only the shards in flight are paged in.
+        shard_starts = np.arange(0, n_rows, shard_size, dtype=np.int64)
+        shard_reads = itertools.count()
+
+        def read_shard(start):
+            start = int(start)
+            stop = min(start + shard_size, n_rows)
+            users = np.asarray(X[start:stop, 0], dtype=np.int32)
+            anime = np.asarray(X[start:stop, 1], dtype=np.int32)
+            ratings = np.asarray(y[start:stop], dtype=np.float32)
+
+            if shuffle:
+                # Shards are read from parallel threads, so each read gets its own generator.
+                order = np.random.default_rng([seed, start, next(shard_reads)]).permutation(stop - start)
+                users, anime, ratings = users[order], anime[order], ratings[order]
+            return users, anime, ratings
+
+        def load_shard(start):
+            users, anime, ratings = tf.numpy_function(read_shard, [start], [tf.int32, tf.int32, tf.float32])
+            users.set_shape([None])
+            anime.set_shape([None])
+            ratings.set_shape([None])
+            return tf.data.Dataset.from_tensor_slices(({"user": users, "anime": anime}, ratings))
+
+        dataset = tf.data.Dataset.from_tensor_slices(shard_starts)
+        if shuffle:
+            dataset = dataset.shuffle(len(shard_starts), seed=seed, reshuffle_each_iteration=True)
+
+        dataset = dataset.interleave(load_shard, cycle_length=cycle_length, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+
+        if shuffle:
+            dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+
+        dataset = dataset.batch(batch_size, num_parallel_calls=tf.data.AUTOTUNE)
+        # Interleaving hides the length; declaring it lets Keras size epochs instead of running the input dry.
+        dataset = dataset.apply(tf.data.experimental.assert_cardinality(-(-n_rows // batch_size)))
+        dataset = dataset.map(
+            lambda inputs, ratings: ({name: tf.expand_dims(column, -1) for name, column in inputs.items()}, ratings),
+            num_parallel_calls=tf.data.AUTOTUNE
+        )
+        dataset = dataset.prefetch(tf.data.AUTOTUNE)
+
+        logging.info(f"tf.data pipeline built over {X_path}: {n_rows} rows in {len(shard_starts)} shards, shuffle: {shuffle}")
+        return dataset
+
+    except Exception as e:
+        logging.error(f"Error building tf.data pipeline: {e}")
+        raise CustomException(e, sys)
+
+class ThroughputCallback(Callback):
+    def __init__(self, n_examples, experiment=None):
+        super().__init__()
+        self.n_examples = n_examples
+        self.experiment = experiment
+        self.epoch_start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self.epoch_start
+        examples_per_sec = self.n_examples / seconds if seconds > 0 else 0.0
+
+        if self.experiment is not None:
+            self.experiment.log_metric("examples_per_sec", examples_per_sec, step=epoch)
+            self.experiment.log_metric("epoch_seconds", seconds, step=epoch)
+
+        logging.info(f"Epoch {epoch}: {self.n_examples} examples in {seconds:.1f}s ({examples_per_sec:.0f} examples/sec)")
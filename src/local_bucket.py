@@ -0,0 +1,42 @@
+import os
+import base64
+import hashlib
+
+class LocalBlob:
+    """Filesystem stand-in for google.cloud.storage.Blob, covering what DataIngestion uses."""
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.directory, name)
+
+        self.md5_hash = None
+        self.size = None
+
+    def reload(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No such object: {self.bucket.name}/{self.name}")
+
+        digest = hashlib.md5()
+        with open(self.path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+
+        self.md5_hash = base64.b64encode(digest.digest()).decode()
+        self.size = os.path.getsize(self.path)
+
+    def open(self, mode="rb"):
+        return open(self.path, mode)
+
+    def download_to_filename(self, filename):
+        with self.open("rb") as source, open(filename, "wb") as destination:
+            for block in iter(lambda: source.read(1024 * 1024), b""):
+                destination.write(block)
+
+class LocalBucket:
+    def __init__(self, directory, name=None):
+        self.directory = directory
+        self.name = name or os.path.basename(os.path.normpath(directory))
+
+    def blob(self, name):
+        return LocalBlob(self, name)
@@ -0,0 +1,163 @@
+import os
+import copy
+import json
+import time
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; spans range from sub-millisecond lookups to multi-minute training steps.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Stage latency histograms rendered in the Prometheus text format, summed over every process sharing a directory."""
+
+    def __init__(self, namespace="anime_recommender", flush_seconds=1.0):
+        self.namespace = namespace
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+        # Set by share(); each process then keeps a snapshot of its histograms in <directory>/<pid>.json.
+        self.directory = None
+        self.flush_seconds = flush_seconds
+        self.dirty = False
+        self.flusher_pid = None
+
+        # A forked worker starts empty, so what the parent observed (e.g. warmup) is counted once, from the parent's file.
+        os.register_at_fork(before=self._before_fork, after_in_child=self._after_fork_in_child)
+
+    def share(self, directory):
+        # Called once before workers fork; files left by an earlier server are removed so they are not summed in.
+        directory = os.path.abspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".json"):
+                os.remove(entry.path)
+        self.directory = directory
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+            self.dirty = True
+
+        if self.directory is not None and self.flusher_pid != os.getpid():
+            # Threads do not survive a fork, so each process starts its own flusher on first use.
+            self.flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_periodically, name="metrics-flusher", daemon=True).start()
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while self.flusher_pid == pid:
+            time.sleep(self.flush_seconds)
+            if self.dirty:
+                self.flush()
+
+    def flush(self):
+        if self.directory is None:
+            return
+
+        with self.lock:
+            snapshot = {stage: {"buckets": list(h.buckets), "counts": list(h.counts), "sum": h.sum, "count": h.count} for stage, h in self.histograms.items()}
+            self.dirty = False
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(tmp_path, os.path.join(self.directory, f"{os.getpid()}.json"))
+
+    def _before_fork(self):
+        self.flush()
+
+    def _after_fork_in_child(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.dirty = False
+
+    def merged(self):
+        """Histograms of every process sharing the directory; files of exited workers are kept so counters never go back."""
+        if self.directory is None:
+            with self.lock:
+                return {stage: copy.deepcopy(h) for stage, h in self.histograms.items()}
+
+        self.flush()
+        merged = {}
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as file:
+                    snapshot = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+            for stage, state in snapshot.items():
+                histogram = merged.get(stage)
+                if histogram is None:
+                    histogram = merged[stage] = Histogram(buckets=tuple(state["buckets"]))
+                histogram.counts = [a + b for a, b in zip(histogram.counts, state["counts"])]
+                histogram.sum += state["sum"]
+                histogram.count += state["count"]
+        return merged
+
+    def summary(self):
+        # This process only, e.g. the stages of one training run.
+        with self.lock:
+            return {stage: {"count": h.count, "sum_seconds": h.sum} for stage, h in self.histograms.items()}
+
+    def render(self):
+        name = f"{self.namespace}_stage_seconds"
+        lines = [f"# HELP {name} Time spent in each recommendation and training stage.", f"# TYPE {name} histogram"]
+
+        for stage, histogram in sorted(self.merged().items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe(stage, seconds)
+
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append((stage, seconds * 1000))
+
+def start_trace():
+    trace = []
+    return trace, _current_trace.set(trace)
+
+def end_trace(token):
+    _current_trace.reset(token)
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ThreadPoolExecutor
+from src.artifact_store import load_array, save_array
+from src.metrics import span
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+from utils.common_functions import read_yaml_file
+
+def evaluate_ratings(predict, X_test, y_test, block_size=1000000):
+    """Test RMSE and MAE on the scaled ratings, shared by every backend so their numbers compare."""
+    squared, absolute = 0.0, 0.0
+    for start in range(0, len(y_test), block_size):
+        users = np.asarray(X_test[start:start + block_size, 0], dtype=np.int64)
+        anime = np.asarray(X_test[start:start + block_size, 1], dtype=np.int64)
+        errors = predict(users, anime) - np.asarray(y_test[start:start + block_size])
+        squared += float(np.sum(errors ** 2))
+        absolute += float(np.sum(np.abs(errors)))
+
+    return {"test_rmse": (squared / len(y_test)) ** 0.5, "test_mae": absolute / len(y_test)}
+
+def update_training_report(backend, report, path=TRAINING_REPORT_PATH):
+    """Keeps the latest wall-clock and quality numbers of every backend side by side."""
+    reports = {}
+    if os.path.exists(path):
+        with open(path) as file:
+            reports = json.load(file)
+
+    reports[backend] = report
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(reports, file, indent=4)
+
+class MatrixFactorizationTrainer:
+    """Fits user and anime embeddings on the sparse rating matrix with ALS or SGD instead of Keras."""
+
+    def __init__(self, config_path):
+        self.config = read_yaml_file(config_path)["model_training"]
+        self.backend = self.config.get("backend", "als")
+        self.embedding_size = self.config["embedding_size"]
+        self.reg = self.config.get("mf_reg", 0.05)
+        self.random_state = self.config.get("mf_random_state", 42)
+        self.n_threads = self.config.get("mf_threads") or os.cpu_count()
+
+        self.global_mean = 0.0
+        self.user_factors = None
+        self.anime_factors = None
+
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        os.makedirs(WEIGHTS_DIR, exist_ok=True)
+
+    def load_data(self):
+        try:
+            X_train = load_array(X_TRAIN_ARRAY)
+            X_test = load_array(X_TEST_ARRAY)
+            y_train = load_array(Y_TRAIN)
+            y_test = load_array(Y_TEST)
+
+            # Same sizing as ModelTrainer so the weight matrices line up with the encoders.
+            n_users = int(max(X_train[:, 0].max(), X_test[:, 0].max())) + 1
+            n_anime = int(max(X_train[:, 1].max(), X_test[:, 1].max())) + 1
+
+            self.global_mean = float(np.mean(y_train))
+            ratings = sp.csr_matrix(
+                (np.asarray(y_train, dtype=np.float32) - self.global_mean, (np.asarray(X_train[:, 0]), np.asarray(X_train[:, 1]))),
+                shape=(n_users, n_anime),
+            )
+            ratings.sum_duplicates()
+
+            logging.info(f"Rating matrix built: {n_users} users x {n_anime} anime, {ratings.nnz} ratings")
+            return ratings, X_test, y_test
+
+        except Exception as e:
+            logging.error(f"Error loading data for matrix factorization: {e}")
+            raise CustomException(e, sys)
+
+    ################## ALS #################
+
+    def _solve_rows(self, ratings, fixed, out, start, stop):
+        identity = np.eye(fixed.shape[1], dtype=np.float64)
+        for row in range(start, stop):
+            begin, end = ratings.indptr[row], ratings.indptr[row + 1]
+            if begin == end:
+                out[row] = 0
+                continue
+
+            factors = fixed[ratings.indices[begin:end]].astype(np.float64)
+            # Regularisation scaled by the number of ratings (weighted-lambda ALS).
+            gram = factors.T @ factors + self.reg * (end - begin) * identity
+            out[row] = np.linalg.solve(gram, factors.T @ ratings.data[begin:end])
+
+    def _als_half_step(self, ratings, fixed, out, block_size=2048):
+        # LAPACK releases the GIL, so row blocks solve in parallel threads.
+        with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            futures = [executor.submit(self._solve_rows, ratings, fixed, out, start, min(start + block_size, ratings.shape[0])) for start in range(0, ratings.shape[0], block_size)]
+            for future in futures:
+                future.result()
+
+    def fit_als(self, ratings):
+        iterations = self.config.get("mf_iterations", 10)
+        ratings_t = ratings.T.tocsr()
+
+        for iteration in range(iterations):
+            self._als_half_step(ratings, self.anime_factors, self.user_factors)
+            self._als_half_step(ratings_t, self.user_factors, self.anime_factors)
+            logging.info(f"ALS iteration {iteration + 1}/{iterations} done")
+
+    ################## SGD #################
+
+    def fit_sgd(self, ratings):
+        epochs = self.config.get("sgd_epochs", 10)
+        batch_size = self.config.get("sgd_batch_size", 100000)
+        learning_rate = self.config.get("sgd_learning_rate", 0.05)
+        rng = np.random.default_rng(self.random_state)
+
+        coo = ratings.tocoo()
+        users, anime, targets = coo.row, coo.col, coo.data
+
+        for epoch in range(epochs):
+            order = rng.permutation(len(targets))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                u, a = users[batch], anime[batch]
+                user_rows, anime_rows = self.user_factors[u], self.anime_factors[a]
+
+                errors = targets[batch] - np.einsum("ij,ij->i", user_rows, anime_rows)
+                user_grad = errors[:, None] * anime_rows - self.reg * user_rows
+                anime_grad = errors[:, None] * user_rows - self.reg * anime_rows
+
+                # np.add.at accumulates the updates of users and anime that repeat within a batch.
+                np.add.at(self.user_factors, u, learning_rate * user_grad)
+                np.add.at(self.anime_factors, a, learning_rate * anime_grad)
+
+            logging.info(f"SGD epoch {epoch + 1}/{epochs} done")
+
+    def predict(self, encoded_user_ids, encoded_anime_ids):
+        scores = np.einsum("ij,ij->i", self.user_factors[encoded_user_ids], self.anime_factors[encoded_anime_ids])
+        return np.clip(self.global_mean + scores, 0, 1)
+
+    def save_weights(self):
+        try:
+            # Same format as ModelTrainer.save_model_and_weights: L2-normalised float32 .npy.
+            for factors, path in [(self.user_factors, USER_WEIGHTS_PATH), (self.anime_factors, ANIME_WEIGHTS_PATH)]:
+                weights = factors / np.maximum(np.linalg.norm(factors, axis=1, keepdims=True), 1e-12)
+                save_array(path, weights, np.float32)
+
+            # The NumPy scorer head belongs to a Keras model and does not apply to these embeddings.
+            if os.path.exists(SCORER_HEAD_PATH):
+                os.remove(SCORER_HEAD_PATH)
+
+            logging.info(f"User and anime weights saved successfully. User weights: {USER_WEIGHTS_PATH}, Anime weights: {ANIME_WEIGHTS_PATH}")
+
+        except Exception as e:
+            logging.error(f"Error saving matrix factorization weights: {e}")
+            raise CustomException(e, sys)
+
+    def train(self):
+        try:
+            start = time.perf_counter()
+
+            with span("model_training.load_data"):
+                ratings, X_test, y_test = self.load_data()
+
+            rng = np.random.default_rng(self.random_state)
+            self.user_factors = rng.normal(0, 0.1, size=(ratings.shape[0], self.embedding_size)).astype(np.float32)
+            self.anime_factors = rng.normal(0, 0.1, size=(ratings.shape[1], self.embedding_size)).astype(np.float32)
+
+            with span("model_training.train_model"):
+                if self.backend == "als":
+                    self.fit_als(ratings)
+                elif self.backend == "sgd":
+                    self.fit_sgd(ratings)
+                else:
+                    raise ValueError(f"Unknown matrix factorization backend: {self.backend}")
+
+            with span("model_training.save_model_and_weights"):
+                self.save_weights()
+
+            report = {"wall_clock_seconds": time.perf_counter() - start, **evaluate_ratings(self.predict, X_test, y_test)}
+            update_training_report(self.backend, report)
+
+            logging.info(f"Matrix factorization ({self.backend}) training completed: {report}")
+            return report
+
+        except Exception as e:
+            logging.error(f"Error in the matrix factorization training process: {e}")
+            raise CustomException(e, sys)
+
+if __name__ == "__main__":
+    try:
+        trainer = MatrixFactorizationTrainer(config_path=CONFIG_FILE_PATH)
+        print(json.dumps(trainer.train(), indent=4))
+    except Exception as e:
+        logging.error(f"Error in matrix factorization training execution: {e}")
+        raise CustomException(e, sys)
@@ -1,10 +1,15 @@
-import joblib
 import numpy as np
 import comet_ml
 import os
 import sys
+import time
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, LearningRateScheduler
 from src.base_model import BaseModel
+from src.artifact_store import load_array, save_array
+from src.input_pipeline import make_dataset, ThroughputCallback
+from src.metrics import span, registry
+from src.rating_scorer import export_head, compare_with_keras, RatingScorer
+from src.mf_training import evaluate_ratings, update_training_report
 from src.logger import logging
 from src.exception import CustomException
 from config.paths_config import *
@@ -14,7 +19,8 @@ class ModelTrainer:
     def __init__(self, config_path):
         self.config_path = read_yaml_file(config_path)
         self.config_path = self.config_path["model_training"]
-        self.experiment = comet_ml.Experiment(api_key="CaLMe9hKJaq7t5kvfUD02gDT6", project_name="recommender_system", workspace="atharvarai07")
+        # comet_ml reads the API key from the COMET_API_KEY environment variable.
+        self.experiment = comet_ml.Experiment(project_name="recommender_system", workspace="atharvarai07")
 
         os.makedirs(MODEL_DIR, exist_ok=True)
         os.makedirs(WEIGHTS_DIR, exist_ok=True)
@@ -22,10 +28,12 @@ class ModelTrainer:
 
     def load_data(self):
         try:
-            X_train_array = joblib.load(X_TRAIN_ARRAY)
-            X_test_array = joblib.load(X_TEST_ARRAY)
-            y_train = joblib.load(Y_TRAIN)
-            y_test = joblib.load(Y_TEST)
+            X_train = load_array(X_TRAIN_ARRAY)
+            X_test = load_array(X_TEST_ARRAY)
+            X_train_array = [X_train[:, 0], X_train[:, 1]]
+            X_test_array = [X_test[:, 0], X_test[:, 1]]
+            y_train = load_array(Y_TRAIN)
+            y_test = load_array(Y_TEST)
 
             logging.info("Data loaded successfully for model training")
 
@@ -44,9 +52,9 @@ class ModelTrainer:
             base_model = BaseModel(config_path=self.config_path)
 
             model = base_model.RecommenderNet(n_users=n_users, n_anime=n_anime)
-            start_learing_rate = self.config_path['start_learning_rate']
-            min_lr = self.config_path['min_learning_rate']
-            max_lr = self.config_path['max_learning_rate']
+            start_learing_rate = self.config_path['start_learing_rate']
+            min_lr = self.config_path['min_lr']
+            max_lr = self.config_path['max_lr']
 
             batch_size = self.config_path['batch_size']
 
@@ -69,17 +77,44 @@ class ModelTrainer:
 
             early_stopping = EarlyStopping(monitor='val_loss', patience=1, restore_best_weights=True, mode='min')
 
-            my_callbacks = [lr_callback, model_checkpoint, early_stopping]
-
-            history = model.fit(
-                x = X_train_array,
-                y = y_train,
-                batch_size=batch_size,
-                epochs=self.config_path['epochs'],
-                validation_data=(X_test_array, y_test),
-                verbose=self.config_path['verbose'],
-                callbacks=my_callbacks
-            )
+            throughput_callback = ThroughputCallback(n_examples=len(y_train), experiment=self.experiment)
+
+            my_callbacks = [lr_callback, model_checkpoint, early_stopping, throughput_callback]
+
+            if self.config_path.get('input_pipeline', 'tf_data') == 'tf_data':
+                train_dataset = make_dataset(
+                    X_TRAIN_ARRAY, Y_TRAIN, batch_size,
+                    shard_size=self.config_path.get('shard_size', 1000000),
+                    shuffle_buffer=self.config_path.get('shuffle_buffer', 1000000),
+                    cycle_length=self.config_path.get('cycle_length', 4),
+                    shuffle=True
+                )
+                test_dataset = make_dataset(
+                    X_TEST_ARRAY, Y_TEST, batch_size,
+                    shard_size=self.config_path.get('shard_size', 1000000),
+                    cycle_length=self.config_path.get('cycle_length', 4),
+                    shuffle=False
+                )
+
+                history = model.fit(
+                    train_dataset,
+                    # Already shuffled by make_dataset, across shards and within its buffer.
+                    shuffle=False,
+                    epochs=self.config_path['epochs'],
+                    validation_data=test_dataset,
+                    verbose=self.config_path['verbose'],
+                    callbacks=my_callbacks
+                )
+            else:
+                history = model.fit(
+                    x = X_train_array,
+                    y = y_train,
+                    batch_size=batch_size,
+                    epochs=self.config_path['epochs'],
+                    validation_data=(X_test_array, y_test),
+                    verbose=self.config_path['verbose'],
+                    callbacks=my_callbacks
+                )
 
             for epoch in range(len(history.history['loss'])):
                 self.experiment.log_metric("loss", history.history['loss'][epoch], step=epoch)
@@ -108,15 +143,20 @@ class ModelTrainer:
             model.save(MODEL_PATH)
             logging.info("Model saved successfully")
 
-            user_weights = self.extract_weights(layer_name=self.config_path["model_training"]["user_layer_name"], model=model)
-            anime_weights = self.extract_weights(layer_name=self.config_path["model_training"]["anime_layer_name"], model=model)
+            user_weights = self.extract_weights(layer_name=self.config_path["user_layer_name"], model=model)
+            anime_weights = self.extract_weights(layer_name=self.config_path["anime_layer_name"], model=model)
+
+            save_array(USER_WEIGHTS_PATH, user_weights, np.float32)
+            save_array(ANIME_WEIGHTS_PATH, anime_weights, np.float32)
 
-            joblib.dump(user_weights, USER_WEIGHTS_PATH)
-            joblib.dump(anime_weights, ANIME_WEIGHTS_PATH)
+            export_head(model, SCORER_HEAD_PATH)
+            scorer_report = compare_with_keras(model, RatingScorer.load())
+            self.experiment.log_metric("numpy_scorer_max_abs_diff", scorer_report["max_abs_diff"])
 
             self.experiment.log_asset(MODEL_PATH)
             self.experiment.log_asset(USER_WEIGHTS_PATH)
             self.experiment.log_asset(ANIME_WEIGHTS_PATH)
+            self.experiment.log_asset(SCORER_HEAD_PATH)
 
             logging.info(f"User and anime weights saved successfully. User weights: {USER_WEIGHTS_PATH}, Anime weights: {ANIME_WEIGHTS_PATH}")
         except Exception as e:
@@ -125,10 +165,24 @@ class ModelTrainer:
 
     def train(self):
         try:
-            X_train_array, X_test_array, y_train, y_test = self.load_data()
-            model = self.train_model(X_train_array, X_test_array, y_train, y_test)
-            model.load_weights(CHECKPOINT_DIR)
-            self.save_model_and_weights(model)
+            start = time.perf_counter()
+            with span("model_training.load_data"):
+                X_train_array, X_test_array, y_train, y_test = self.load_data()
+            with span("model_training.train_model"):
+                model = self.train_model(X_train_array, X_test_array, y_train, y_test)
+            with span("model_training.save_model_and_weights"):
+                model.load_weights(CHECKPOINT_DIR)
+                self.save_model_and_weights(model)
+
+            report = {"wall_clock_seconds": time.perf_counter() - start, **evaluate_ratings(RatingScorer.load().predict, load_array(X_TEST_ARRAY), load_array(Y_TEST))}
+            for name, value in report.items():
+                self.experiment.log_metric(name, value)
+            # RankingEvaluator logs its metrics to this same experiment.
+            update_training_report("keras", {**report, "comet_experiment_key": self.experiment.get_key()})
+
+            for stage, timing in registry.summary().items():
+                if stage.startswith("model_training."):
+                    self.experiment.log_metric(f"{stage}_seconds", timing["sum_seconds"])
             logging.info("Model training process completed successfully")
 
         except Exception as e:
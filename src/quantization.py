@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import time
+import joblib
+import numpy as np
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+from utils.common_functions import read_yaml_file
+from utils.helper import find_top_k
+from src.artifact_store import load_artifact
+
+################## QUANTIZERS #################
+
+class Float16Quantizer:
+    def fit(self, weights):
+        return self
+
+    def encode(self, weights):
+        return {"codes": np.asarray(weights, dtype=np.float16)}
+
+    def scores(self, codes, queries, rows):
+        return codes["codes"][rows].astype(np.float32) @ queries.T
+
+    def state(self):
+        return {}
+
+class Int8Quantizer:
+    """Symmetric scalar quantization with one scale per vector."""
+
+    def fit(self, weights):
+        return self
+
+    def encode(self, weights):
+        weights = np.asarray(weights, dtype=np.float32)
+        scales = np.maximum(np.abs(weights).max(axis=1), 1e-12) / 127
+        codes = np.rint(weights / scales[:, None]).astype(np.int8)
+        return {"codes": codes, "scales": scales.astype(np.float32)}
+
+    def scores(self, codes, queries, rows):
+        return (codes["codes"][rows].astype(np.float32) @ queries.T) * codes["scales"][rows, None]
+
+    def state(self):
+        return {}
+
+class ProductQuantizer:
+    """Splits vectors into n_subvectors chunks, each coded by the nearest of n_centroids k-means centroids."""
+
+    def __init__(self, n_subvectors=16, n_centroids=256, n_iter=10, random_state=42):
+        self.n_subvectors = n_subvectors
+        self.n_centroids = n_centroids
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.codebooks = None
+
+    def _split(self, weights):
+        return np.array_split(np.asarray(weights, dtype=np.float32), self.n_subvectors, axis=1)
+
+    def _assign(self, vectors, centroids):
+        # argmin ||v - c||^2 == argmax (v.c - ||c||^2 / 2)
+        return np.argmax(vectors @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+
+    def fit(self, weights, max_train=100000):
+        rng = np.random.default_rng(self.random_state)
+        weights = np.asarray(weights, dtype=np.float32)
+        if len(weights) > max_train:
+            weights = weights[np.sort(rng.choice(len(weights), size=max_train, replace=False))]
+
+        n_centroids = min(self.n_centroids, len(weights))
+        self.codebooks = []
+        for sub in self._split(weights):
+            centroids = sub[rng.choice(len(sub), size=n_centroids, replace=False)].copy()
+            for _ in range(self.n_iter):
+                assign = self._assign(sub, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, sub)
+                counts = np.bincount(assign, minlength=n_centroids)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            self.codebooks.append(centroids)
+        return self
+
+    def encode(self, weights, block_size=65536):
+        weights = np.asarray(weights, dtype=np.float32)
+        codes = np.empty((len(weights), self.n_subvectors), dtype=np.uint8)
+        for start in range(0, len(weights), block_size):
+            for j, (sub, centroids) in enumerate(zip(self._split(weights[start:start + block_size]), self.codebooks)):
+                codes[start:start + block_size, j] = self._assign(sub, centroids)
+        return {"codes": codes}
+
+    def scores(self, codes, queries, rows):
+        # Asymmetric distance: per-subspace lookup tables of query . centroid, summed over the codes.
+        block_codes = codes["codes"][rows]
+        scores = np.zeros((len(block_codes), len(queries)), dtype=np.float32)
+        for j, (sub_queries, centroids) in enumerate(zip(self._split(queries), self.codebooks)):
+            scores += (centroids @ sub_queries.T)[block_codes[:, j]]
+        return scores
+
+    def state(self):
+        return {"n_subvectors": self.n_subvectors, "n_centroids": self.n_centroids, "n_iter": self.n_iter, "random_state": self.random_state, "codebooks": self.codebooks}
+
+QUANTIZERS = {"float16": Float16Quantizer, "int8": Int8Quantizer, "pq": ProductQuantizer}
+
+################## INDEX #################
+
+class QuantizedIndex:
+    """Generates candidates on compressed vectors and re-ranks them exactly against the full-precision rows."""
+
+    def __init__(self, method="int8", rerank_factor=10, quantizer=None):
+        if method not in QUANTIZERS:
+            raise ValueError(f"Unknown quantization method: {method}. Expected one of {list(QUANTIZERS)}")
+        self.method = method
+        self.rerank_factor = rerank_factor
+        self.quantizer = quantizer or QUANTIZERS[method]()
+        self.codes = None
+        self.n_items = 0
+        # Items added or moved after build; re-ranked exactly on every query, like IVFIndex.extra_ids.
+        self.extra_ids = np.empty(0, dtype=np.int64)
+
+    def build(self, weights):
+        try:
+            self.quantizer.fit(weights)
+            self.codes = self.quantizer.encode(weights)
+            self.n_items = len(weights)
+
+            logging.info(f"{self.method} index built over {self.n_items} items: {self.nbytes / 1024 ** 2:.1f} MB of codes")
+            return self
+
+        except Exception as e:
+            logging.error(f"Error building {self.method} index: {e}")
+            raise CustomException(e, sys)
+
+    @property
+    def nbytes(self):
+        codebooks = getattr(self.quantizer, "codebooks", None) or []
+        return sum(array.nbytes for array in self.codes.values()) + sum(centroids.nbytes for centroids in codebooks)
+
+    def add(self, ids):
+        # The codes are left alone, so a copy of this index can add ids without changing what the original returns.
+        self.extra_ids = np.union1d(self.extra_ids, np.asarray(ids, dtype=np.int64))
+        return self
+
+    def search(self, weights, query_ids, top_n=10, n_probe=None, exclude_self=True, max_block_mb=64):
+        query_ids = np.atleast_1d(np.asarray(query_ids, dtype=np.int64))
+        n_candidates = min(top_n * self.rerank_factor, self.n_items)
+
+        closest = np.full((len(query_ids), top_n), -1, dtype=np.int64)
+        dists = np.full((len(query_ids), top_n), -np.inf, dtype=np.float32)
+
+        # Bound the (queries x n_items) approximate score matrix to roughly max_block_mb.
+        query_block = max(1, (max_block_mb * 1024 * 1024) // (self.n_items * 4))
+        item_block = max(1, (max_block_mb * 1024 * 1024) // (query_block * 4))
+
+        for start in range(0, len(query_ids), query_block):
+            block_ids = query_ids[start:start + query_block]
+            queries = np.asarray(weights[block_ids], dtype=np.float32)
+
+            approx = np.empty((len(block_ids), self.n_items), dtype=np.float32)
+            for item_start in range(0, self.n_items, item_block):
+                rows = slice(item_start, min(item_start + item_block, self.n_items))
+                approx[:, rows] = self.quantizer.scores(self.codes, queries, rows).T
+
+            if exclude_self:
+                # Ids appended after build have no codes; they come in through extra_ids and are excluded below.
+                coded = np.flatnonzero(block_ids < self.n_items)
+                approx[coded, block_ids[coded]] = -np.inf
+
+            k = min(n_candidates, self.n_items - 1 if exclude_self else self.n_items)
+            candidates = np.argpartition(-approx, k - 1, axis=1)[:, :k] if k < self.n_items else np.tile(np.arange(self.n_items), (len(block_ids), 1))
+
+            for row, (query, query_candidates) in enumerate(zip(queries, candidates)):
+                query_candidates = np.union1d(query_candidates, self.extra_ids) if len(self.extra_ids) else np.sort(query_candidates)
+                if exclude_self:
+                    query_candidates = query_candidates[query_candidates != block_ids[row]]
+
+                # Exact re-rank touches only the candidate rows of the full-precision (memory-mapped) matrix.
+                exact = np.asarray(weights[query_candidates], dtype=np.float32) @ query
+                order = np.argsort(-exact, kind="stable")[:top_n]
+                closest[start + row, :len(order)] = query_candidates[order]
+                dists[start + row, :len(order)] = exact[order]
+
+        return closest, dists
+
+    def save(self, path):
+        joblib.dump({
+            "method": self.method,
+            "rerank_factor": self.rerank_factor,
+            "quantizer": self.quantizer.state(),
+            "codes": {name: array[:self.n_items] for name, array in self.codes.items()},
+            "n_items": self.n_items,
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        state = joblib.load(path)
+        quantizer = None
+        if state["method"] == "pq":
+            quantizer = ProductQuantizer(**{key: value for key, value in state["quantizer"].items() if key != "codebooks"})
+            quantizer.codebooks = state["quantizer"]["codebooks"]
+
+        index = cls(method=state["method"], rerank_factor=state["rerank_factor"], quantizer=quantizer)
+        index.codes = state["codes"]
+        index.n_items = state["n_items"]
+        return index
+
+def evaluate_overlap(index, weights, n_queries=1000, top_n=10, random_state=42):
+    rng = np.random.default_rng(random_state)
+    query_ids = rng.choice(weights.shape[0], size=min(n_queries, weights.shape[0]), replace=False)
+
+    start = time.perf_counter()
+    exact, _ = find_top_k(weights, query_ids, top_n=top_n)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(query_ids)
+
+    start = time.perf_counter()
+    approx, _ = index.search(weights, query_ids, top_n=top_n)
+    approx_ms = (time.perf_counter() - start) * 1000 / len(query_ids)
+
+    hits = sum(len(np.intersect1d(a, e)) for a, e in zip(approx, exact))
+    full_bytes = weights.shape[0] * weights.shape[1] * 4
+
+    return {
+        "method": index.method,
+        "n_items": int(weights.shape[0]),
+        "float32_mb": full_bytes / 1024 ** 2,
+        "quantized_mb": index.nbytes / 1024 ** 2,
+        "memory_saved_mb": (full_bytes - index.nbytes) / 1024 ** 2,
+        "top_n_overlap": hits / exact.size,
+        "exact_ms_per_query": exact_ms,
+        "quantized_ms_per_query": approx_ms,
+    }
+
+class QuantizedIndexBuilder:
+    def __init__(self, config_path):
+        self.config = read_yaml_file(config_path)
+        self.quantization_config = self.config.get("quantization", {})
+
+        os.makedirs(WEIGHTS_DIR, exist_ok=True)
+
+    def build_index(self, weights_path, index_path):
+        try:
+            method = self.quantization_config.get("method", "none")
+
+            if method == "none":
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+                logging.info(f"Skipping quantized index for {weights_path}: quantization is disabled")
+                return None
+
+            quantizer = None
+            if method == "pq":
+                quantizer = ProductQuantizer(
+                    n_subvectors=self.quantization_config.get("pq_subvectors", 16),
+                    n_centroids=self.quantization_config.get("pq_centroids", 256),
+                    n_iter=self.quantization_config.get("n_iter", 10),
+                    random_state=self.quantization_config.get("random_state", 42),
+                )
+
+            weights = load_artifact(weights_path)
+            index = QuantizedIndex(method=method, rerank_factor=self.quantization_config.get("rerank_factor", 10), quantizer=quantizer).build(weights)
+            index.save(index_path)
+
+            report = evaluate_overlap(
+                index,
+                weights,
+                n_queries=self.quantization_config.get("eval_queries", 1000),
+                top_n=self.quantization_config.get("eval_top_n", 10),
+                random_state=self.quantization_config.get("random_state", 42),
+            )
+
+            logging.info(f"Quantized index saved to {index_path}. Report: {report}")
+            return report
+
+        except Exception as e:
+            logging.error(f"Error building quantized index from {weights_path}: {e}")
+            raise CustomException(e, sys)
+
+    def run(self):
+        try:
+            reports = {
+                "user": self.build_index(USER_WEIGHTS_PATH, USER_QUANT_INDEX_PATH),
+                "anime": self.build_index(ANIME_WEIGHTS_PATH, ANIME_QUANT_INDEX_PATH),
+            }
+
+            with open(QUANT_REPORT_PATH, "w") as file:
+                json.dump(reports, file, indent=4)
+
+            logging.info(f"Quantized indexes built successfully. Report: {QUANT_REPORT_PATH}")
+            return reports
+
+        except Exception as e:
+            logging.error(f"Error in the quantized index build: {e}")
+            raise CustomException(e, sys)
+
+if __name__ == "__main__":
+    try:
+        quantized_index_builder = QuantizedIndexBuilder(config_path=CONFIG_FILE_PATH)
+        print(json.dumps(quantized_index_builder.run(), indent=4))
+    except Exception as e:
+        logging.error(f"Error in quantized index build execution: {e}")
+        raise CustomException(e, sys)
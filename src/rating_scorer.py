@@ -0,0 +1,81 @@
+import sys
+import numpy as np
+from src.logger import logging
+from src.exception import CustomException
+from src.artifact_store import load_array
+from config.paths_config import *
+
+HEAD_PARAMETERS = ["dense_kernel", "dense_bias", "bn_gamma", "bn_beta", "bn_moving_mean", "bn_moving_variance", "bn_epsilon"]
+
+def export_head(model, path=SCORER_HEAD_PATH):
+    """Writes the Dense + BatchNormalization head of a trained RecommenderNet; the embeddings are the saved weight .npy files."""
+    try:
+        layers = {type(layer).__name__: layer for layer in model.layers}
+        kernel, bias = layers["Dense"].get_weights()
+        gamma, beta, moving_mean, moving_variance = layers["BatchNormalization"].get_weights()
+
+        np.savez(
+            path,
+            dense_kernel=np.asarray(kernel, dtype=np.float32).reshape(()),
+            dense_bias=np.asarray(bias, dtype=np.float32).reshape(()),
+            bn_gamma=np.asarray(gamma, dtype=np.float32).reshape(()),
+            bn_beta=np.asarray(beta, dtype=np.float32).reshape(()),
+            bn_moving_mean=np.asarray(moving_mean, dtype=np.float32).reshape(()),
+            bn_moving_variance=np.asarray(moving_variance, dtype=np.float32).reshape(()),
+            bn_epsilon=np.float32(layers["BatchNormalization"].epsilon),
+        )
+
+        logging.info(f"RecommenderNet head exported to {path}")
+
+    except Exception as e:
+        logging.error(f"Error exporting RecommenderNet head: {e}")
+        raise CustomException(e, sys)
+
+def load_head(path=SCORER_HEAD_PATH):
+    with np.load(path) as head:
+        return {name: head[name] for name in HEAD_PARAMETERS}
+
+class RatingScorer:
+    """NumPy re-implementation of RecommenderNet inference: cosine of the embeddings -> Dense -> BatchNormalization -> sigmoid."""
+
+    def __init__(self, user_weights, anime_weights, head):
+        # The saved weights are the L2-normalised embeddings, so their dot product is Dot(normalize=True).
+        self.user_weights = user_weights
+        self.anime_weights = anime_weights
+
+        # Inference-mode BatchNormalization and the 1x1 Dense layer fold into one affine map.
+        inv_std = head["bn_gamma"] / np.sqrt(head["bn_moving_variance"] + head["bn_epsilon"])
+        self.scale = np.float32(head["dense_kernel"] * inv_std)
+        self.shift = np.float32((head["dense_bias"] - head["bn_moving_mean"]) * inv_std + head["bn_beta"])
+
+    @classmethod
+    def load(cls, user_weights_path=USER_WEIGHTS_PATH, anime_weights_path=ANIME_WEIGHTS_PATH, head_path=SCORER_HEAD_PATH):
+        return cls(load_array(user_weights_path), load_array(anime_weights_path), load_head(head_path))
+
+    def predict(self, encoded_user_ids, encoded_anime_ids, batch_size=65536):
+        encoded_user_ids = np.asarray(encoded_user_ids, dtype=np.int64)
+        encoded_anime_ids = np.asarray(encoded_anime_ids, dtype=np.int64)
+
+        predictions = np.empty(len(encoded_user_ids), dtype=np.float32)
+        for start in range(0, len(encoded_user_ids), batch_size):
+            users = self.user_weights[encoded_user_ids[start:start + batch_size]]
+            anime = self.anime_weights[encoded_anime_ids[start:start + batch_size]]
+            logits = np.einsum("ij,ij->i", users, anime) * self.scale + self.shift
+            predictions[start:start + batch_size] = 1 / (1 + np.exp(-logits))
+        return predictions
+
+    def predict_for_user(self, encoded_user_id, encoded_anime_ids):
+        logits = (self.anime_weights[np.asarray(encoded_anime_ids, dtype=np.int64)] @ self.user_weights[encoded_user_id]) * self.scale + self.shift
+        return 1 / (1 + np.exp(-logits))
+
+def compare_with_keras(model, scorer, n_samples=10000, random_state=42):
+    rng = np.random.default_rng(random_state)
+    users = rng.integers(0, len(scorer.user_weights), size=n_samples)
+    anime = rng.integers(0, len(scorer.anime_weights), size=n_samples)
+
+    expected = model.predict([users.reshape(-1, 1), anime.reshape(-1, 1)], verbose=0).ravel()
+    actual = scorer.predict(users, anime)
+
+    report = {"n_samples": n_samples, "max_abs_diff": float(np.max(np.abs(expected - actual))), "mean_abs_diff": float(np.mean(np.abs(expected - actual)))}
+    logging.info(f"NumPy scorer vs Keras predict: {report}")
+    return report
@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import pickle
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+
+################## BACKENDS #################
+
+class InMemoryCacheBackend:
+    """Values are stored pickled, like in the file backend, so no caller shares (and can mutate) a cached object."""
+
+    def __init__(self, max_entries=100000, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                self.expirations += 1
+                return None
+
+            self.entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value):
+        value = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+class FileCacheBackend:
+    """Cache shared by every process that points at the same directory; file mtime doubles as LRU recency."""
+
+    def __init__(self, directory, max_entries=100000, ttl_seconds=3600, evict_every=100):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+
+        self.evictions = 0
+        self.expirations = 0
+        self.sets_since_evict = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + ".pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                expires_at, stored_key, value = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+        if stored_key != key:
+            return None
+
+        if expires_at < time.time():
+            self._remove(path)
+            self.expirations += 1
+            return None
+
+        os.utime(path)
+        return value
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump((time.time() + self.ttl_seconds, key, value), file)
+        os.replace(tmp_path, self._path(key))
+
+        # Scanning the directory is O(entries), so only enforce the bound every evict_every writes.
+        self.sets_since_evict += 1
+        if self.sets_since_evict >= self.evict_every:
+            self.sets_since_evict = 0
+            self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".pkl")]
+        if len(entries) <= self.max_entries:
+            return
+
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            self._remove(entry.path)
+            self.evictions += 1
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                self._remove(entry.path)
+
+    def __len__(self):
+        return sum(1 for entry in os.scandir(self.directory) if entry.name.endswith(".pkl"))
+
+################## CACHE #################
+
+class RecommendationCache:
+    def __init__(self, backend, model_version=None):
+        self.backend = backend
+
+        self.hits = 0
+        self.misses = 0
+        # The index being served: its RecommenderIndex.artifact_version, or the release version after a swap.
+        self.model_version = model_version
+
+    @classmethod
+    def from_config(cls, cache_config, model_version=None):
+        try:
+            backend_name = cache_config.get("backend", "memory")
+            max_entries = cache_config.get("max_entries", 100000)
+            ttl_seconds = cache_config.get("ttl_seconds", 3600)
+
+            if backend_name == "memory":
+                backend = InMemoryCacheBackend(max_entries=max_entries, ttl_seconds=ttl_seconds)
+            elif backend_name == "file":
+                backend = FileCacheBackend(cache_config.get("directory", CACHE_DIR), max_entries=max_entries, ttl_seconds=ttl_seconds)
+            else:
+                raise ValueError(f"Unknown cache backend: {backend_name}")
+
+            logging.info(f"Recommendation cache initialized with {backend_name} backend, max_entries: {max_entries}, ttl_seconds: {ttl_seconds}")
+            return cls(backend, model_version=model_version)
+
+        except Exception as e:
+            logging.error(f"Error initializing recommendation cache: {e}")
+            raise CustomException(e, sys)
+
+    def set_model_version(self, version):
+        # Called when the server swaps in another index; files rewritten on disk do not matter until then.
+        if version != self.model_version:
+            logging.info(f"Model version set ({self.model_version} -> {version}); clearing recommendation cache")
+            self.model_version = version
+            self.backend.clear()
+
+    def key(self, user_id, user_weight, content_weight, revision=0):
+        # revision is the index's RecommenderIndex.user_revisions entry, so a fold-in makes earlier entries unreachable in every worker.
+        return (int(user_id), float(user_weight), float(content_weight), self.model_version, int(revision))
+
+    def get(self, user_id, user_weight, content_weight, revision=0):
+        value = self.backend.get(self.key(user_id, user_weight, content_weight, revision))
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, user_id, user_weight, content_weight, value, revision=0):
+        self.backend.set(self.key(user_id, user_weight, content_weight, revision), value)
+
+    def get_or_compute(self, user_id, user_weight, content_weight, compute, revision=0):
+        value = self.get(user_id, user_weight, content_weight, revision)
+        if value is None:
+            value = compute()
+            self.set(user_id, user_weight, content_weight, value, revision)
+        return value
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "model_version": self.model_version,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+        }
@@ -0,0 +1,351 @@
+import os
+import sys
+import copy
+import json
+import numpy as np
+import pandas as pd
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+from src.ann_index import IVFIndex
+from src.quantization import QuantizedIndex
+from src.rating_scorer import RatingScorer, load_head
+from src.anime_lookup import AnimeLookup
+from src.synopsis_store import SynopsisStore
+from src.artifact_release import release_paths
+from src.artifact_store import artifact_version, load_array, load_columns, load_encoders, resident_mb, RowOverlay
+
+class RecommenderIndex:
+    def __init__(self,
+                 user_weights_path=USER_WEIGHTS_PATH,
+                 anime_weights_path=ANIME_WEIGHTS_PATH,
+                 user_ids_path=USER_IDS,
+                 anime_ids_path=ANIME_IDS,
+                 rating_df_path=RATING_DF,
+                 anime_df_path=ANIME_DF,
+                 synopsis_df_path=SYNOPSIS_DF,
+                 synopsis_blob_path=SYNOPSIS_BLOB,
+                 synopsis_index_path=SYNOPSIS_INDEX,
+                 user_ann_index_path=USER_ANN_INDEX_PATH,
+                 anime_ann_index_path=ANIME_ANN_INDEX_PATH,
+                 user_quant_index_path=USER_QUANT_INDEX_PATH,
+                 anime_quant_index_path=ANIME_QUANT_INDEX_PATH,
+                 user_favourites_offsets_path=USER_FAVOURITES_OFFSETS,
+                 user_favourites_anime_path=USER_FAVOURITES_ANIME,
+                 scorer_head_path=SCORER_HEAD_PATH,
+                 user_recommendations_path=USER_RECOMMENDATIONS_PATH,
+                 user_recommendations_meta_path=USER_RECOMMENDATIONS_META_PATH):
+        self.user_weights_path = user_weights_path
+        self.anime_weights_path = anime_weights_path
+        self.user_ids_path = user_ids_path
+        self.anime_ids_path = anime_ids_path
+        self.rating_df_path = rating_df_path
+        self.anime_df_path = anime_df_path
+        self.synopsis_df_path = synopsis_df_path
+        self.synopsis_blob_path = synopsis_blob_path
+        self.synopsis_index_path = synopsis_index_path
+        self.user_ann_index_path = user_ann_index_path
+        self.anime_ann_index_path = anime_ann_index_path
+        self.user_quant_index_path = user_quant_index_path
+        self.anime_quant_index_path = anime_quant_index_path
+        self.user_favourites_offsets_path = user_favourites_offsets_path
+        self.user_favourites_anime_path = user_favourites_anime_path
+        self.scorer_head_path = scorer_head_path
+        self.user_recommendations_path = user_recommendations_path
+        self.user_recommendations_meta_path = user_recommendations_meta_path
+
+        self.user_weights = None
+        self.anime_weights = None
+        self.user2user_encoded = {}
+        self.user2user_decoded = {}
+        self.anime2anime_encoded = {}
+        self.anime2anime_decoded = {}
+        self.rating_df = None
+        self.anime_df = None
+        self.synopsis_df = None
+        self.synopsis_store = None
+        self.user_ann_index = None
+        self.anime_ann_index = None
+        self.user_quant_index = None
+        self.anime_quant_index = None
+        self.user_favourites_offsets = None
+        self.user_favourites_anime = None
+        self.anime_rows = None
+        self.anime_lookup = None
+        self.rating_scorer = None
+        self.user_recommendations = None
+        self.user_recommendations_meta = None
+        # Fingerprint of the artifact files this index was loaded from; versions the recommendation cache.
+        self.artifact_version = None
+        self.n_trained_users = 0
+        self.trained_at = 0.0
+
+        # Serving-time state for users folded in after training (see src/user_fold_in.py); replaced, never mutated, by with_user.
+        self.user_favourites_overrides = {}
+        # Fold-ins per user id. Every worker replays the same log, so they agree on it and it can key a shared cache.
+        self.user_revisions = {}
+
+    def load_weights(self):
+        try:
+            self.user_weights = load_array(self.user_weights_path)
+            self.anime_weights = load_array(self.anime_weights_path)
+
+            logging.info(f"Weights loaded. User weights: {self.user_weights.shape}, Anime weights: {self.anime_weights.shape}")
+
+        except Exception as e:
+            logging.error(f"Error loading weights: {e}")
+            raise CustomException(e, sys)
+
+    def load_encoders(self):
+        try:
+            self.user2user_encoded, self.user2user_decoded = load_encoders(self.user_ids_path)
+            self.anime2anime_encoded, self.anime2anime_decoded = load_encoders(self.anime_ids_path)
+
+            # Users trained into this index, and when their training data was processed (copy2 keeps the mtime in releases).
+            self.n_trained_users = len(self.user2user_decoded)
+            self.trained_at = os.path.getmtime(self.user_ids_path)
+
+            logging.info(f"Encoders loaded. Users: {len(self.user2user_encoded)}, Anime: {len(self.anime2anime_encoded)}")
+
+        except Exception as e:
+            logging.error(f"Error loading encoders: {e}")
+            raise CustomException(e, sys)
+
+    def load_user_favourites(self):
+        try:
+            if os.path.exists(self.user_favourites_offsets_path) and os.path.exists(self.user_favourites_anime_path):
+                self.user_favourites_offsets = load_array(self.user_favourites_offsets_path)
+                self.user_favourites_anime = load_array(self.user_favourites_anime_path)
+
+                logging.info(f"User favourites loaded. Favourites: {len(self.user_favourites_anime)}")
+
+        except Exception as e:
+            logging.error(f"Error loading user favourites: {e}")
+            raise CustomException(e, sys)
+
+    def load_scorer(self):
+        try:
+            if self.scorer_head_path and os.path.exists(self.scorer_head_path):
+                self.rating_scorer = RatingScorer(self.user_weights, self.anime_weights, load_head(self.scorer_head_path))
+
+            logging.info(f"Rating scorer loaded: {self.rating_scorer is not None}")
+
+        except Exception as e:
+            logging.error(f"Error loading rating scorer: {e}")
+            raise CustomException(e, sys)
+
+    def load_user_recommendations(self):
+        try:
+            if self.user_recommendations_path and os.path.exists(self.user_recommendations_path) and os.path.exists(self.user_recommendations_meta_path):
+                self.user_recommendations = load_array(self.user_recommendations_path)
+                with open(self.user_recommendations_meta_path) as file:
+                    self.user_recommendations_meta = json.load(file)
+
+            logging.info(f"Materialised recommendations loaded: {None if self.user_recommendations is None else self.user_recommendations.shape}")
+
+        except Exception as e:
+            logging.error(f"Error loading materialised recommendations: {e}")
+            raise CustomException(e, sys)
+
+    def materialised_recommendations(self, encoded_user_id, user_weight, content_weight, rerank_pool=None):
+        """The precomputed top-N row of a user, or None when it must be computed online."""
+        if self.user_recommendations is None or encoded_user_id >= len(self.user_recommendations):
+            return None
+
+        # Folded-in users changed after the batch ran, and other weights give other rankings.
+        meta = self.user_recommendations_meta
+        if encoded_user_id in self.user_favourites_overrides or (user_weight, content_weight, rerank_pool) != (meta["user_weight"], meta["content_weight"], meta["rerank_pool"]):
+            return None
+
+        row = np.asarray(self.user_recommendations[encoded_user_id])
+        row = row[row >= 0]
+        return row if len(row) else None
+
+    @property
+    def synopses(self):
+        # What getSynopsis reads: the mapped store, or the synopsis frame for artifacts predating it.
+        return self.synopsis_store if self.synopsis_store is not None else self.synopsis_df
+
+    @property
+    def user_search_index(self):
+        # IVF when built, else quantized candidates with exact re-rank, else None for exact search.
+        return self.user_ann_index if self.user_ann_index is not None else self.user_quant_index
+
+    @property
+    def anime_search_index(self):
+        # Same precedence for content expansion: IVF, then quantized, then exact search.
+        return self.anime_ann_index if self.anime_ann_index is not None else self.anime_quant_index
+
+    @property
+    def has_user_favourites(self):
+        return self.user_favourites_offsets is not None and self.user_favourites_anime is not None
+
+    def load_frames(self):
+        try:
+            # The rating frame only backs the pandas fallback when no favourites table was built.
+            if not self.has_user_favourites:
+                self.rating_df = load_columns(self.rating_df_path)
+            self.anime_df = pd.read_csv(self.anime_df_path)
+            # The mapped synopsis store replaces the CSV when preprocessing wrote one.
+            if SynopsisStore.exists(self.synopsis_blob_path, self.synopsis_index_path):
+                self.synopsis_store = SynopsisStore(self.synopsis_blob_path, self.synopsis_index_path).load()
+            else:
+                self.synopsis_df = pd.read_csv(self.synopsis_df_path)
+
+            logging.info(f"Frames loaded. Ratings: {None if self.rating_df is None else self.rating_df.shape}, Anime: {self.anime_df.shape}, Synopsis: {len(self.synopses)}")
+
+        except Exception as e:
+            logging.error(f"Error loading frames: {e}")
+            raise CustomException(e, sys)
+
+    def load_ann_indexes(self):
+        try:
+            if self.user_ann_index_path and os.path.exists(self.user_ann_index_path):
+                self.user_ann_index = IVFIndex.load(self.user_ann_index_path)
+            if self.anime_ann_index_path and os.path.exists(self.anime_ann_index_path):
+                self.anime_ann_index = IVFIndex.load(self.anime_ann_index_path)
+
+            if self.user_quant_index_path and os.path.exists(self.user_quant_index_path):
+                self.user_quant_index = QuantizedIndex.load(self.user_quant_index_path)
+            if self.anime_quant_index_path and os.path.exists(self.anime_quant_index_path):
+                self.anime_quant_index = QuantizedIndex.load(self.anime_quant_index_path)
+
+            logging.info(f"ANN indexes loaded. User: {self.user_ann_index is not None}, Anime: {self.anime_ann_index is not None}, User quantized: {self.user_quant_index is not None}, Anime quantized: {self.anime_quant_index is not None}")
+
+        except Exception as e:
+            logging.error(f"Error loading ANN indexes: {e}")
+            raise CustomException(e, sys)
+
+    def build_lookups(self):
+        try:
+            # Encoded anime id -> row in anime_df, -1 for anime missing from the catalog.
+            anime_positions = pd.Series(np.arange(len(self.anime_df)), index=self.anime_df["anime_id"].values)
+            self.anime_rows = anime_positions.reindex(np.asarray(self.anime2anime_decoded.ids)).fillna(-1).astype(np.int64).values
+            self.anime_lookup = AnimeLookup(self.anime_df, self.synopses)
+
+            logging.info(f"Lookups built. Anime rows: {len(self.anime_rows)}")
+
+        except Exception as e:
+            logging.error(f"Error building lookups: {e}")
+            raise CustomException(e, sys)
+
+    @classmethod
+    def from_release(cls, version, releases_dir=RELEASES_DIR):
+        return cls(**release_paths(version, releases_dir))
+
+    def validate(self):
+        n_users, n_anime = len(self.user2user_encoded), len(self.anime2anime_encoded)
+
+        if self.user_weights.shape[0] != n_users:
+            raise ValueError(f"User weights have {self.user_weights.shape[0]} rows for {n_users} encoded users")
+        if self.anime_weights.shape[0] != n_anime:
+            raise ValueError(f"Anime weights have {self.anime_weights.shape[0]} rows for {n_anime} encoded anime")
+        if self.user_weights.shape[1] != self.anime_weights.shape[1]:
+            raise ValueError(f"User and anime embeddings differ in size: {self.user_weights.shape[1]} vs {self.anime_weights.shape[1]}")
+        if self.has_user_favourites and len(self.user_favourites_offsets) != n_users + 1:
+            raise ValueError(f"User favourites offsets cover {len(self.user_favourites_offsets) - 1} users, expected {n_users}")
+        if self.user_recommendations is not None and len(self.user_recommendations) != n_users:
+            raise ValueError(f"Materialised recommendations cover {len(self.user_recommendations)} users, expected {n_users}")
+        if not np.any(self.anime_rows >= 0):
+            raise ValueError("No encoded anime is present in the anime frame")
+
+    def resident_memory(self):
+        """MB of each served artifact actually held in memory by this process: mapped pages touched so far, and the quantized codes."""
+        report = resident_mb({
+            "user_weights": self.user_weights_path,
+            "anime_weights": self.anime_weights_path,
+            "user_favourites_offsets": self.user_favourites_offsets_path,
+            "user_favourites_anime": self.user_favourites_anime_path,
+            "user_recommendations": self.user_recommendations_path,
+        })
+        for name, quant_index in [("user_quant_index", self.user_quant_index), ("anime_quant_index", self.anime_quant_index)]:
+            if quant_index is not None:
+                report[name] = quant_index.nbytes / 1024 ** 2
+        return report
+
+    def warmup(self, block_rows=65536):
+        try:
+            # A quantized index scores on its codes and re-ranks candidate rows only; paging in the full matrix would undo its memory saving.
+            arrays = [
+                self.user_weights if self.user_quant_index is None else None,
+                self.anime_weights if self.anime_quant_index is None else None,
+                self.user_favourites_offsets,
+                self.user_favourites_anime,
+            ]
+
+            # Touch every page of the memory-mapped arrays so they sit in the shared page cache before traffic arrives.
+            checksum = 0.0
+            for array in arrays:
+                if array is None:
+                    continue
+                for start in range(0, len(array), block_rows):
+                    checksum += float(np.asarray(array[start:start + block_rows]).sum())
+
+            logging.info(f"Recommender index warmed up (checksum {checksum:.3f}). Resident MB: {self.resident_memory()}")
+
+        except Exception as e:
+            logging.error(f"Error warming up recommender index: {e}")
+            raise CustomException(e, sys)
+
+    def is_trained_since(self, user_id, timestamp):
+        """Whether the user was trained into this index from data processed after timestamp, i.e. a fold-in from then is superseded."""
+        encoded_user_id = self.user2user_encoded.get(user_id)
+        return encoded_user_id is not None and encoded_user_id < self.n_trained_users and timestamp <= self.trained_at
+
+    def with_user(self, user_id, user_vector, favourites):
+        """A copy of this index with the user added or replaced, and their encoded id; this index is left as it was."""
+        try:
+            # Shallow copy: only the small per-user structures below are new, the mapped arrays and frames are shared.
+            index = copy.copy(self)
+            index.user2user_encoded = self.user2user_encoded.copy()
+            index.user2user_decoded = self.user2user_decoded.copy()
+
+            encoded_user_id = index.user2user_encoded.get(user_id)
+            if encoded_user_id is None:
+                encoded_user_id = index.user2user_decoded.append(user_id)
+                index.user2user_encoded.append(user_id, encoded_user_id)
+
+            user_weights = self.user_weights if isinstance(self.user_weights, RowOverlay) else RowOverlay(self.user_weights)
+            index.user_weights = user_weights.with_row(encoded_user_id, user_vector)
+            index.user_favourites_overrides = {**self.user_favourites_overrides, encoded_user_id: np.asarray(favourites, dtype=np.int32)}
+            index.user_revisions = {**self.user_revisions, int(user_id): self.user_revisions.get(int(user_id), 0) + 1}
+
+            if self.user_ann_index is not None:
+                index.user_ann_index = copy.copy(self.user_ann_index).add([encoded_user_id])
+            if self.user_quant_index is not None:
+                index.user_quant_index = copy.copy(self.user_quant_index).add([encoded_user_id])
+            if self.rating_scorer is not None:
+                index.rating_scorer = copy.copy(self.rating_scorer)
+                index.rating_scorer.user_weights = index.user_weights
+
+            logging.info(f"User {user_id} upserted at encoded id {encoded_user_id} with {len(favourites)} favourites")
+            return index, encoded_user_id
+
+        except Exception as e:
+            logging.error(f"Error upserting user {user_id}: {e}")
+            raise CustomException(e, sys)
+
+    def load(self):
+        try:
+            # Stamped before reading, so a rewrite during the load gives a newer stamp than the one recorded here.
+            self.artifact_version = artifact_version([
+                self.user_weights_path, self.anime_weights_path, self.user_ids_path, self.anime_ids_path, self.anime_df_path,
+                self.user_favourites_offsets_path, self.user_favourites_anime_path, self.user_ann_index_path, self.anime_ann_index_path,
+                self.user_quant_index_path, self.anime_quant_index_path, self.scorer_head_path,
+                self.user_recommendations_path, self.user_recommendations_meta_path,
+            ])
+            self.load_weights()
+            self.load_encoders()
+            self.load_user_favourites()
+            self.load_frames()
+            self.load_ann_indexes()
+            self.load_scorer()
+            self.load_user_recommendations()
+            self.build_lookups()
+
+            logging.info("Recommender index loaded successfully")
+            return self
+
+        except Exception as e:
+            logging.error(f"Error loading recommender index: {e}")
+            raise CustomException(e, sys)
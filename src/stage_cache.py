@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+class StageCache:
+    """Records a fingerprint of each pipeline stage's inputs and outputs so unchanged stages can be skipped."""
+
+    def __init__(self, path=STAGE_FINGERPRINTS_PATH):
+        self.path = path
+        self.state = {"stages": {}, "file_hashes": {}}
+
+        if os.path.exists(self.path):
+            with open(self.path) as file:
+                self.state = json.load(file)
+
+    def file_hash(self, path):
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for name in sorted(os.listdir(path)):
+                digest.update(f"{name}:{self.file_hash(os.path.join(path, name))}".encode())
+            return digest.hexdigest()
+
+        if not os.path.exists(path):
+            return None
+
+        # Hashing multi-GB artifacts is slow, so a hash is reused while size and mtime are unchanged.
+        stat = os.stat(path)
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+        cached = self.state["file_hashes"].get(path)
+        if cached is not None and cached["stamp"] == stamp:
+            return cached["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(CHUNK_SIZE), b""):
+                digest.update(block)
+
+        self.state["file_hashes"][path] = {"stamp": stamp, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def input_fingerprint(self, inputs, config_section):
+        digest = hashlib.sha256()
+        for path in inputs:
+            digest.update(f"{path}:{self.file_hash(path)}".encode())
+        digest.update(json.dumps(config_section, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def output_hashes(self, outputs):
+        return {path: self.file_hash(path) for path in outputs}
+
+    def is_fresh(self, stage, inputs, config_section, outputs):
+        record = self.state["stages"].get(stage)
+        if record is None:
+            return False
+
+        # The stage is reused only if its inputs match and nothing has touched its outputs since.
+        return record["inputs"] == self.input_fingerprint(inputs, config_section) and record["outputs"] == self.output_hashes(outputs)
+
+    def record(self, stage, inputs, config_section, outputs):
+        self.state["stages"][stage] = {
+            "inputs": self.input_fingerprint(inputs, config_section),
+            "outputs": self.output_hashes(outputs),
+        }
+        self.save()
+
+    def invalidate(self, stage):
+        self.state["stages"].pop(stage, None)
+        self.save()
+
+    def save(self):
+        try:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                json.dump(self.state, file, indent=4)
+            os.replace(tmp_path, self.path)
+
+        except Exception as e:
+            logging.error(f"Error saving stage fingerprints: {e}")
+            raise CustomException(e, sys)
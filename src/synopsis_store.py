@@ -0,0 +1,103 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from src.logger import logging
+from src.exception import CustomException
+from src.artifact_store import save_columns, load_columns
+from config.paths_config import *
+
+def write_synopsis_store(synopsis_df, blob_path=SYNOPSIS_BLOB, index_dir=SYNOPSIS_INDEX):
+    """Writes every title and synopsis into one UTF-8 blob, with MAL_ID -> (offset, length) columns to slice it."""
+    try:
+        n = len(synopsis_df)
+        offsets = np.zeros(n, dtype=np.int64)
+        lengths = np.full(n, -1, dtype=np.int64)
+        name_offsets = np.zeros(n, dtype=np.int64)
+        name_lengths = np.full(n, -1, dtype=np.int64)
+
+        position = 0
+        with open(blob_path, "wb") as file:
+            for row, (name, synopsis) in enumerate(zip(synopsis_df["Name"].values, synopsis_df["sypnopsis"].values)):
+                # A length of -1 marks a missing value, so it reads back as None rather than "".
+                for value, value_offsets, value_lengths in [(name, name_offsets, name_lengths), (synopsis, offsets, lengths)]:
+                    if pd.isna(value):
+                        continue
+                    encoded = str(value).encode("utf-8")
+                    file.write(encoded)
+                    value_offsets[row], value_lengths[row] = position, len(encoded)
+                    position += len(encoded)
+
+        save_columns(pd.DataFrame({
+            "MAL_ID": synopsis_df["MAL_ID"].values.astype(np.int64),
+            "offset": offsets,
+            "length": lengths,
+            "name_offset": name_offsets,
+            "name_length": name_lengths,
+        }), index_dir)
+
+        logging.info(f"Synopsis store written: {n} entries, {position} bytes. Blob: {blob_path}, Index: {index_dir}")
+
+    except Exception as e:
+        logging.error(f"Error writing synopsis store: {e}")
+        raise CustomException(e, sys)
+
+class SynopsisStore:
+    """Memory-mapped synopsis blob; only the texts a response shows are ever read and decoded."""
+
+    def __init__(self, blob_path=SYNOPSIS_BLOB, index_dir=SYNOPSIS_INDEX):
+        self.blob_path = blob_path
+        self.index_dir = index_dir
+
+        self.blob = None
+        self.index = None
+        self.ids = None
+        self.names = None
+        self.id_rows = {}
+        self.name_rows = {}
+
+    @staticmethod
+    def exists(blob_path=SYNOPSIS_BLOB, index_dir=SYNOPSIS_INDEX):
+        return bool(blob_path and index_dir) and os.path.exists(blob_path) and os.path.isdir(index_dir)
+
+    def _slice(self, offset, length):
+        if length < 0:
+            return None
+        return self.blob[offset:offset + length].tobytes().decode("utf-8")
+
+    def load(self):
+        try:
+            # np.memmap cannot map an empty file.
+            self.blob = np.memmap(self.blob_path, dtype=np.uint8, mode="r") if os.path.getsize(self.blob_path) else np.empty(0, dtype=np.uint8)
+            self.index = load_columns(self.index_dir)
+
+            # Titles are short, so they are decoded once for the Name lookups; synopses stay on disk.
+            self.ids = np.asarray(self.index["MAL_ID"].values)
+            self.names = np.array([self._slice(offset, length) for offset, length in zip(self.index["name_offset"].values.tolist(), self.index["name_length"].values.tolist())], dtype=object)
+
+            # Filled back to front so the first row of a repeated key wins.
+            self.id_rows = {anime_id: row for row, anime_id in reversed(list(enumerate(self.ids.tolist())))}
+            self.name_rows = {name: row for row, name in reversed(list(enumerate(self.names))) if name is not None}
+
+            logging.info(f"Synopsis store loaded: {len(self.ids)} entries, {len(self.blob)} bytes mapped")
+            return self
+
+        except Exception as e:
+            logging.error(f"Error loading synopsis store: {e}")
+            raise CustomException(e, sys)
+
+    def __len__(self):
+        return 0 if self.ids is None else len(self.ids)
+
+    def text(self, row):
+        return self._slice(int(self.index["offset"].values[row]), int(self.index["length"].values[row]))
+
+    def get(self, anime):
+        # Same keys as getSynopsis: MAL_ID for ints, original Name for strings; the first row wins.
+        if isinstance(anime, int):
+            row = self.id_rows.get(anime)
+        elif isinstance(anime, str):
+            row = self.name_rows.get(anime)
+        else:
+            row = None
+        return None if row is None else self.text(row)
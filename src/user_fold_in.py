@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import numpy as np
+from src.logger import logging
+from src.exception import CustomException
+from config.paths_config import *
+from utils.common_functions import read_yaml_file
+
+class UserFoldIn:
+    """Embeds a new or updated user against the frozen anime embeddings and publishes an index that includes them.
+
+    Fold-ins are appended to a log that every serving process replays, so all workers serve the same users."""
+
+    def __init__(self, active_index, config_path=CONFIG_FILE_PATH, log_path=FOLD_IN_LOG_PATH):
+        # The ActiveIndex requests read from; each fold-in replaces its index with a copy holding the user.
+        self.active_index = active_index
+        # Shared by every serving process; each replays the entries it has not applied yet (see sync).
+        self.log_path = log_path
+        self.log_offset = 0
+        self.fold_in_config = read_yaml_file(config_path).get("fold_in", {})
+        self.reg = self.fold_in_config.get("reg", 0.1)
+        self.rating_min = self.fold_in_config.get("rating_min", 0)
+        self.rating_max = self.fold_in_config.get("rating_max", 10)
+        self.min_ratings = self.fold_in_config.get("min_ratings", 1)
+        self.favourites_percentile = self.fold_in_config.get("favourites_percentile", 75)
+
+    def encode_ratings(self, index, anime_ids, ratings):
+        anime_ids = np.asarray(anime_ids, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float64)
+
+        # A later rating of the same anime replaces the earlier one.
+        _, last = np.unique(anime_ids[::-1], return_index=True)
+        keep = np.sort(len(anime_ids) - 1 - last)
+        anime_ids, ratings = anime_ids[keep], ratings[keep]
+
+        encoded = np.array([index.anime2anime_encoded.get(anime_id, -1) for anime_id in anime_ids.tolist()], dtype=np.int64)
+        known = encoded >= 0
+        return encoded[known], ratings[known]
+
+    def solve_user_vector(self, index, encoded_anime_ids, ratings):
+        # Same [0, 1] scale as DataProcessor.scale_ratings, centred so the vector points towards above-average anime.
+        scaled = (ratings - self.rating_min) / (self.rating_max - self.rating_min)
+        targets = scaled - scaled.mean()
+        if not np.any(targets):
+            targets = np.ones_like(scaled)
+
+        A = np.asarray(index.anime_weights[encoded_anime_ids], dtype=np.float64)
+        gram = A.T @ A + self.reg * np.eye(A.shape[1])
+        user_vector = np.linalg.solve(gram, A.T @ targets)
+
+        # Served user embeddings are L2-normalised, as in ModelTrainer.extract_weights.
+        return (user_vector / max(np.linalg.norm(user_vector), 1e-12)).astype(np.float32)
+
+    def select_favourites(self, index, encoded_anime_ids, ratings):
+        threshold = np.percentile(ratings, self.favourites_percentile)
+        favourites = encoded_anime_ids[ratings >= threshold]
+
+        # Keep only catalog anime, ordered like the anime frame as in DataProcessor.build_user_favourites.
+        rows = index.anime_rows[favourites]
+        favourites, rows = favourites[rows >= 0], rows[rows >= 0]
+        return favourites[np.argsort(rows, kind="stable")]
+
+    ################## LOG #################
+
+    def append_log(self, user_id, anime_ids, ratings):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        entry = json.dumps({"user_id": int(user_id), "anime_ids": [int(anime_id) for anime_id in anime_ids], "ratings": [float(rating) for rating in ratings], "logged_at": time.time()})
+
+        with open(self.log_path, "ab") as file:
+            # Every worker appends to the same file; the lock keeps each entry on a line of its own.
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.write((entry + "\n").encode("utf-8"))
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def read_log(self, start):
+        # Entries appended after a byte offset; a line still being written is left for the next read.
+        with open(self.log_path, "rb") as file:
+            file.seek(start)
+            data = file.read()
+        end = data.rfind(b"\n") + 1
+        return [json.loads(line) for line in data[:end].splitlines()], start + end
+
+    def apply(self, index, entry):
+        # A retrain on data processed after the fold-in has the user's ratings; its vector and favourites win over the log.
+        # Entries from before logged_at was recorded count as older than any training run.
+        if index.is_trained_since(entry["user_id"], entry.get("logged_at", 0.0)):
+            logging.info(f"Skipping logged fold-in of user {entry['user_id']}: superseded by the trained index")
+            return index
+
+        # Ratings, not vectors, are logged, so an entry can be re-applied against other anime embeddings.
+        encoded_anime_ids, ratings = self.encode_ratings(index, entry["anime_ids"], entry["ratings"])
+        if len(encoded_anime_ids) < self.min_ratings:
+            logging.warning(f"Skipping logged fold-in of user {entry['user_id']}: {len(encoded_anime_ids)} ratings of known anime")
+            return index
+
+        user_vector = self.solve_user_vector(index, encoded_anime_ids, ratings)
+        favourites = self.select_favourites(index, encoded_anime_ids, ratings)
+        index, _ = index.with_user(entry["user_id"], user_vector, favourites)
+        return index
+
+    def sync(self):
+        """Publishes an index with every fold-in appended to the log since the last sync, by any worker; returns how many."""
+        try:
+            # One stat per call when nothing was appended.
+            if not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == self.log_offset:
+                return 0
+
+            with self.active_index.lock:
+                entries, offset = self.read_log(self.log_offset)
+
+                index = self.active_index.get()
+                for entry in entries:
+                    index = self.apply(index, entry)
+
+                self.active_index.publish(index)
+                self.log_offset = offset
+
+            logging.info(f"Applied {len(entries)} fold-ins from {self.log_path}")
+            return len(entries)
+
+        except Exception as e:
+            logging.error(f"Error syncing fold-ins from {self.log_path}: {e}")
+            raise CustomException(e, sys)
+
+    def replay(self, index):
+        """Applies every logged fold-in to an index loaded from a new release; swap it in while still holding active_index.lock."""
+        try:
+            with self.active_index.lock:
+                entries, offset = self.read_log(0) if os.path.exists(self.log_path) else ([], 0)
+
+                # Re-solved against the new release's anime embeddings, so revisions count up exactly as in every other worker.
+                # Entries the release was trained on are skipped in apply, as they are by workers that start on it.
+                for entry in entries:
+                    index = self.apply(index, entry)
+                self.log_offset = offset
+
+            logging.info(f"Replayed {len(entries)} fold-ins from {self.log_path} onto the new index")
+            return index
+
+        except Exception as e:
+            logging.error(f"Error replaying fold-ins from {self.log_path}: {e}")
+            raise CustomException(e, sys)
+
+    def fold_in(self, user_id, anime_ids, ratings):
+        try:
+            start = time.perf_counter()
+
+            with self.active_index.lock:
+                # Rejected before it reaches the log, so other workers never replay it.
+                encoded_anime_ids, _ = self.encode_ratings(self.active_index.get(), anime_ids, ratings)
+                if len(encoded_anime_ids) < self.min_ratings:
+                    raise ValueError(f"User {user_id} has {len(encoded_anime_ids)} ratings of known anime, at least {self.min_ratings} required")
+
+                # Applied through the log like everyone else's, so this worker ends up with the same index as the others.
+                self.append_log(user_id, anime_ids, ratings)
+                self.sync()
+
+                index = self.active_index.get()
+                encoded_user_id = index.user2user_encoded[user_id]
+                favourites = index.user_favourites_overrides[encoded_user_id]
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logging.info(f"Folded in user {user_id} from {len(encoded_anime_ids)} ratings in {elapsed_ms:.2f} ms")
+
+            return {"user_id": user_id, "encoded_user_id": int(encoded_user_id), "n_ratings": int(len(encoded_anime_ids)), "n_favourites": int(len(favourites)), "elapsed_ms": elapsed_ms}
+
+        except ValueError:
+            raise
+        except Exception as e:
+            logging.error(f"Error folding in user {user_id}: {e}")
+            raise CustomException(e, sys)
@@ -0,0 +1,70 @@
+import os
+import sys
+import shutil
+import yaml
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Small enough to build in a few seconds, large enough for every user to have neighbours and favourites.
+SYNTHETIC_SCALE = {"n_users": 300, "n_anime": 400, "ratings_per_user": 40, "embedding_dim": 16, "seed": 7}
+
+def write_config(root, **overrides):
+    with open(os.path.join(REPO_ROOT, "config", "config.yaml")) as file:
+        config = yaml.safe_load(file)
+
+    config["data_processing"]["min_ratings"] = 5
+    config["cache"]["enabled"] = False
+    config["releases"]["enabled"] = False
+    config["serving"]["warmup_users"] = 10
+    config["evaluation"]["n_workers"] = 2
+    config["materialisation"]["n_workers"] = 2
+    for section, values in overrides.items():
+        config.setdefault(section, {}).update(values)
+
+    os.makedirs(os.path.join(root, "config"), exist_ok=True)
+    with open(os.path.join(root, "config", "config.yaml"), "w") as file:
+        yaml.safe_dump(config, file)
+
+@pytest.fixture(scope="session")
+def artifact_tree(tmp_path_factory):
+    """Raw data, preprocessed artifacts and stand-in embeddings for a synthetic catalog, built once per session."""
+    from benchmarks.synthetic_data import generate, write_embeddings
+
+    root = str(tmp_path_factory.mktemp("artifact_tree"))
+    write_config(root)
+    generate(root, **SYNTHETIC_SCALE)
+
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        from src.data_processing import DataProcessor
+        from config.paths_config import ANIMELIST_DATA_PATH, PREPROCESSED_DATA_DIR, CONFIG_FILE_PATH
+        DataProcessor(input_file=ANIMELIST_DATA_PATH, output_dir=PREPROCESSED_DATA_DIR, config_path=CONFIG_FILE_PATH).run()
+        write_embeddings(root)
+    finally:
+        os.chdir(cwd)
+    return root
+
+@pytest.fixture
+def workdir(artifact_tree, tmp_path, monkeypatch):
+    """A private copy of the artifact tree as the working directory, so tests can rewrite artifacts freely."""
+    root = str(tmp_path / "tree")
+    shutil.copytree(artifact_tree, root, symlinks=True)
+    monkeypatch.chdir(root)
+    return root
+
+@pytest.fixture
+def index(workdir):
+    from src.recommender_index import RecommenderIndex
+    return RecommenderIndex().load()
+
+@pytest.fixture
+def load_app(workdir):
+    """Imports app.py fresh against the current working directory."""
+    def load():
+        sys.modules.pop("app", None)
+        import app
+        return app
+    yield load
+    sys.modules.pop("app", None)
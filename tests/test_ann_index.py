@@ -0,0 +1,41 @@
+import numpy as np
+from src.ann_index import IVFIndex
+from utils.helper import find_top_k
+
+def normalised(n, dim, seed=0):
+    weights = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return weights / np.linalg.norm(weights, axis=1, keepdims=True)
+
+def test_kmeans_centroids_are_normalised_list_means():
+    weights = normalised(2000, 16)
+    index = IVFIndex(n_lists=16, n_iter=3).build(weights)
+
+    assign = index._assign(weights)
+    for list_id in np.unique(assign)[:5]:
+        mean = weights[assign == list_id].sum(axis=0)
+        # One more k-means step from the final centroids moves them only slightly.
+        assert np.dot(mean / np.linalg.norm(mean), index.centroids[list_id]) > 0.95
+
+    assert np.allclose(np.linalg.norm(index.centroids, axis=1), 1, atol=1e-5)
+    assert np.array_equal(np.sort(index.list_ids), np.arange(2000))
+
+def test_probing_every_list_matches_exact_search():
+    weights = normalised(1000, 16, seed=1)
+    index = IVFIndex(n_lists=8).build(weights)
+
+    approx, _ = index.search(weights, np.arange(50), top_n=10, n_probe=index.n_lists)
+    exact, _ = find_top_k(weights, np.arange(50), top_n=10)
+    assert np.array_equal(approx, exact)
+
+def test_content_expansion_uses_anime_ann_index(index):
+    from pipeline.prediction_pipeline import hybrid_top_animes
+
+    users = np.arange(20)
+    exact = hybrid_top_animes(index, users)
+
+    index.anime_ann_index = IVFIndex(n_lists=4, n_probe=4).build(index.anime_weights)
+    assert index.anime_search_index is index.anime_ann_index
+    with_ann = hybrid_top_animes(index, users)
+
+    # Probing all lists is exhaustive, so the rankings are unchanged.
+    assert all(np.array_equal(a, b) for a, b in zip(exact, with_ann))
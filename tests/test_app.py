@@ -0,0 +1,34 @@
+import os
+import json
+from config.paths_config import USER_FAVOURITES_OFFSETS, USER_FAVOURITES_ANIME, USER_IDS
+from src.artifact_store import load_array
+
+def test_recommend_without_favourites_table_returns_json(load_app):
+    # Without the favourites table every request takes the pandas fallback in hybrid_recommendation.
+    os.remove(USER_FAVOURITES_OFFSETS)
+    os.remove(USER_FAVOURITES_ANIME)
+    app = load_app()
+    assert not app.active_index.get().has_user_favourites
+
+    user_ids = load_array(USER_IDS)[:3].tolist()
+    response = app.app.test_client().post("/api/recommend", json={"user_ids": user_ids})
+
+    assert response.status_code == 200
+    results = json.loads(response.data)["results"]
+    assert [result["user_id"] for result in results] == user_ids
+    recommendations = [recommendation for result in results for recommendation in result["recommendations"]]
+    assert recommendations
+    assert all(isinstance(recommendation["anime_id"], int) for recommendation in recommendations)
+
+def test_debug_trace_header_is_ignored_unless_enabled(workdir, load_app):
+    from conftest import write_config
+    user_ids = load_array(USER_IDS)[:2].tolist()
+
+    app = load_app()
+    response = app.app.test_client().post("/api/recommend", json={"user_ids": user_ids}, headers={"X-Debug-Trace": "1"})
+    assert response.status_code == 200 and "X-Debug-Trace" not in response.headers
+
+    write_config(workdir, serving={"debug_trace": True})
+    app = load_app()
+    response = app.app.test_client().post("/api/recommend", json={"user_ids": user_ids}, headers={"X-Debug-Trace": "1"})
+    assert response.status_code == 200 and json.loads(response.headers["X-Debug-Trace"])
@@ -0,0 +1,79 @@
+import os
+import shutil
+import joblib
+import numpy as np
+import pandas as pd
+from src.artifact_store import convert_artifacts, save_array, load_array, load_columns, RowOverlay, LEGACY_ARTIFACTS
+from src.synopsis_store import SynopsisStore
+from config.paths_config import *
+from utils.helper import getUserPreferences
+
+def write_legacy_tree():
+    """Rewrites the preprocessed directory the way the pre-npy pipeline left it."""
+    rating_df = load_columns(RATING_DF).copy()
+    user_ids, anime_ids = load_array(USER_IDS).tolist(), load_array(ANIME_IDS).tolist()
+
+    for path in [RATING_DF, SYNOPSIS_INDEX]:
+        shutil.rmtree(path)
+    for path in [USER_IDS, ANIME_IDS, USER_FAVOURITES_OFFSETS, USER_FAVOURITES_ANIME, SYNOPSIS_BLOB]:
+        os.remove(path)
+
+    rating_df.to_csv(LEGACY_ARTIFACTS["rating_df"], index=False)
+    joblib.dump(dict(enumerate(user_ids)), LEGACY_ARTIFACTS["user2user_decoded"])
+    joblib.dump(dict(enumerate(anime_ids)), LEGACY_ARTIFACTS["anime2anime_decoded"])
+
+def test_convert_artifacts_builds_favourites_and_synopsis_store(workdir):
+    offsets, favourites = np.load(USER_FAVOURITES_OFFSETS), np.load(USER_FAVOURITES_ANIME)
+    write_legacy_tree()
+
+    converted = convert_artifacts()
+
+    assert {USER_FAVOURITES_OFFSETS, USER_FAVOURITES_ANIME, SYNOPSIS_BLOB, SYNOPSIS_INDEX} <= set(converted)
+    assert np.array_equal(np.load(USER_FAVOURITES_OFFSETS), offsets)
+    assert np.array_equal(np.load(USER_FAVOURITES_ANIME), favourites)
+
+    store = SynopsisStore().load()
+    synopsis_df = pd.read_csv(SYNOPSIS_DF)
+    for mal_id, synopsis in zip(synopsis_df["MAL_ID"].tolist()[:50], synopsis_df["sypnopsis"].tolist()[:50]):
+        assert store.get(mal_id) == (None if pd.isna(synopsis) else synopsis)
+
+def test_helpers_read_rating_column_directory(workdir):
+    rating_df = load_columns(RATING_DF)
+    user_id = int(rating_df["user_id"].values[0])
+
+    from_paths = getUserPreferences(user_id, RATING_DF, ANIME_DF)
+    from_frames = getUserPreferences(user_id, rating_df, pd.read_csv(ANIME_DF))
+
+    assert not from_paths.empty
+    assert from_paths.anime_id.tolist() == from_frames.anime_id.tolist()
+
+def test_row_overlay_matches_dense_matrix():
+    base = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+    original = base.copy()
+    overlay = RowOverlay(base).with_row(3, np.ones(8)).with_row(51, np.full(8, 2.0)).with_row(50, np.zeros(8))
+
+    dense = np.concatenate([base, np.zeros((2, 8), dtype=np.float32)])
+    dense[3], dense[50], dense[51] = 1, 0, 2
+
+    assert overlay.shape == dense.shape and len(overlay) == 52
+    assert np.array_equal(overlay[[0, 3, 51, 50, 7]], dense[[0, 3, 51, 50, 7]])
+    assert np.array_equal(overlay[3], dense[3])
+    assert np.array_equal(overlay[10:20], dense[10:20]) and np.array_equal(overlay[:], dense)
+    assert np.allclose(dense[:5] @ overlay.T, dense[:5] @ dense.T)
+    assert np.allclose(overlay @ dense[3], dense @ dense[3])
+
+    # Overlays are copy-on-write and never touch the matrix underneath.
+    assert len(overlay.with_row(52, np.ones(8))) == 53 and len(overlay) == 52
+    assert overlay.base is base and np.array_equal(base, original)
+
+def test_save_array_replaces_a_mapped_file_without_touching_it(tmp_path):
+    path = str(tmp_path / "weights.npy")
+    save_array(path, np.arange(1000, dtype=np.float32))
+    mapped = load_array(path)
+
+    save_array(path, np.zeros(10, dtype=np.float32))
+
+    # The running reader keeps the old array in full; the next load sees the new one.
+    assert np.array_equal(mapped, np.arange(1000, dtype=np.float32))
+    assert np.array_equal(load_array(path), np.zeros(10, dtype=np.float32))
+    assert sorted(os.listdir(tmp_path)) == ["weights.npy"]
@@ -0,0 +1,46 @@
+import os
+import pytest
+from conftest import write_config
+from src.data_ingestion import DataIngestion
+from src.local_bucket import LocalBucket
+from config.paths_config import CONFIG_FILE_PATH, RAW_DATA_DIR
+
+FILE_NAMES = ["anime.csv", "animelist.csv"]
+
+@pytest.fixture
+def bucket_dir(tmp_path, monkeypatch):
+    """A local bucket with a 20-rating animelist.csv, and a config that ingests from it."""
+    directory = tmp_path / "bucket"
+    directory.mkdir()
+    (directory / "anime.csv").write_text("MAL_ID,Name\n" + "".join(f"{i},Anime {i}\n" for i in range(5)))
+    (directory / "animelist.csv").write_text("user_id,anime_id,rating\n" + "".join(f"{i % 4},{i % 5},{i % 10}\n" for i in range(20)))
+
+    root = tmp_path / "tree"
+    write_config(str(root), data_ingestion={"bucket_file_names": FILE_NAMES, "num_rows": 3, "truncate_file_names": ["animelist.csv"], "local_bucket_dir": str(directory)})
+    monkeypatch.chdir(root)
+    return directory
+
+def read_raw(file_name):
+    with open(os.path.join(RAW_DATA_DIR, file_name)) as file:
+        return file.read()
+
+def test_truncates_animelist_and_copies_other_files_whole(bucket_dir):
+    ingestion = DataIngestion(config=CONFIG_FILE_PATH)
+    ingestion.initiate_data_ingestion()
+
+    assert isinstance(ingestion.bucket, LocalBucket)
+    assert read_raw("animelist.csv").splitlines() == (bucket_dir / "animelist.csv").read_text().splitlines()[:4]
+    assert read_raw("anime.csv") == (bucket_dir / "anime.csv").read_text()
+
+def test_second_run_skips_unchanged_files(bucket_dir):
+    DataIngestion(config=CONFIG_FILE_PATH).initiate_data_ingestion()
+
+    ingestion = DataIngestion(config=CONFIG_FILE_PATH)
+    bucket = ingestion.get_bucket()
+    assert [ingestion.download_file(bucket, file_name) for file_name in FILE_NAMES] == [False, False]
+
+    # A changed object, or a different truncation, is downloaded again.
+    (bucket_dir / "anime.csv").write_text("MAL_ID,Name\n1,Renamed\n")
+    assert ingestion.download_file(bucket, "anime.csv") and read_raw("anime.csv") == "MAL_ID,Name\n1,Renamed\n"
+    ingestion.num_rows = 5
+    assert ingestion.download_file(bucket, "animelist.csv") and len(read_raw("animelist.csv").splitlines()) == 6
@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pandas as pd
+from conftest import write_config
+from src.data_processing import DataProcessor
+from src.artifact_store import load_array, load_columns
+from config.paths_config import *
+
+OUTPUTS = [USER_IDS, ANIME_IDS, X_TRAIN_ARRAY, X_TEST_ARRAY, Y_TRAIN, Y_TEST, USER_FAVOURITES_OFFSETS, USER_FAVOURITES_ANIME]
+
+def processor():
+    return DataProcessor(input_file=ANIMELIST_DATA_PATH, output_dir=PREPROCESSED_DATA_DIR, config_path=CONFIG_FILE_PATH)
+
+def test_streaming_matches_in_memory(workdir):
+    # The shared tree was preprocessed in memory.
+    in_memory = {path: np.load(path) for path in OUTPUTS}
+    in_memory_ratings = load_columns(RATING_DF, mmap_mode=None)
+
+    write_config(workdir, data_processing={"mode": "streaming"})
+    processor().run()
+
+    for path, expected in in_memory.items():
+        assert np.array_equal(np.load(path), expected), path
+    streamed_ratings = load_columns(RATING_DF)
+    for column in in_memory_ratings.columns:
+        assert np.array_equal(streamed_ratings[column].values, in_memory_ratings[column].values), column
+
+def test_favourites_do_not_depend_on_block_size(workdir):
+    data_processor = processor()
+    data_processor.rating_df = load_columns(RATING_DF)
+    data_processor.anime_df = pd.read_csv(ANIME_DF)
+    data_processor.user2user_encoded = {user_id: code for code, user_id in enumerate(load_array(USER_IDS).tolist())}
+    data_processor.anime2anime_encoded = {anime_id: code for code, anime_id in enumerate(load_array(ANIME_IDS).tolist())}
+
+    data_processor.build_user_favourites()
+    offsets, favourites = data_processor.user_favourites_offsets, data_processor.user_favourites_anime
+
+    # Small blocks split the rating chunks and the user blocks many times over.
+    data_processor.build_user_favourites(block_rows=97)
+    assert np.array_equal(data_processor.user_favourites_offsets, offsets)
+    assert np.array_equal(data_processor.user_favourites_anime, favourites)
+    assert len(favourites) > 0
+
+def test_streaming_counts_match_pandas_for_sorted_and_shuffled_files(workdir):
+    ratings = pd.read_csv(ANIMELIST_DATA_PATH, usecols=["user_id", "anime_id", "rating"])
+
+    for name, frame in [("sorted", ratings.sort_values("user_id", kind="stable")), ("shuffled", ratings.sample(frac=1, random_state=0))]:
+        path = os.path.join(workdir, f"animelist_{name}.csv")
+        frame[["user_id", "anime_id", "rating"]].to_csv(path, index=False)
+        data_processor = DataProcessor(input_file=path, output_dir=PREPROCESSED_DATA_DIR, config_path=CONFIG_FILE_PATH)
+
+        # Chunks far smaller than a user's ratings, so runs of one user span several chunks.
+        n_ratings, min_rating, max_rating, first_row = data_processor.count_ratings_streaming(chunksize=997)
+
+        expected = frame.assign(row=np.arange(len(frame))).groupby("user_id").agg(n=("rating", "size"), lo=("rating", "min"), hi=("rating", "max"), first=("row", "min"))
+        users = expected.index.values
+        assert np.array_equal(n_ratings[users], expected.n.values), name
+        assert np.array_equal(min_rating[users], expected.lo.values), name
+        assert np.array_equal(max_rating[users], expected.hi.values), name
+        assert np.array_equal(first_row[users], expected["first"].values), name
+        assert n_ratings.sum() == len(frame)
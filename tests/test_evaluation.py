@@ -0,0 +1,23 @@
+import json
+from src.evaluation import RankingEvaluator
+from src.mf_training import update_training_report
+from config.paths_config import CONFIG_FILE_PATH, EVALUATION_REPORT_PATH
+
+def test_run_writes_the_report_without_a_training_experiment(workdir):
+    evaluator = RankingEvaluator(config_path=CONFIG_FILE_PATH)
+    assert evaluator.experiment_key() is None
+
+    report = evaluator.run()
+    with open(EVALUATION_REPORT_PATH) as file:
+        assert json.load(file) == report
+    assert report["n_users"] > 0 and 0 <= report["recall@10"] <= 1
+
+def test_experiment_key_is_read_from_the_configured_backend(workdir):
+    update_training_report("als", {"test_rmse": 0.2})
+    update_training_report("keras", {"test_rmse": 0.1, "comet_experiment_key": "abc123"})
+
+    evaluator = RankingEvaluator(config_path=CONFIG_FILE_PATH)
+    assert evaluator.backend == "keras" and evaluator.experiment_key() == "abc123"
+
+    evaluator.backend = "als"
+    assert evaluator.experiment_key() is None
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from config.paths_config import CONFIG_FILE_PATH, X_TRAIN_ARRAY, Y_TRAIN
+from utils.common_functions import read_yaml_file
+
+tf = pytest.importorskip("tensorflow")
+
+def test_dataset_streams_every_row_once(workdir):
+    from src.input_pipeline import make_dataset
+
+    X, y = np.load(X_TRAIN_ARRAY), np.load(Y_TRAIN)
+    dataset = make_dataset(X_TRAIN_ARRAY, Y_TRAIN, batch_size=64, shard_size=500, shuffle_buffer=1000)
+    assert int(dataset.cardinality()) == -(-len(y) // 64)
+
+    users, anime, ratings = [], [], []
+    for inputs, batch_ratings in dataset:
+        assert inputs["user"].shape[1:] == (1,) and inputs["anime"].shape[1:] == (1,)
+        users.append(inputs["user"].numpy().ravel())
+        anime.append(inputs["anime"].numpy().ravel())
+        ratings.append(batch_ratings.numpy())
+
+    streamed = np.rec.fromarrays([np.concatenate(users), np.concatenate(anime), np.concatenate(ratings)])
+    expected = np.rec.fromarrays([X[:, 0].astype(np.int32), X[:, 1].astype(np.int32), y.astype(np.float32)])
+    assert np.array_equal(np.sort(streamed), np.sort(expected))
+
+def test_model_takes_a_training_step_on_the_dataset(workdir):
+    from src.base_model import BaseModel
+    from src.input_pipeline import make_dataset
+
+    config = read_yaml_file(CONFIG_FILE_PATH)["model_training"]
+    config["embedding_size"] = 8
+    assert config["input_pipeline"] == "tf_data"
+
+    X = np.load(X_TRAIN_ARRAY, mmap_mode="r")
+    model = BaseModel(config_path=config).RecommenderNet(n_users=int(X[:, 0].max()) + 1, n_anime=int(X[:, 1].max()) + 1)
+    before = model.get_layer("user_embedding").get_weights()[0].copy()
+
+    dataset = make_dataset(X_TRAIN_ARRAY, Y_TRAIN, batch_size=256, shard_size=1000, shuffle_buffer=2000)
+    history = model.fit(dataset.take(1), epochs=1, shuffle=False, verbose=0)
+
+    assert np.isfinite(history.history["loss"][0])
+    assert not np.array_equal(before, model.get_layer("user_embedding").get_weights()[0])
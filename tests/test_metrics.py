@@ -0,0 +1,37 @@
+import os
+from src.metrics import MetricsRegistry
+
+def count_line(rendered, stage):
+    return next(line for line in rendered.splitlines() if line.startswith(f'anime_recommender_stage_seconds_count{{stage="{stage}"}}'))
+
+def test_render_sums_every_forked_worker(tmp_path):
+    registry = MetricsRegistry()
+    registry.share(str(tmp_path))
+    registry.observe("warmup", 0.5)
+
+    workers = []
+    for n_requests in [2, 3]:
+        pid = os.fork()
+        if pid == 0:
+            # A worker starts without the parent's observations and writes its own snapshot.
+            status = 0 if not registry.histograms else 1
+            for _ in range(n_requests):
+                registry.observe("request", 0.01)
+            registry.flush()
+            os._exit(status)
+        workers.append(pid)
+
+    for pid in workers:
+        assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+
+    rendered = registry.render()
+    assert count_line(rendered, "warmup").endswith(" 1")
+    assert count_line(rendered, "request").endswith(" 5")
+    assert 'anime_recommender_stage_seconds_bucket{stage="request",le="0.01"} 5' in rendered
+
+def test_share_drops_snapshots_of_an_earlier_server(tmp_path):
+    (tmp_path / "12345.json").write_text('{"request": {"buckets": [1.0], "counts": [7], "sum": 1.0, "count": 7}}')
+    registry = MetricsRegistry()
+    registry.share(str(tmp_path))
+    registry.observe("request", 0.2)
+    assert count_line(registry.render(), "request").endswith(" 1")
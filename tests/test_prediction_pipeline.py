@@ -0,0 +1,24 @@
+from src.artifact_store import load_columns
+from config.paths_config import RATING_DF
+from utils.helper import find_similar_users, getUserPreferences, getUserRecommendation, rank_user_favourites
+
+def test_favourites_csr_matches_pandas_recommendation(index):
+    rating_df = load_columns(RATING_DF)
+
+    compared = 0
+    for user_id in list(index.user2user_encoded)[:25]:
+        similar_users = find_similar_users(user_id, index.user_weights, index.user2user_encoded, index.user2user_decoded, top_n=10)
+
+        expected = getUserRecommendation(similar_users, getUserPreferences(user_id, rating_df, index.anime_df), index.anime_df, rating_df, index.synopses)
+        # The neighbour step of hybrid_top_animes, on the same neighbours.
+        candidates, counts = rank_user_favourites(
+            [index.user2user_encoded[uid] for uid in similar_users.user_id], index.user2user_encoded[user_id],
+            index.user_favourites_offsets, index.user_favourites_anime, top_n=10
+        )
+        names = index.anime_df.set_index("anime_id").reindex([index.anime2anime_decoded.get(anime) for anime in candidates.tolist()]).eng_version
+
+        assert names.tolist() == expected.anime_name.tolist()
+        assert counts.tolist() == expected.number_of_similar_users_preferred.tolist()
+        compared += len(expected)
+
+    assert compared > 0
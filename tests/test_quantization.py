@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from src.quantization import QuantizedIndex
+from src.recommender_index import RecommenderIndex
+from utils.helper import find_top_k
+
+@pytest.mark.parametrize("method, min_overlap", [("float16", 0.99), ("int8", 0.95), ("pq", 0.5)])
+def test_quantized_top10_overlaps_exact_search(index, method, min_overlap):
+    weights = index.user_weights
+    quant_index = QuantizedIndex(method).build(weights)
+
+    query_ids = np.arange(100)
+    exact, _ = find_top_k(weights, query_ids, top_n=10)
+    approx, _ = quant_index.search(weights, query_ids, top_n=10)
+
+    overlap = np.mean([len(np.intersect1d(a, e)) / 10 for a, e in zip(approx, exact)])
+    assert overlap >= min_overlap
+
+def test_warmup_leaves_the_float32_matrix_out_when_quantized(workdir):
+    # Codes are built from a private copy, so the index's own mapping of the matrix starts untouched.
+    quantized = RecommenderIndex().load()
+    quantized.user_quant_index = QuantizedIndex("int8").build(np.load(quantized.user_weights_path))
+    quantized.warmup()
+
+    report = quantized.resident_memory()
+    assert report["user_quant_index"] > 0
+    assert report["user_weights"] == 0 and report["anime_weights"] > 0
+
+    plain = RecommenderIndex().load()
+    plain.warmup()
+    assert plain.resident_memory()["user_weights"] >= plain.user_weights.nbytes / 1024 ** 2
@@ -0,0 +1,32 @@
+import numpy as np
+from conftest import write_config
+from src.artifact_store import save_array, load_array
+from src.recommendation_cache import InMemoryCacheBackend, RecommendationCache
+from config.paths_config import USER_WEIGHTS_PATH
+
+def test_memory_backend_hands_out_copies():
+    cache = RecommendationCache(InMemoryCacheBackend(), model_version="v1")
+    recommendations = [{"anime_id": 1, "mal_rating": 8.5}]
+    cache.set(7, 0.5, 0.5, recommendations)
+
+    recommendations.append({"anime_id": 2})
+    cache.get(7, 0.5, 0.5)[0]["anime_id"] = 99
+    assert cache.get(7, 0.5, 0.5) == [{"anime_id": 1, "mal_rating": 8.5}]
+
+def test_cache_is_versioned_by_the_loaded_index_not_the_files_on_disk(workdir, load_app):
+    write_config(workdir, cache={"enabled": True, "backend": "memory"})
+    app = load_app()
+    client = app.app.test_client()
+    index = app.active_index.get()
+    assert app.recommendation_cache.model_version == index.artifact_version is not None
+
+    user_id = index.user2user_decoded[3]
+    client.post("/api/recommend", json={"user_ids": [user_id]})
+
+    # A retrain rewrites the weights under the running server, which keeps serving the index it loaded.
+    save_array(USER_WEIGHTS_PATH, np.asarray(load_array(USER_WEIGHTS_PATH))[::-1])
+    client.post("/api/recommend", json={"user_ids": [user_id]})
+    assert app.recommendation_cache.hits == 1 and app.recommendation_cache.model_version == index.artifact_version
+
+    from src.recommender_index import RecommenderIndex
+    assert RecommenderIndex().load().artifact_version != index.artifact_version
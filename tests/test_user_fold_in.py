@@ -0,0 +1,206 @@
+import json
+import numpy as np
+from src.artifact_release import ActiveIndex
+from src.artifact_store import RowOverlay
+from src.ann_index import IVFIndex
+from src.quantization import QuantizedIndex
+from src.user_fold_in import UserFoldIn
+from pipeline.prediction_pipeline import hybrid_recommendation_batch
+from utils.helper import find_top_k
+
+NEW_USER_ID = 10 ** 9
+
+def catalog_ratings(index, n=30, seed=0):
+    anime_ids = np.random.default_rng(seed).choice(np.asarray(index.anime2anime_decoded.ids), size=n, replace=False)
+    ratings = np.random.default_rng(seed + 1).integers(1, 11, size=n)
+    return anime_ids.tolist(), ratings.tolist()
+
+def test_fold_in_publishes_a_copy_and_leaves_the_served_index_alone(index):
+    active_index = ActiveIndex(index)
+    mapped_weights = index.user_weights
+    n_users = len(index.user2user_encoded)
+
+    result = UserFoldIn(active_index).fold_in(NEW_USER_ID, *catalog_ratings(index))
+    folded = active_index.get()
+
+    # The index a running request holds is unchanged.
+    assert index.user_weights is mapped_weights and NEW_USER_ID not in index.user2user_encoded
+    assert len(index.user2user_encoded) == n_users and not index.user_favourites_overrides
+
+    # The new one overlays a single row on the same mapped matrix instead of copying it.
+    assert result["encoded_user_id"] == n_users
+    assert isinstance(folded.user_weights, RowOverlay) and folded.user_weights.base is mapped_weights
+    assert folded.user_weights.rows.shape == (1, mapped_weights.shape[1])
+    assert folded.user2user_encoded[NEW_USER_ID] == n_users and folded.user2user_decoded[n_users] == NEW_USER_ID
+
+    response = hybrid_recommendation_batch([NEW_USER_ID], index=folded)[0]
+    assert "error" not in response and response["recommendations"]
+
+def test_refolded_user_is_searched_with_the_new_vector(index):
+    active_index = ActiveIndex(index)
+    user_id = index.user2user_decoded[5]
+
+    UserFoldIn(active_index).fold_in(user_id, *catalog_ratings(index, seed=3))
+    folded = active_index.get()
+    assert len(folded.user2user_encoded) == len(index.user2user_encoded)
+
+    dense = np.array(index.user_weights)
+    dense[5] = folded.user_weights[5]
+    assert not np.array_equal(dense[5], index.user_weights[5])
+
+    expected, _ = find_top_k(dense, np.arange(20), top_n=10)
+    actual, _ = find_top_k(folded.user_weights, np.arange(20), top_n=10)
+    assert np.array_equal(actual, expected)
+
+def test_folded_users_are_candidates_of_ann_and_quantized_search(index):
+    index.user_ann_index = IVFIndex(n_lists=4, n_probe=1).build(index.user_weights)
+    index.user_quant_index = QuantizedIndex("int8").build(index.user_weights)
+    active_index = ActiveIndex(index)
+
+    # Two new users with the same ratings get the same vector, so each is the other's nearest neighbour.
+    fold_in = UserFoldIn(active_index)
+    fold_in.fold_in(NEW_USER_ID, *catalog_ratings(index, seed=5))
+    fold_in.fold_in(NEW_USER_ID + 1, *catalog_ratings(index, seed=5))
+    folded = active_index.get()
+    encoded_user_id, twin_id = folded.user2user_encoded[NEW_USER_ID], folded.user2user_encoded[NEW_USER_ID + 1]
+
+    assert len(index.user_ann_index.extra_ids) == 0 and len(index.user_quant_index.extra_ids) == 0
+    # Probing a single list would usually miss the new users; the extra ids are searched on every query.
+    for search_index in [folded.user_ann_index, folded.user_quant_index]:
+        closest, _ = search_index.search(folded.user_weights, [encoded_user_id], top_n=5)
+        assert closest[0, 0] == twin_id and encoded_user_id not in closest[0]
+
+    result = hybrid_recommendation_batch([NEW_USER_ID], index=folded)[0]
+    assert "error" not in result and result["recommendations"]
+
+def test_fold_ins_reach_every_worker_through_the_log(index, tmp_path):
+    from src.recommender_index import RecommenderIndex
+    from src.recommendation_cache import RecommendationCache, FileCacheBackend
+
+    log_path = str(tmp_path / "fold_in_log.jsonl")
+    worker_a = UserFoldIn(ActiveIndex(index), log_path=log_path)
+    worker_b = UserFoldIn(ActiveIndex(RecommenderIndex().load()), log_path=log_path)
+
+    # Both workers share a file cache; b has an entry for a trained user from before the fold-in.
+    shared = str(tmp_path / "cache")
+    cache_a, cache_b = RecommendationCache(FileCacheBackend(shared)), RecommendationCache(FileCacheBackend(shared))
+    user_id = index.user2user_decoded[7]
+    cache_b.set(user_id, 0.5, 0.5, ["stale"], worker_b.active_index.get().user_revisions.get(user_id, 0))
+
+    worker_a.fold_in(NEW_USER_ID, *catalog_ratings(index))
+    worker_a.fold_in(user_id, *catalog_ratings(index, seed=9))
+    assert worker_b.sync() == 2
+    assert worker_b.sync() == 0
+
+    folded_a, folded_b = worker_a.active_index.get(), worker_b.active_index.get()
+    for folded_user_id in [NEW_USER_ID, user_id]:
+        encoded_user_id = folded_a.user2user_encoded[folded_user_id]
+        assert folded_b.user2user_encoded[folded_user_id] == encoded_user_id
+        assert np.array_equal(folded_b.user_weights[encoded_user_id], folded_a.user_weights[encoded_user_id])
+        assert np.array_equal(folded_b.user_favourites_overrides[encoded_user_id], folded_a.user_favourites_overrides[encoded_user_id])
+
+    # Both workers key the user by the same revision, so neither reads the entry from before the fold-in.
+    revision = folded_a.user_revisions[user_id]
+    assert revision == folded_b.user_revisions[user_id] == 1
+    assert cache_a.get(user_id, 0.5, 0.5, revision) is None and cache_b.get(user_id, 0.5, 0.5, revision) is None
+
+def test_partially_written_log_line_waits_for_the_next_sync(index, tmp_path):
+    log_path = tmp_path / "fold_in_log.jsonl"
+    worker = UserFoldIn(ActiveIndex(index), log_path=str(log_path))
+
+    anime_ids, ratings = catalog_ratings(index)
+    line = json.dumps({"user_id": NEW_USER_ID, "anime_ids": anime_ids, "ratings": ratings}) + "\n"
+    log_path.write_text(line[:20])
+    assert worker.sync() == 0
+
+    log_path.write_text(line)
+    assert worker.sync() == 1
+    assert NEW_USER_ID in worker.active_index.get().user2user_encoded
+
+def test_fold_in_endpoint_bypasses_cached_recommendations(workdir, load_app):
+    from conftest import write_config
+    write_config(workdir, cache={"enabled": True, "backend": "memory"})
+    app = load_app()
+    client = app.app.test_client()
+
+    index = app.active_index.get()
+    user_id = index.user2user_decoded[11]
+    before = client.post("/api/recommend", json={"user_ids": [user_id]}).get_json()["results"][0]["recommendations"]
+    assert client.post("/api/recommend", json={"user_ids": [user_id]}).get_json()["results"][0]["recommendations"] == before
+    assert app.recommendation_cache.hits == 1
+
+    anime_ids, ratings = catalog_ratings(index, n=40, seed=13)
+    response = client.post("/api/users/fold_in", json={"user_id": user_id, "ratings": [{"anime_id": a, "rating": r} for a, r in zip(anime_ids, ratings)]})
+    assert response.status_code == 200
+
+    after = client.post("/api/recommend", json={"user_ids": [user_id]}).get_json()["results"][0]["recommendations"]
+    expected = hybrid_recommendation_batch([user_id], index=app.active_index.get(), materialised=app.use_materialised)[0]["recommendations"]
+    assert after == expected and after != before
+    assert app.recommendation_cache.hits == 1
+
+def test_release_swap_keeps_folded_in_users(workdir, load_app):
+    from conftest import write_config
+    from src.recommender_index import RecommenderIndex
+    write_config(workdir, cache={"enabled": True, "backend": "memory"})
+    app = load_app()
+    client = app.app.test_client()
+
+    index = app.active_index.get()
+    user_id = index.user2user_decoded[11]
+    for folded_user_id, seed in [(NEW_USER_ID, 3), (user_id, 13)]:
+        anime_ids, ratings = catalog_ratings(index, n=40, seed=seed)
+        response = client.post("/api/users/fold_in", json={"user_id": folded_user_id, "ratings": [{"anime_id": a, "rating": r} for a, r in zip(anime_ids, ratings)]})
+        assert response.status_code == 200
+
+    client.post("/api/recommend", json={"user_ids": [user_id]})
+    folded = app.active_index.get()
+    assert len(app.recommendation_cache.backend) == 1
+
+    app.swap_release(RecommenderIndex().load(), "v2")
+    swapped = app.active_index.get()
+
+    assert app.active_index.version == "v2" and swapped is not folded
+    assert swapped.user_revisions == folded.user_revisions
+    for folded_user_id in [NEW_USER_ID, user_id]:
+        encoded_user_id = swapped.user2user_encoded[folded_user_id]
+        assert encoded_user_id == folded.user2user_encoded[folded_user_id]
+        assert np.allclose(swapped.user_weights[encoded_user_id], folded.user_weights[encoded_user_id])
+        assert np.array_equal(swapped.user_favourites_overrides[encoded_user_id], folded.user_favourites_overrides[encoded_user_id])
+    assert len(app.recommendation_cache.backend) == 0
+
+    # Nothing is applied twice by the next request's sync.
+    assert app.user_fold_in.sync() == 0
+
+def test_retrained_users_are_not_overridden_by_their_logged_fold_ins(index, tmp_path):
+    from src.artifact_store import save_array, load_array
+    from src.recommender_index import RecommenderIndex
+    from config.paths_config import USER_IDS, USER_WEIGHTS_PATH, USER_FAVOURITES_OFFSETS
+
+    fold_in = UserFoldIn(ActiveIndex(index), log_path=str(tmp_path / "fold_in_log.jsonl"))
+    trained_user_id = index.user2user_decoded[7]
+    fold_in.fold_in(NEW_USER_ID, *catalog_ratings(index, seed=3))
+    fold_in.fold_in(trained_user_id, *catalog_ratings(index, seed=9))
+
+    # A retrain on data processed after both fold-ins now knows the new user as well.
+    trained_row = np.full(index.user_weights.shape[1], 1 / np.sqrt(index.user_weights.shape[1]), dtype=np.float32)
+    save_array(USER_WEIGHTS_PATH, np.vstack([load_array(USER_WEIGHTS_PATH), trained_row]))
+    offsets = load_array(USER_FAVOURITES_OFFSETS)
+    save_array(USER_FAVOURITES_OFFSETS, np.append(offsets, offsets[-1]))
+    save_array(USER_IDS, np.append(load_array(USER_IDS), NEW_USER_ID))
+    retrained = RecommenderIndex().load()
+
+    replayed = fold_in.replay(retrained)
+    for user_id in [NEW_USER_ID, trained_user_id]:
+        encoded_user_id = retrained.user2user_encoded[user_id]
+        assert np.array_equal(replayed.user_weights[encoded_user_id], retrained.user_weights[encoded_user_id])
+        assert encoded_user_id not in replayed.user_favourites_overrides and user_id not in replayed.user_revisions
+    assert np.array_equal(replayed.user_weights[retrained.user2user_encoded[NEW_USER_ID]], trained_row)
+
+    # A fold-in after the retrain still applies, in this worker and in one that starts on the retrained index.
+    fold_in.active_index.swap(replayed, "v2")
+    fold_in.fold_in(trained_user_id, *catalog_ratings(index, seed=11))
+    assert fold_in.active_index.get().user_revisions == {trained_user_id: 1}
+
+    restarted = UserFoldIn(ActiveIndex(RecommenderIndex().load()), log_path=fold_in.log_path)
+    restarted.sync()
+    assert restarted.active_index.get().user_revisions == {trained_user_id: 1}
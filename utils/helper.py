@@ -1,19 +1,33 @@
+import os
 import pandas as pd
 import numpy as np
-import joblib
 from config.paths_config import *
+from src.artifact_store import load_artifact, load_columns
+from src.synopsis_store import SynopsisStore
 from collections import defaultdict, Counter
 
 def _ensure_df(df_or_path):
-    if isinstance(df_or_path, pd.DataFrame):
-        return df_or_path
-    return pd.read_csv(df_or_path)
+    # Paths are read, column directories such as RATING_DF included; frames and a SynopsisStore pass through.
+    if isinstance(df_or_path, str):
+        return load_columns(df_or_path) if os.path.isdir(df_or_path) else pd.read_csv(df_or_path)
+    return df_or_path
+
+def _ensure_artifact(artifact_or_path):
+    if isinstance(artifact_or_path, str):
+        return load_artifact(artifact_or_path)
+    return artifact_or_path
 
 ################## 1. GET_ANIME_FRAME #################
 
-def getAnimeFrame(anime, df_path: str):
+def getAnimeFrame(anime, df_path: str, lookup = None):
     df = _ensure_df(df_path)
     try:
+        # O(1) through the prebuilt indexes of src/anime_lookup.py instead of a full-frame scan.
+        if lookup is not None:
+            row = lookup.anime_row(anime)
+            if row is None:
+                return None if not isinstance(anime, (int, str)) else df.iloc[0:0]
+            return df.iloc[row:row + 1]
         if isinstance(anime, int):
             return df[df.anime_id == anime]
         if isinstance(anime, str):
@@ -23,9 +37,18 @@ def getAnimeFrame(anime, df_path: str):
 
 ################### 2. GET_ANIME_SYNOPSIS #################
 
-def getSynopsis(anime, df_path: str):
+def getSynopsis(anime, df_path: str, lookup = None):
     df = _ensure_df(df_path)
     try:
+        # A SynopsisStore slices only this text out of the mapped blob.
+        if isinstance(df, SynopsisStore):
+            if lookup is None:
+                return df.get(anime)
+            row = lookup.synopsis_row(anime)
+            return None if row is None else df.text(row)
+        if lookup is not None:
+            row = lookup.synopsis_row(anime)
+            return None if row is None else df.sypnopsis.values[row]
         if isinstance(anime, int):
             return df[df.MAL_ID == anime].sypnopsis.values[0]
         if isinstance(anime, str):
@@ -37,30 +60,28 @@ def getSynopsis(anime, df_path: str):
 
 def find_similar_animes(name, anime_weights_path, anime2anime_encoded_path, anime2anime_decoded_path, anime_df_path, synopsis_df_path, top_n = 10, return_dists = False, neg = False):
     try:
-        anime_id = getAnimeFrame(name, anime_df_path).anime_id.values[0]
-        encoded_anime_id = joblib.load(anime2anime_encoded_path).get(anime_id, None)
-
-        weights = joblib.load(anime_weights_path)
+        anime_df = _ensure_df(anime_df_path)
+        anime_id = getAnimeFrame(name, anime_df).anime_id.values[0]
+        encoded_anime_id = _ensure_artifact(anime2anime_encoded_path).get(anime_id, None)
 
-        dists = np.dot(weights, weights[encoded_anime_id])
-        sorted_dist = np.argsort(dists)
+        weights = _ensure_artifact(anime_weights_path)
 
-        if neg:
-            closest_animes = sorted_dist[:top_n]
-        else:
-            closest_animes = sorted_dist[-(top_n + 1):]
+        closest_animes, closest_dists = find_top_k(weights, [encoded_anime_id], top_n=top_n, neg=neg)
+        closest_animes, closest_dists = closest_animes[0], closest_dists[0]
 
         print(f"Top {top_n} similar animes to '{name}':")
 
         if return_dists:
-            return dists, closest_animes
+            return np.dot(weights, weights[encoded_anime_id]), closest_animes
 
         similar_animes = []
+        anime2anime_decoded = _ensure_artifact(anime2anime_decoded_path)
+        synopsis_df = _ensure_df(synopsis_df_path)
 
-        for closest in closest_animes:
-            decoded_anime_id = joblib.load(anime2anime_decoded_path).get(closest, None)
-            synopsis = getSynopsis(decoded_anime_id, synopsis_df_path)
-            anime_frame = getAnimeFrame(decoded_anime_id, anime_df_path)
+        for closest, dist in zip(closest_animes, closest_dists):
+            decoded_anime_id = anime2anime_decoded.get(closest, None)
+            synopsis = getSynopsis(decoded_anime_id, synopsis_df)
+            anime_frame = getAnimeFrame(decoded_anime_id, anime_df)
             anime_name = anime_frame.eng_version.values[0]
             genre = anime_frame.Genres.values[0]
 
@@ -69,7 +90,7 @@ def find_similar_animes(name, anime_weights_path, anime2anime_encoded_path, anim
                 "anime_name": anime_name,
                 "genre": genre,
                 "synopsis": synopsis,
-                "similarity": dists[closest]
+                "similarity": dist
             })
 
         similar_animes_df =  pd.DataFrame(similar_animes).sort_values(by='similarity', ascending=False)
@@ -80,32 +101,34 @@ def find_similar_animes(name, anime_weights_path, anime2anime_encoded_path, anim
 
 #################### 4. USER BASED RECOMMENDATION #################
 
-def find_similar_users(item_input, user_weights_path, user2user_encoded_path, user2user_decoded_path, top_n = 10, return_dists = False, neg = False):
+def find_similar_users(item_input, user_weights_path, user2user_encoded_path, user2user_decoded_path, top_n = 10, return_dists = False, neg = False, ann_index = None, n_probe = None):
     user_id = item_input
-    encoded_user_id = joblib.load(user2user_encoded_path).get(user_id)
+    encoded_user_id = _ensure_artifact(user2user_encoded_path).get(user_id)
     print(type(encoded_user_id), encoded_user_id)
 
-    weights = joblib.load(user_weights_path)
+    weights = _ensure_artifact(user_weights_path)
 
-    dists = np.dot(weights, weights[encoded_user_id])
-    sorted_dist = np.argsort(dists)
-    if neg:
-        closest_users = sorted_dist[:top_n]
+    if ann_index is not None and not neg:
+        closest_users, closest_dists = ann_index.search(weights, [encoded_user_id], top_n=top_n, n_probe=n_probe)
+        found = closest_users[0] >= 0
+        closest_users, closest_dists = closest_users[0][found], closest_dists[0][found]
     else:
-        closest_users = sorted_dist[-(top_n + 1):]
+        closest_users, closest_dists = find_top_k(weights, [encoded_user_id], top_n=top_n, neg=neg)
+        closest_users, closest_dists = closest_users[0], closest_dists[0]
 
     if return_dists:
-        return dists, closest_users
+        return weights @ weights[encoded_user_id], closest_users
 
     print(f"Top {top_n} similar users to '{user_id}':")
 
     similar_users = []
+    user2user_decoded = _ensure_artifact(user2user_decoded_path)
 
-    for closest in closest_users:
-        decoded_user_id = joblib.load(user2user_decoded_path).get(closest, None)
+    for closest, dist in zip(closest_users, closest_dists):
+        decoded_user_id = user2user_decoded.get(closest, None)
         similar_users.append({
             "user_id": decoded_user_id,
-            "similarity": dists[closest]
+            "similarity": dist
         })
 
     similar_users_df = pd.DataFrame(similar_users).sort_values(by="similarity", ascending=False)
@@ -133,7 +156,7 @@ def getUserPreferences(user_id, rating_df_path, df_path, plot = False):
 
 ###################### 6. GET_USER_RECOMMENDATION ######################
 
-def getUserRecommendation(similar_users, user_preferences, df_path, rating_df_path, synopsis_df_path, top_n = 10):
+def getUserRecommendation(similar_users, user_preferences, df_path, rating_df_path, synopsis_df_path, top_n = 10, lookup = None):
     recommendation_anime = []
     anime_pool = []
 
@@ -161,7 +184,7 @@ def getUserRecommendation(similar_users, user_preferences, df_path, rating_df_pa
 
     for anime_name, count in top_animes:
 
-        frame = getAnimeFrame(anime_name, df)
+        frame = getAnimeFrame(anime_name, df, lookup)
 
         if frame.empty:
             continue
@@ -177,3 +200,153 @@ def getUserRecommendation(similar_users, user_preferences, df_path, rating_df_pa
 
     recommendation_anime_df = pd.DataFrame(recommendation_anime)
     return recommendation_anime_df
+
+###################### 7. BATCHED TOP-K SIMILARITY ######################
+
+def find_top_k(weights, query_ids, top_n = 10, neg = False, exclude_self = True, max_block_mb = 64):
+    weights = _ensure_artifact(weights)
+    query_ids = np.atleast_1d(np.asarray(query_ids, dtype=np.int64))
+
+    n_items = weights.shape[0]
+    top_n = min(top_n, n_items - 1 if exclude_self else n_items)
+
+    closest = np.empty((len(query_ids), top_n), dtype=np.int64)
+    dists = np.empty((len(query_ids), top_n), dtype=weights.dtype)
+
+    if top_n <= 0:
+        return closest, dists
+
+    # Bound the (block x n_items) score matrix to roughly max_block_mb.
+    block_size = max(1, (max_block_mb * 1024 * 1024) // (n_items * weights.itemsize))
+
+    for start in range(0, len(query_ids), block_size):
+        block_ids = query_ids[start:start + block_size]
+        rows = np.arange(len(block_ids))
+
+        scores = weights[block_ids] @ weights.T
+        if not neg:
+            scores = -scores
+
+        if exclude_self:
+            scores[rows, block_ids] = np.inf
+
+        if top_n < n_items:
+            part = np.argpartition(scores, top_n - 1, axis=1)[:, :top_n]
+        else:
+            part = np.tile(np.arange(n_items), (len(block_ids), 1))
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(part_scores, axis=1, kind="stable")
+
+        closest[start:start + len(block_ids)] = np.take_along_axis(part, order, axis=1)
+        block_dists = np.take_along_axis(part_scores, order, axis=1)
+        dists[start:start + len(block_ids)] = block_dists if neg else -block_dists
+
+    return closest, dists
+
+###################### 8. BATCHED CONTENT BASED RECOMMENDATION ######################
+
+def find_similar_animes_batch(names, anime_weights_path, anime2anime_encoded_path, anime2anime_decoded_path, anime_df_path, top_n = 10, neg = False, lookup = None):
+    anime_df = _ensure_df(anime_df_path)
+    anime2anime_encoded = _ensure_artifact(anime2anime_encoded_path)
+    anime2anime_decoded = _ensure_artifact(anime2anime_decoded_path)
+
+    seed_names = []
+    seed_ids = []
+
+    for name in names:
+        frame = getAnimeFrame(name, anime_df, lookup)
+        if frame is None or frame.empty:
+            continue
+
+        encoded_anime_id = anime2anime_encoded.get(frame.anime_id.values[0], None)
+        if encoded_anime_id is None:
+            continue
+
+        seed_names.append(name)
+        seed_ids.append(encoded_anime_id)
+
+    if not seed_ids:
+        return {}
+
+    closest, dists = find_top_k(anime_weights_path, seed_ids, top_n=top_n, neg=neg)
+
+    similar_animes = {}
+
+    for name, row_closest, row_dists in zip(seed_names, closest, dists):
+        rows = []
+        for closest_id, dist in zip(row_closest, row_dists):
+            decoded_anime_id = anime2anime_decoded.get(closest_id, None)
+            anime_frame = getAnimeFrame(decoded_anime_id, anime_df, lookup)
+            if anime_frame is None or anime_frame.empty:
+                continue
+
+            rows.append({
+                "anime_id": decoded_anime_id,
+                "anime_name": anime_frame.eng_version.values[0],
+                "genre": anime_frame.Genres.values[0],
+                "similarity": dist
+            })
+
+        similar_animes[name] = pd.DataFrame(rows)
+
+    return similar_animes
+
+###################### 9. VECTORIZED USER RECOMMENDATION ######################
+
+def gather_user_favourites(favourites_offsets, favourites_anime, encoded_user_ids, overrides = None):
+    encoded_user_ids = np.asarray(encoded_user_ids, dtype=np.int64)
+
+    # Users folded in after preprocessing keep their favourites outside the CSR table.
+    if overrides and any(user in overrides for user in encoded_user_ids.tolist()):
+        return np.concatenate([
+            overrides[user] if user in overrides else favourites_anime[favourites_offsets[user]:favourites_offsets[user + 1]]
+            for user in encoded_user_ids.tolist()
+        ]).astype(favourites_anime.dtype, copy=False)
+
+    starts = favourites_offsets[encoded_user_ids]
+    lengths = favourites_offsets[encoded_user_ids + 1] - starts
+
+    # One flat index into favourites_anime covering every requested user's slice.
+    shifts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return favourites_anime[shifts + np.arange(lengths.sum())]
+
+def rank_user_favourites(similar_user_ids, encoded_user_id, favourites_offsets, favourites_anime, top_n = 10, overrides = None):
+    anime_pool = gather_user_favourites(favourites_offsets, favourites_anime, similar_user_ids, overrides)
+
+    if encoded_user_id is not None:
+        watched_anime = gather_user_favourites(favourites_offsets, favourites_anime, [encoded_user_id], overrides)
+        anime_pool = anime_pool[~np.isin(anime_pool, watched_anime)]
+
+    if len(anime_pool) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    n_anime = int(anime_pool.max()) + 1
+    counts = np.bincount(anime_pool, minlength=n_anime)
+
+    # Break count ties by first appearance in the pool, as Counter.most_common does.
+    first_seen = np.full(n_anime, len(anime_pool), dtype=np.int64)
+    np.minimum.at(first_seen, anime_pool, np.arange(len(anime_pool)))
+
+    candidates = np.flatnonzero(counts)
+    candidates = candidates[np.lexsort((first_seen[candidates], -counts[candidates]))][:top_n]
+
+    return candidates, counts[candidates]
+
+###################### 10. SINGLE-PASS CONTENT EXPANSION ######################
+
+def expand_content(seed_ids, similar_ids, user_weight = 0.5, content_weight = 0.5, top_n = 10):
+    seed_ids = np.asarray(seed_ids, dtype=np.int64)
+    similar_ids = np.asarray(similar_ids, dtype=np.int64).ravel()
+
+    anime_ids = np.concatenate([seed_ids, similar_ids])
+    if len(anime_ids) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    weights = np.concatenate([np.full(len(seed_ids), user_weight, dtype=np.float64), np.full(len(similar_ids), content_weight, dtype=np.float64)])
+
+    unique_ids, first_seen, inverse = np.unique(anime_ids, return_index=True, return_inverse=True)
+    scores = np.bincount(inverse, weights=weights)
+
+    # Highest score first, ties in order of first appearance.
+    order = np.lexsort((first_seen, -scores))[:top_n]
+    return unique_ids[order], scores[order]